@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+import io
 from .. import models, schemas
-from ..database import get_db
+from ..database import get_db, get_db_session
+from ..core import catalog, course_io, dashboard, membership, metrics, principals, progress, quizzes
 from ..core.security import get_current_user, get_current_active_user, get_current_admin_user, get_password_hash
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
@@ -43,6 +46,8 @@ def create_course(
     db_course = models.Course(**course_data)
     db.add(db_course)
     db.commit()
+    catalog.invalidate_catalog()
+    dashboard.invalidate_teacher(db_course.teacher_id)
     db.refresh(db_course)
     return db_course
 
@@ -63,9 +68,65 @@ def update_course(
         setattr(db_course, field, value)
     
     db.commit()
+    catalog.invalidate_catalog()
+    dashboard.invalidate_course(course_id)
     db.refresh(db_course)
     return db_course
 
+@router.delete("/courses/{course_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_course(
+    course_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_admin_user)
+):
+    """Delete a course (admin only)"""
+    db_course = db.query(models.Course).filter(models.Course.id == course_id).first()
+    if not db_course:
+        raise HTTPException(status_code=404, detail="Course not found")
+    
+    db.delete(db_course)
+    db.commit()
+    membership.forget_course(course_id)
+    catalog.invalidate_catalog()
+    dashboard.invalidate_course(course_id)
+    return None
+
+@router.get("/courses/export")
+def export_courses(
+    teacher_id: Optional[int] = None,
+    current_user: models.User = Depends(get_current_admin_user)
+):
+    """Stream every course tree (or one teacher's) as JSON Lines (admin only)"""
+    def stream():
+        # The response outlives the request's session, so use its own
+        with get_db_session() as db:
+            yield from course_io.export_courses(db, teacher_id)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="courses.jsonl"'}
+    )
+
+@router.post("/courses/import", response_model=schemas.CourseImportResult)
+def import_courses(
+    file: UploadFile = File(...),
+    teacher_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_admin_user)
+):
+    """Import course trees from a JSON Lines upload, one transaction per course (admin only)"""
+    if teacher_id is None:
+        teacher_id = current_user.id
+    elif not db.query(models.User.id).filter(models.User.id == teacher_id).first():
+        raise HTTPException(status_code=404, detail="Teacher not found")
+    
+    lines = io.TextIOWrapper(file.file, encoding="utf-8")
+    try:
+        return course_io.import_courses(db, lines, teacher_id)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded JSON Lines")
+
 # Module Management
 @router.post("/courses/{course_id}/modules", response_model=schemas.ModuleOut, status_code=status.HTTP_201_CREATED)
 def create_module(
@@ -82,7 +143,10 @@ def create_module(
     
     db_module = models.Module(**module.dict(), course_id=course_id)
     db.add(db_module)
+    db.flush()
+    progress.modules_changed(db, course_id)
     db.commit()
+    dashboard.invalidate_course(course_id)
     db.refresh(db_module)
     return db_module
 
@@ -118,10 +182,14 @@ def update_user(
         del update_data['password']
         update_data['hashed_password'] = hashed_password
     
+    if principals.authorization_changed(db_user, update_data):
+        principals.bump_token_generation(db_user)
+    
     for field, value in update_data.items():
         setattr(db_user, field, value)
     
     db.commit()
+    principals.invalidate_user(user_id)
     db.refresh(db_user)
     return db_user
 
@@ -139,9 +207,14 @@ def create_quiz_question(
     if not module:
         raise HTTPException(status_code=404, detail="Module not found")
     
-    db_question = models.QuizQuestion(**question.dict(), module_id=module_id)
+    db_question = models.QuizQuestion(
+        **question.dict(exclude={"module_id", "options"}),
+        module_id=module_id,
+        options=[models.QuizOption(**option.model_dump()) for option in question.options]
+    )
     db.add(db_question)
     db.commit()
+    quizzes.invalidate_quiz(module_id)
     db.refresh(db_question)
     return db_question
 
@@ -158,9 +231,10 @@ def create_quiz_option(
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
     
-    db_option = models.QuizOption(**option.dict(), question_id=question_id)
+    db_option = models.QuizOption(**option.dict(exclude={"question_id"}), question_id=question_id)
     db.add(db_option)
     db.commit()
+    quizzes.invalidate_quiz(question.module_id)
     db.refresh(db_option)
     return db_option
 
@@ -185,6 +259,8 @@ def create_enrollment(
     enrollment = models.Enrollment(user_id=user_id, course_id=course_id)
     db.add(enrollment)
     db.commit()
+    membership.enrolled(user_id, course_id)
+    dashboard.invalidate_course(course_id)
     db.refresh(enrollment)
     return {"message": "Enrollment created successfully"}
 
@@ -204,4 +280,32 @@ def get_analytics_overview(
         "total_courses": total_courses,
         "total_enrollments": total_enrollments,
         "active_users": db.query(models.User).filter(models.User.is_active == True).count()
-    }
\ No newline at end of file
+    }
+
+@router.get("/dashboard/courses", response_model=List[schemas.CourseStats])
+def get_dashboard_courses(
+    teacher_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Enrollment, completion, progress and quiz figures for each course.
+    Teachers get their own courses; admins get every course, or one
+    teacher's with ``teacher_id``.
+    """
+    if current_user.role == models.UserRole.TEACHER:
+        teacher_id = current_user.id
+    elif current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only teachers and admins can view the dashboard"
+        )
+    
+    return dashboard.get_course_stats(db, teacher_id)
+
+@router.get("/metrics")
+def get_metrics(
+    current_user: models.User = Depends(get_current_admin_user)
+):
+    """Get in-process cache and worker metrics (admin only)"""
+    return metrics.snapshot()
@@ -2,20 +2,28 @@ from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any, Union
 import jwt
 from jwt import PyJWTError
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm, HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 import os
+import uuid
+import logging
 from . import models, schemas
-from .database import get_db
+from .database import get_db, get_db_session
+from .core import log, principals
+from .core.config import settings
+from .core.hashing import password_pool
+from .core.revocation import revocation_list
+from .core.security import pwd_context, password_needs_rehash
+
+logger = logging.getLogger(__name__)
 
 # Security
 SECRET_KEY = os.getenv("SECRET_KEY", "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 optional_oauth2_scheme = HTTPBearer(auto_error=False)
 
@@ -25,6 +33,28 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+def _store_password_hash(user_id: int, old_hash: str, new_hash: str) -> None:
+    with get_db_session() as db:
+        # Skip the write if the password changed since the old hash was read
+        db.query(models.User).filter(
+            models.User.id == user_id,
+            models.User.hashed_password == old_hash
+        ).update({"hashed_password": new_hash}, synchronize_session=False)
+        db.commit()
+
+async def rehash_password(user_id: int, password: str, old_hash: str) -> None:
+    """
+    Re-hash a password with the current settings (run as a background task).
+    
+    Called after a successful login whose stored hash is outdated, so cost
+    changes roll out without forcing password resets.
+    """
+    try:
+        new_hash = await password_pool.run(get_password_hash, password)
+    except HTTPException:
+        return  # Pool is saturated; the next login will try again
+    await run_in_threadpool(_store_password_hash, user_id, old_hash, new_hash)
+
 def get_user(db: Session, user_id: int) -> Optional[models.User]:
     return db.query(models.User).filter(models.User.id == user_id).first()
 
@@ -32,18 +62,13 @@ def get_user_by_email(db: Session, email: str) -> Optional[models.User]:
     return db.query(models.User).filter(models.User.email == email).first()
 
 def authenticate_user(db: Session, email: str, password: str) -> Optional[models.User]:
-    print(f"DEBUG: Attempting to authenticate user with email: {email}")
     user = get_user_by_email(db, email)
     if not user:
-        print(f"DEBUG: No user found with email: {email}")
+        logger.debug("No user found with email %s", email)
         return None
-    print(f"DEBUG: User found: {user.email}, ID: {user.id}")
-    print(f"DEBUG: Verifying password...")
-    password_valid = verify_password(password, user.hashed_password)
-    print(f"DEBUG: Password verification result: {password_valid}")
-    if not password_valid:
+    if not verify_password(password, user.hashed_password):
+        logger.debug("Password verification failed for user %s", user.id)
         return None
-    print(f"DEBUG: Authentication successful for user: {user.email}")
     return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -62,6 +87,9 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     if 'sub' not in to_encode and 'email' in to_encode:
         to_encode['sub'] = to_encode['email']
     
+    # Unique token id so the token can be revoked on logout
+    to_encode.setdefault('jti', uuid.uuid4().hex)
+    
     # Convert any non-JSON-serializable data to strings
     for key, value in to_encode.items():
         if key == 'exp':
@@ -74,7 +102,10 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-async def get_current_user(
+# The auth dependencies below are plain functions on purpose: FastAPI runs
+# them in its threadpool, so their synchronous DB lookups never block the
+# event loop. Don't turn them into ``async def`` without an async session.
+def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ) -> models.User:
@@ -92,6 +123,9 @@ async def get_current_user(
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
+        
+        if revocation_list.is_revoked(payload.get("jti")):
+            raise credentials_exception
             
         # Create TokenData with the payload
         token_data = schemas.TokenData(
@@ -101,21 +135,28 @@ async def get_current_user(
             role=payload.get("role")
         )
         
-        # Get user from database
-        user = get_user_by_email(db, email=email)
+        # Get user from the principal cache or database
+        user = principals.load_user(db, email=email)
         if user is None:
             raise credentials_exception
-            
+        
+        # Reject tokens issued before the user's last role/status change
+        if payload.get("gen", 0) != user.token_generation:
+            raise credentials_exception
+        
+        log.bind(user_id=user.id)
         return user
         
+    except HTTPException:
+        raise
     except PyJWTError as e:
-        print(f"JWT Error in auth.get_current_user: {str(e)}")
+        logger.debug("JWT error in get_current_user: %s", e)
         raise credentials_exception
-    except Exception as e:
-        print(f"Unexpected error in auth.get_current_user: {str(e)}")
+    except Exception:
+        logger.exception("Unexpected error in get_current_user")
         raise credentials_exception
 
-async def get_current_user_optional(
+def get_current_user_optional(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_oauth2_scheme),
     db: Session = Depends(get_db)
 ) -> Optional[models.User]:
@@ -129,11 +170,14 @@ async def get_current_user_optional(
         
         # Get the subject (email) from the token
         email: str = payload.get("sub")
-        if email is None:
+        if email is None or revocation_list.is_revoked(payload.get("jti")):
             return None
             
-        # Get user from database
-        user = get_user_by_email(db, email=email)
+        # Get user from the principal cache or database
+        user = principals.load_user(db, email=email)
+        if user is None or payload.get("gen", 0) != user.token_generation:
+            return None
+        log.bind(user_id=user.id)
         return user
         
     except PyJWTError:
@@ -141,14 +185,64 @@ async def get_current_user_optional(
     except Exception:
         return None
 
-async def get_current_active_user(
+def _principal_from_token(db: Session, token: str) -> Optional[principals.Principal]:
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except PyJWTError:
+        return None
+    if revocation_list.is_revoked(payload.get("jti")):
+        return None
+    principal = principals.principal_from_claims(payload)
+    if principal is None:
+        return None
+    if principals.current_generation(db, principal.id) != principal.token_generation:
+        return None
+    log.bind(user_id=principal.id)
+    return principal
+
+def get_current_principal(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> Union[principals.Principal, models.User]:
+    """
+    Authenticate a read-only request.
+    
+    With AUTH_CLAIMS_ONLY enabled the caller is built from the token's signed
+    claims and only its token generation is checked, so no user row is
+    loaded. Otherwise this is get_current_active_user. Routes using it may
+    only rely on ``id``, ``email`` and ``role``.
+    """
+    if not settings.AUTH_CLAIMS_ONLY:
+        return get_current_active_user(get_current_user(token, db))
+    
+    principal = _principal_from_token(db, token)
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return principal
+
+def get_current_principal_optional(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> Optional[Union[principals.Principal, models.User]]:
+    """Like get_current_principal, but return None if no valid token is provided"""
+    if not settings.AUTH_CLAIMS_ONLY:
+        return get_current_user_optional(credentials, db)
+    if not credentials:
+        return None
+    return _principal_from_token(db, credentials.credentials)
+
+def get_current_active_user(
     current_user: models.User = Depends(get_current_user),
 ) -> models.User:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
-async def get_current_active_admin(
+def get_current_active_admin(
     current_user: models.User = Depends(get_current_active_user),
 ) -> models.User:
     if current_user.role != schemas.UserRole.ADMIN:
@@ -158,13 +252,14 @@ async def get_current_active_admin(
         )
     return current_user
 
-def create_user(db: Session, user: schemas.UserCreate) -> models.User:
-    # Log the incoming user data for debugging
-    print(f"Creating user with email: {user.email}")
-    print(f"User data: {user.dict()}")
-    
-    # Hash the password
-    hashed_password = get_password_hash(user.password)
+def create_user(
+    db: Session,
+    user: schemas.UserCreate,
+    hashed_password: Optional[str] = None
+) -> models.User:
+    # Hash the password unless the caller already did
+    if hashed_password is None:
+        hashed_password = get_password_hash(user.password)
     
     # Create the user object with all required fields
     db_user = models.User(
@@ -183,11 +278,11 @@ def create_user(db: Session, user: schemas.UserCreate) -> models.User:
     try:
         db.commit()
         db.refresh(db_user)
-        print(f"Successfully created user with ID: {db_user.id}")
+        logger.debug("Created user %s", db_user.id)
         return db_user
-    except Exception as e:
+    except Exception:
         db.rollback()
-        print(f"Error creating user: {str(e)}")
+        logger.exception("Error creating user")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to create user in database"
@@ -220,9 +315,13 @@ def update_user(
     if "password" in update_data:
         update_data["hashed_password"] = get_password_hash(update_data.pop("password"))
     
+    if principals.authorization_changed(db_user, update_data):
+        principals.bump_token_generation(db_user)
+    
     for field, value in update_data.items():
         setattr(db_user, field, value)
     
     db.commit()
+    principals.invalidate_user(user_id)
     db.refresh(db_user)
     return db_user
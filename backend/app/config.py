@@ -24,10 +24,27 @@ class Settings(BaseSettings):
     CORS_ORIGINS: Union[str, List[str]] = os.getenv("CORS_ORIGINS", "*")
     
     # File upload settings
-    UPLOAD_FOLDER: str = "uploads"
+    UPLOAD_FOLDER: str = os.getenv("UPLOAD_FOLDER", "uploads")
     MAX_CONTENT_LENGTH: int = int(os.getenv("MAX_UPLOAD_SIZE", "16")) * 1024 * 1024  # Convert MB to bytes
     MAX_UPLOAD_SIZE: int = int(os.getenv("MAX_UPLOAD_SIZE", "16"))  # In MB
-    ALLOWED_EXTENSIONS: set = {"png", "jpg", "jpeg", "gif", "pdf", "doc", "docx", "mp4"}
+    ALLOWED_EXTENSIONS: set = {"png", "jpg", "jpeg", "gif", "webp", "pdf", "doc", "docx", "mp4"}
+    # Request bodies are written to disk in blocks of this many bytes
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+    # Unfinished resumable uploads are discarded after this many hours
+    UPLOAD_SESSION_TTL_HOURS: int = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
+    
+    # Media serving. Set MEDIA_ACCEL_REDIRECT behind nginx to an internal
+    # location aliased to UPLOAD_FOLDER/objects/ (e.g. "/protected-media/")
+    # and nginx sends the files; otherwise they are read in blocks of
+    # MEDIA_BLOCK_SIZE bytes unless the server supports zero-copy sends
+    MEDIA_ACCEL_REDIRECT: Optional[str] = os.getenv("MEDIA_ACCEL_REDIRECT") or None
+    MEDIA_BLOCK_SIZE: int = int(os.getenv("MEDIA_BLOCK_SIZE", str(256 * 1024)))
+    
+    # Resized copies of uploaded images (course thumbnails), made once per
+    # image by a background pool; needs Pillow, 0 workers turns it off
+    IMAGE_VARIANT_WIDTHS: str = os.getenv("IMAGE_VARIANT_WIDTHS", "160,320,640,1280")
+    IMAGE_VARIANT_WORKERS: int = int(os.getenv("IMAGE_VARIANT_WORKERS", "2"))
+    IMAGE_VARIANT_QUALITY: int = int(os.getenv("IMAGE_VARIANT_QUALITY", "80"))
     
     # Email settings (if needed)
     SMTP_SERVER: Optional[str] = os.getenv("SMTP_SERVER")
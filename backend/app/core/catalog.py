@@ -0,0 +1,65 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Optional
+import hashlib
+
+from pydantic import TypeAdapter
+
+from .. import schemas
+from . import metrics
+from .cache import TTLCache
+from .config import settings
+
+_courses_adapter = TypeAdapter(List[schemas.CourseOut])
+
+
+@dataclass(frozen=True)
+class CatalogPage:
+    """A pre-serialized page of the published course catalog."""
+    body: bytes
+    etag: str
+    next_cursor: Optional[str] = None
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Whether an If-None-Match header value names this page."""
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or self.etag in tags
+
+
+# Published-catalog pages keyed by their paging parameters. Writes in this
+# process clear it; other workers pick changes up within CATALOG_CACHE_TTL.
+catalog_cache = TTLCache(maxsize=256, ttl=settings.CATALOG_CACHE_TTL)
+metrics.register("catalog_cache", catalog_cache.stats)
+
+
+def build_page(courses: List[Any], next_cursor: Optional[str] = None) -> CatalogPage:
+    body = _courses_adapter.dump_json(
+        _courses_adapter.validate_python(courses, from_attributes=True)
+    )
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    return CatalogPage(body=body, etag=etag, next_cursor=next_cursor)
+
+
+def get_page(key: Hashable) -> Optional[CatalogPage]:
+    return catalog_cache.get(key)
+
+
+def store_page(key: Hashable, page: CatalogPage) -> None:
+    catalog_cache.set(key, page)
+
+
+def invalidate_catalog() -> None:
+    """Drop every cached catalog page (call after a course write commits)."""
+    catalog_cache.clear()
+
+
+def public_headers(page: CatalogPage, anonymous: bool) -> Dict[str, str]:
+    headers = {"ETag": page.etag, "Vary": "Authorization"}
+    if anonymous:
+        headers["Cache-Control"] = f"public, max-age={settings.CATALOG_CACHE_TTL}"
+    else:
+        headers["Cache-Control"] = "private, no-cache"
+    if page.next_cursor:
+        headers["X-Next-Cursor"] = page.next_cursor
+    return headers
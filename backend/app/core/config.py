@@ -16,6 +16,79 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 days
     ALGORITHM: str = "HS256"
     
+    # Authenticated-principal cache (per process)
+    PRINCIPAL_CACHE_SIZE: int = int(os.getenv("PRINCIPAL_CACHE_SIZE", "4096"))
+    PRINCIPAL_CACHE_TTL: int = int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))  # seconds
+    
+    # Claims-only authentication for read-only routes: the principal is built
+    # from the signed token and only its generation is checked (cached for
+    # TOKEN_GENERATION_TTL seconds, so revocation reaches every worker by then)
+    AUTH_CLAIMS_ONLY: bool = os.getenv("AUTH_CLAIMS_ONLY", "False").lower() == "true"
+    TOKEN_GENERATION_TTL: int = int(os.getenv("TOKEN_GENERATION_TTL", "30"))  # seconds
+    
+    # Token revocation list: how often each worker pulls new revocations, and
+    # how often expired rows are purged from the revoked_tokens table
+    REVOCATION_REFRESH_SECONDS: int = int(os.getenv("REVOCATION_REFRESH_SECONDS", "5"))
+    REVOCATION_GC_SECONDS: int = int(os.getenv("REVOCATION_GC_SECONDS", "3600"))
+    # How far back each refresh re-reads, for revocations whose transaction
+    # committed after later ones had been read
+    REVOCATION_OVERLAP_SECONDS: int = int(os.getenv("REVOCATION_OVERLAP_SECONDS", "60"))
+    
+    # Password hashing; hashes made with other settings are upgraded at login.
+    # Run scripts/calibrate_password_hash.py to pick rounds for this host.
+    PASSWORD_HASH_SCHEME: str = os.getenv("PASSWORD_HASH_SCHEME", "bcrypt")
+    PASSWORD_HASH_ROUNDS: int = int(os.getenv("PASSWORD_HASH_ROUNDS", "12"))
+    
+    # Login throttling (token buckets checked before the password is verified).
+    # Use the "database" backend to share limits between workers. The per-IP
+    # limit is loose, as a class behind one school NAT shares an address;
+    # the per-email limit does the real work.
+    LOGIN_RATE_LIMIT_BACKEND: str = os.getenv("LOGIN_RATE_LIMIT_BACKEND", "memory")
+    LOGIN_RATE_LIMIT_IP_BURST: int = int(os.getenv("LOGIN_RATE_LIMIT_IP_BURST", "100"))
+    LOGIN_RATE_LIMIT_IP_PER_MINUTE: float = float(os.getenv("LOGIN_RATE_LIMIT_IP_PER_MINUTE", "60"))
+    LOGIN_RATE_LIMIT_EMAIL_BURST: int = int(os.getenv("LOGIN_RATE_LIMIT_EMAIL_BURST", "5"))
+    LOGIN_RATE_LIMIT_EMAIL_PER_MINUTE: float = float(os.getenv("LOGIN_RATE_LIMIT_EMAIL_PER_MINUTE", "3"))
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+    # Proxies whose X-Forwarded-For is believed when rate limiting: comma
+    # separated addresses or networks, or "*" for whichever peer connects
+    # (a platform load balancer such as Render's). Empty: use the peer.
+    TRUSTED_PROXIES: str = os.getenv("TRUSTED_PROXIES", "")
+    
+    # Dedicated password hashing pool used by login and register
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+    PASSWORD_HASH_QUEUE_SIZE: int = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "64"))
+    PASSWORD_HASH_RETRY_AFTER: int = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "2"))  # seconds
+    
+    # Server-side cache of the published course catalog (seconds); also the
+    # max-age given to shared caches for anonymous catalog responses
+    CATALOG_CACHE_TTL: int = int(os.getenv("CATALOG_CACHE_TTL", "30"))
+    
+    # Teacher dashboard figures; entries are dropped when an enrollment or
+    # quiz attempt in one of their courses is written in this process
+    DASHBOARD_CACHE_TTL: int = int(os.getenv("DASHBOARD_CACHE_TTL", "300"))
+    
+    # Published-module count per course, used to turn completed modules
+    # into a progress percentage; module writes in this process drop it
+    MODULE_COUNT_CACHE_TTL: int = int(os.getenv("MODULE_COUNT_CACHE_TTL", "300"))
+    
+    # Per-user set of enrolled course ids used to authorize course content.
+    # Enrolling or unenrolling updates it in this process at once; a course
+    # missing from the set is re-checked in the database before refusing,
+    # so only unenrollments can take up to the TTL to reach other workers.
+    MEMBERSHIP_CACHE_SIZE: int = int(os.getenv("MEMBERSHIP_CACHE_SIZE", "10000"))
+    MEMBERSHIP_CACHE_TTL: int = int(os.getenv("MEMBERSHIP_CACHE_TTL", "300"))
+
+    # Compiled quiz (questions, options and answer key) per module; question
+    # and option writes in this process drop it, other workers after the TTL
+    QUIZ_CACHE_TTL: int = int(os.getenv("QUIZ_CACHE_TTL", "300"))
+    
+    # Logging: app logs and access logs are written in batches by a
+    # background thread; the access log keeps a sample of non-5xx requests
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")  # json or text
+    LOG_BATCH_SIZE: int = int(os.getenv("LOG_BATCH_SIZE", "256"))
+    ACCESS_LOG_SAMPLE_RATE: float = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1.0"))
+    
     # Database
     DATABASE_URL: str = os.getenv(
         "DATABASE_URL", 
@@ -0,0 +1,316 @@
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import logging
+
+from pydantic import ValidationError
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from .. import models, schemas
+from . import catalog, dashboard, images
+from .search import search_index
+
+logger = logging.getLogger(__name__)
+
+# Courses exported per round of module/question/option queries; bounds how
+# much course content is held in memory at once
+EXPORT_BATCH_SIZE = 20
+
+MAX_REPORTED_ERRORS = 100
+
+_COURSE_COLUMNS = (
+    models.Course.id,
+    models.Course.title,
+    models.Course.description,
+    models.Course.thumbnail_url,
+    models.Course.video_url,
+    models.Course.content_type,
+    models.Course.is_published,
+)
+
+
+def export_courses(
+    db: Session,
+    teacher_id: Optional[int] = None,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> Iterator[str]:
+    """
+    Yield one JSON Lines record per course, each holding the whole course
+    tree. Courses are streamed with ``yield_per``; the rest of each batch
+    is fetched with one query per table.
+    """
+    query = select(*_COURSE_COLUMNS).order_by(models.Course.id)
+    if teacher_id is not None:
+        query = query.where(models.Course.teacher_id == teacher_id)
+
+    result = db.execute(query.execution_options(yield_per=batch_size))
+    for courses in result.partitions():
+        yield from _export_batch(db, courses)
+
+
+def _export_batch(db: Session, courses: List[Any]) -> Iterator[str]:
+    modules = db.query(
+        models.Module.id,
+        models.Module.course_id,
+        models.Module.title,
+        models.Module.description,
+        models.Module.content,
+        models.Module.content_type,
+        models.Module.duration,
+        models.Module.order,
+        models.Module.is_published
+    ).filter(
+        models.Module.course_id.in_([course.id for course in courses])
+    ).order_by(models.Module.course_id, models.Module.order, models.Module.id).all()
+
+    questions = []
+    if modules:
+        questions = db.query(
+            models.QuizQuestion.id,
+            models.QuizQuestion.module_id,
+            models.QuizQuestion.question,
+            models.QuizQuestion.points
+        ).filter(
+            models.QuizQuestion.module_id.in_([module.id for module in modules])
+        ).order_by(models.QuizQuestion.id).all()
+
+    options_by_question: Dict[int, List[schemas.QuizOptionExport]] = defaultdict(list)
+    if questions:
+        options = db.query(
+            models.QuizOption.question_id,
+            models.QuizOption.option_text,
+            models.QuizOption.is_correct
+        ).filter(
+            models.QuizOption.question_id.in_([question.id for question in questions])
+        ).order_by(models.QuizOption.id)
+        for option in options:
+            options_by_question[option.question_id].append(schemas.QuizOptionExport(
+                option_text=option.option_text,
+                is_correct=bool(option.is_correct)
+            ))
+
+    questions_by_module: Dict[int, List[schemas.QuizQuestionExport]] = defaultdict(list)
+    for question in questions:
+        questions_by_module[question.module_id].append(schemas.QuizQuestionExport(
+            question=question.question,
+            points=question.points if question.points is not None else 1,
+            options=options_by_question.pop(question.id, [])
+        ))
+
+    modules_by_course: Dict[int, List[schemas.ModuleExport]] = defaultdict(list)
+    for module in modules:
+        modules_by_course[module.course_id].append(schemas.ModuleExport(
+            title=module.title,
+            description=module.description,
+            content=module.content or "",
+            content_type=module.content_type,
+            duration=module.duration,
+            order_index=module.order,
+            is_published=bool(module.is_published),
+            questions=questions_by_module.pop(module.id, [])
+        ))
+
+    for course in courses:
+        record = schemas.CourseExport(
+            title=course.title,
+            description=course.description,
+            thumbnail_url=course.thumbnail_url,
+            video_url=course.video_url,
+            content_type=course.content_type or "text",
+            is_published=bool(course.is_published),
+            modules=modules_by_course.pop(course.id, [])
+        )
+        yield record.model_dump_json() + "\n"
+
+
+def import_course(db: Session, record: schemas.CourseExport, teacher_id: int) -> int:
+    """
+    Insert one course tree with a bulk ``insert()`` per table and commit it
+    as a single transaction. Returns the new course id.
+    """
+    try:
+        course_id = db.scalar(
+            insert(models.Course).values(
+                title=record.title,
+                description=record.description,
+                thumbnail_url=record.thumbnail_url,
+                thumbnail_variants=images.variants_for_url(db, record.thumbnail_url),
+                video_url=record.video_url,
+                content_type=record.content_type,
+                is_published=record.is_published,
+                teacher_id=teacher_id
+            ).returning(models.Course.id)
+        )
+
+        module_ids: List[int] = []
+        if record.modules:
+            module_ids = db.scalars(
+                insert(models.Module).returning(models.Module.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "course_id": course_id,
+                        "title": module.title,
+                        "description": module.description,
+                        "content": module.content,
+                        "content_type": module.content_type,
+                        "duration": module.duration,
+                        "order": module.order_index,
+                        "is_published": module.is_published,
+                        **models.derive_content_fields(module.content),
+                    }
+                    for module in record.modules
+                ]
+            ).all()
+
+        questions = [
+            (module_id, question)
+            for module_id, module in zip(module_ids, record.modules)
+            for question in module.questions
+        ]
+        if questions:
+            question_ids = db.scalars(
+                insert(models.QuizQuestion).returning(models.QuizQuestion.id, sort_by_parameter_order=True),
+                [
+                    {"module_id": module_id, "question": question.question, "points": question.points}
+                    for module_id, question in questions
+                ]
+            ).all()
+
+            options = [
+                {"question_id": question_id, "option_text": option.option_text, "is_correct": option.is_correct}
+                for question_id, (_, question) in zip(question_ids, questions)
+                for option in question.options
+            ]
+            if options:
+                db.execute(insert(models.QuizOption), options)
+
+        # Bulk inserts bypass the ORM flush hook that maintains the index
+        if search_index.enabled:
+            search_index.reindex(db.connection(), [course_id], module_ids)
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return course_id
+
+
+def import_courses(db: Session, lines: Iterable[str], teacher_id: int) -> schemas.CourseImportResult:
+    """
+    Import JSON Lines course records, one transaction per course. Invalid
+    records are reported by line number and skipped.
+    """
+    result = schemas.CourseImportResult()
+    errors_seen = 0
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = schemas.CourseExport.model_validate_json(line)
+            result.course_ids.append(import_course(db, record, teacher_id))
+        except ValidationError as e:
+            error = e.errors()[0]
+            message = f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+        except SQLAlchemyError as e:
+            logger.warning("Could not import course on line %s: %s", number, e)
+            message = "Database error while importing this course"
+        else:
+            continue
+
+        errors_seen += 1
+        if errors_seen <= MAX_REPORTED_ERRORS:
+            result.errors.append(schemas.CourseImportError(line=number, error=message))
+
+    result.imported = len(result.course_ids)
+    if result.imported:
+        catalog.invalidate_catalog()
+        dashboard.invalidate_teacher(teacher_id)
+    return result
+
+
+def _ranked_modules(course_id: int):
+    """Ids of the course's modules, numbered in id order."""
+    return select(
+        models.Module.id,
+        func.row_number().over(order_by=models.Module.id).label("position")
+    ).where(models.Module.course_id == course_id).subquery()
+
+
+def _ranked_questions(course_id: int):
+    """Ids of the course's quiz questions, numbered in id order."""
+    return select(
+        models.QuizQuestion.id,
+        func.row_number().over(order_by=models.QuizQuestion.id).label("position")
+    ).join(
+        models.Module, models.Module.id == models.QuizQuestion.module_id
+    ).where(models.Module.course_id == course_id).subquery()
+
+
+def clone_course(db: Session, source: models.Course, teacher_id: int, title: Optional[str] = None) -> int:
+    """
+    Copy a course tree inside the database with one ``INSERT ... SELECT``
+    per table and return the new course id. The copy is unpublished.
+
+    Children are copied in id order, so the n-th module (or question) of
+    the copy is the copy of the n-th one of the source; joining both sides
+    on ``row_number()`` remaps parent ids without reading rows back.
+    """
+    try:
+        course_id = db.scalar(
+            insert(models.Course).values(
+                title=title or f"{source.title} (copy)",
+                description=source.description,
+                thumbnail_url=source.thumbnail_url,
+                thumbnail_variants=source.thumbnail_variants,
+                video_url=source.video_url,
+                content_type=source.content_type,
+                is_published=False,
+                teacher_id=teacher_id
+            ).returning(models.Course.id)
+        )
+
+        module_columns = [
+            "title", "description", "content", "content_type", "duration", "order", "is_published",
+            "content_length", "content_hash", "content_html", "content_text",
+        ]
+        db.execute(insert(models.Module).from_select(
+            ["course_id"] + module_columns,
+            select(
+                literal(course_id),
+                *[getattr(models.Module, column) for column in module_columns]
+            ).where(models.Module.course_id == source.id).order_by(models.Module.id)
+        ))
+
+        old_modules = _ranked_modules(source.id)
+        new_modules = _ranked_modules(course_id)
+        db.execute(insert(models.QuizQuestion).from_select(
+            ["module_id", "question", "points"],
+            select(new_modules.c.id, models.QuizQuestion.question, models.QuizQuestion.points)
+            .join(old_modules, old_modules.c.id == models.QuizQuestion.module_id)
+            .join(new_modules, new_modules.c.position == old_modules.c.position)
+            .order_by(models.QuizQuestion.id)
+        ))
+
+        old_questions = _ranked_questions(source.id)
+        new_questions = _ranked_questions(course_id)
+        db.execute(insert(models.QuizOption).from_select(
+            ["question_id", "option_text", "is_correct"],
+            select(new_questions.c.id, models.QuizOption.option_text, models.QuizOption.is_correct)
+            .join(old_questions, old_questions.c.id == models.QuizOption.question_id)
+            .join(new_questions, new_questions.c.position == old_questions.c.position)
+            .order_by(models.QuizOption.id)
+        ))
+
+        if search_index.enabled:
+            module_ids = db.scalars(
+                select(models.Module.id).where(models.Module.course_id == course_id)
+            ).all()
+            search_index.reindex(db.connection(), [course_id], module_ids)
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return course_id
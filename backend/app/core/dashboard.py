@@ -0,0 +1,104 @@
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from .. import models
+from . import metrics
+from .cache import TTLCache
+from .config import settings
+
+# Dashboard rows keyed by teacher id (None for the admin view of every
+# course). Each value carries the ids of the courses it covers so writes to
+# one course only drop the entries that include it.
+dashboard_cache = TTLCache(maxsize=1024, ttl=settings.DASHBOARD_CACHE_TTL)
+metrics.register("dashboard_cache", dashboard_cache.stats)
+
+
+def query_course_stats(db: Session, teacher_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Per-course enrollment, completion, progress and quiz figures in one
+    statement: each course row is joined to one grouped pass over
+    ``enrollments`` and one over ``quiz_submissions`` (one row per graded
+    quiz, so the average is of quiz scores, not of individual answers).
+    """
+    courses = db.query(models.Course.id)
+    if teacher_id is not None:
+        courses = courses.filter(models.Course.teacher_id == teacher_id)
+    course_ids = courses.scalar_subquery()
+
+    enrollment_stats = db.query(
+        models.Enrollment.course_id.label("course_id"),
+        func.count(models.Enrollment.id).label("enrollments"),
+        func.sum(case((models.Enrollment.completed == True, 1), else_=0)).label("completions"),
+        func.avg(models.Enrollment.progress).label("average_progress")
+    ).filter(
+        models.Enrollment.course_id.in_(course_ids)
+    ).group_by(models.Enrollment.course_id).subquery()
+
+    quiz_stats = db.query(
+        models.Module.course_id.label("course_id"),
+        func.count(models.QuizSubmission.id).label("attempts"),
+        func.avg(models.QuizSubmission.score).label("average_score")
+    ).join(
+        models.Module, models.Module.id == models.QuizSubmission.module_id
+    ).filter(
+        models.Module.course_id.in_(course_ids)
+    ).group_by(models.Module.course_id).subquery()
+
+    query = db.query(
+        models.Course.id,
+        models.Course.title,
+        models.Course.is_published,
+        enrollment_stats.c.enrollments,
+        enrollment_stats.c.completions,
+        enrollment_stats.c.average_progress,
+        quiz_stats.c.attempts,
+        quiz_stats.c.average_score
+    ).outerjoin(
+        enrollment_stats, enrollment_stats.c.course_id == models.Course.id
+    ).outerjoin(
+        quiz_stats, quiz_stats.c.course_id == models.Course.id
+    )
+    if teacher_id is not None:
+        query = query.filter(models.Course.teacher_id == teacher_id)
+
+    rows = []
+    for row in query.order_by(models.Course.created_at.desc(), models.Course.id.desc()):
+        enrollments = row.enrollments or 0
+        completions = row.completions or 0
+        rows.append({
+            "course_id": row.id,
+            "title": row.title,
+            "is_published": bool(row.is_published),
+            "enrollment_count": enrollments,
+            "completion_count": completions,
+            "completion_rate": round(completions / enrollments, 4) if enrollments else 0.0,
+            "average_progress": round(float(row.average_progress or 0), 2),
+            "quiz_attempt_count": row.attempts or 0,
+            "average_quiz_score": (
+                round(float(row.average_score), 2) if row.average_score is not None else None
+            ),
+        })
+    return rows
+
+
+def get_course_stats(db: Session, teacher_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """query_course_stats() behind the dashboard cache."""
+    entry: Optional[Tuple[FrozenSet[int], List[Dict[str, Any]]]] = dashboard_cache.get(teacher_id)
+    if entry is None:
+        rows = query_course_stats(db, teacher_id)
+        entry = (frozenset(row["course_id"] for row in rows), rows)
+        dashboard_cache.set(teacher_id, entry)
+    return entry[1]
+
+
+def invalidate_course(course_id: int) -> None:
+    """Drop cached dashboards covering ``course_id`` (call after the write commits)."""
+    dashboard_cache.discard_where(lambda _, entry: course_id in entry[0])
+
+
+def invalidate_teacher(teacher_id: int) -> None:
+    """Drop the dashboards that list ``teacher_id``'s courses, e.g. after one is created."""
+    dashboard_cache.pop(teacher_id)
+    dashboard_cache.pop(None)
@@ -0,0 +1,110 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+from typing import Any, Callable, Dict
+import asyncio
+import time
+
+from fastapi import HTTPException, status
+
+from . import metrics
+from .config import settings
+
+
+def _percentile(samples, fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class PasswordHashPool:
+    """
+    Dedicated, size-limited executor for password hashing and verification.
+
+    bcrypt releases the GIL, so a small thread pool keeps every core busy
+    without competing with the shared Starlette threadpool that serves the
+    sync routes. At most ``workers + queue_size`` jobs are admitted at once;
+    anything beyond that is rejected straight away with a 503.
+    """
+
+    def __init__(self, workers: int, queue_size: int, retry_after: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="password-hash",
+        )
+        self._slots = BoundedSemaphore(workers + queue_size)
+        self._lock = Lock()
+        self._admitted = 0
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self._hash_ms = deque(maxlen=512)
+        self._wait_ms = deque(maxlen=512)
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run ``func(*args)`` on the pool, or raise a 503 if it is saturated."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="The server is busy signing other users in. Please try again shortly.",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+        with self._lock:
+            self._admitted += 1
+        future = self._executor.submit(self._timed, func, args, time.perf_counter())
+        # Free the slot when the work actually finishes, even if the
+        # awaiting request has gone away in the meantime
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _timed(self, func: Callable[..., Any], args: tuple, submitted: float) -> Any:
+        started = time.perf_counter()
+        with self._lock:
+            self._running += 1
+            self._wait_ms.append((started - submitted) * 1000)
+        try:
+            return func(*args)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._running -= 1
+                self.completed += 1
+                self._hash_ms.append(elapsed)
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._admitted -= 1
+        self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hash_ms = list(self._hash_ms)
+            wait_ms = list(self._wait_ms)
+            running = self._running
+            queued = self._admitted - running
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "running": running,
+            "queue_depth": max(queued, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "hash_ms_p50": round(_percentile(hash_ms, 0.50), 2),
+            "hash_ms_p95": round(_percentile(hash_ms, 0.95), 2),
+            "queue_wait_ms_p95": round(_percentile(wait_ms, 0.95), 2),
+        }
+
+
+password_pool = PasswordHashPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+    retry_after=settings.PASSWORD_HASH_RETRY_AFTER,
+)
+metrics.register("password_hash_pool", password_pool.stats)
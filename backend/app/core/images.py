@@ -0,0 +1,231 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, List, Optional, Set, Tuple
+import logging
+import re
+
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..config import settings  # upload settings live with the app settings
+from ..database import SessionLocal, get_db_session
+from . import catalog, metrics
+from .uploads import media_store
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow not installed: courses keep only their original image
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp"}
+
+# Thumbnails stored by the media store, whether the URL is absolute or not
+_MEDIA_URL = re.compile(r"/api/media/([0-9a-f]{64})\.([a-z0-9]{1,10})$")
+
+
+def source_of(url: Optional[str]) -> Optional[Tuple[str, str]]:
+    """(sha256, extension) of a media-store image URL, else None."""
+    match = _MEDIA_URL.search(url) if url else None
+    if not match or match.group(2) not in IMAGE_EXTENSIONS:
+        return None
+    return match.group(1), match.group(2)
+
+
+def render_variants(path: Path, widths: List[int], quality: int) -> List[Tuple[int, int, str, bytes]]:
+    """
+    Resize an image to each width (never upscaling) and encode it as WebP,
+    when this Pillow build supports it, and as JPEG, or PNG for images with
+    transparency. Returns (width, height, content type, data) tuples.
+    """
+    with Image.open(path) as image:
+        # JPEG can be decoded straight at a reduced scale (at least the
+        # largest width on both sides, whichever way EXIF rotates it)
+        image.draft("RGB", (max(widths), max(widths)))
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+        formats = [("WEBP", "image/webp")] if features.check("webp") else []
+        formats.append(("PNG", "image/png") if has_alpha else ("JPEG", "image/jpeg"))
+
+        variants = []
+        for width in sorted({min(width, image.width) for width in widths}):
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            for image_format, content_type in formats:
+                buffer = BytesIO()
+                resized.save(buffer, image_format, quality=quality, optimize=True)
+                variants.append((width, height, content_type, buffer.getvalue()))
+        return variants
+
+
+def load_variants(db: Session, sha256: str) -> Optional[List[Dict[str, Any]]]:
+    """The stored variant set of an image, smallest first, or None if there is none yet."""
+    rows = db.execute(
+        select(
+            models.ImageVariant.width,
+            models.ImageVariant.height,
+            models.ImageVariant.content_type,
+            models.MediaFile.sha256,
+            models.MediaFile.extension
+        ).join(
+            models.MediaFile, models.MediaFile.id == models.ImageVariant.media_file_id
+        ).where(
+            models.ImageVariant.source_sha256 == sha256
+        ).order_by(models.ImageVariant.content_type, models.ImageVariant.width)
+    ).all()
+    if not rows:
+        return None
+    return [
+        {
+            "url": f"/api/media/{row.sha256}.{row.extension}",
+            "width": row.width,
+            "height": row.height,
+            "content_type": row.content_type,
+        }
+        for row in rows
+    ]
+
+
+def variants_for_url(db: Session, url: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+    source = source_of(url)
+    return load_variants(db, source[0]) if source else None
+
+
+class ImageVariantPool:
+    """
+    Background pool that makes the variants of uploaded images.
+
+    Each image is processed once: its variants are stored as media files
+    (content-addressed and served with immutable caching) and recorded in
+    ``image_variants``, then copied onto every course whose thumbnail is
+    that image, so serving a course never looks variants up. Images that
+    are already queued, or already have variants, are skipped.
+    """
+
+    def __init__(self, workers: int, widths: List[int], quality: int):
+        self.workers = workers
+        self.widths = widths
+        self.quality = quality
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(workers, 1),
+            thread_name_prefix="image-variants",
+        )
+        self._lock = Lock()
+        self._pending: Set[str] = set()
+        self.generated = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return Image is not None and self.workers > 0 and bool(self.widths)
+
+    def schedule(self, sha256: str, extension: str) -> bool:
+        """Queue an image for processing; False if it isn't one or is already queued."""
+        if not self.enabled or extension not in IMAGE_EXTENSIONS:
+            return False
+        with self._lock:
+            if sha256 in self._pending:
+                return False
+            self._pending.add(sha256)
+        self._executor.submit(self._run, sha256, extension)
+        return True
+
+    def _run(self, sha256: str, extension: str) -> None:
+        try:
+            with get_db_session() as db:
+                self.process(db, sha256, extension)
+        except Exception:
+            logger.exception("Could not make variants of image %s", sha256)
+            with self._lock:
+                self.failed += 1
+        finally:
+            with self._lock:
+                self._pending.discard(sha256)
+
+    def process(self, db: Session, sha256: str, extension: str) -> List[Dict[str, Any]]:
+        """Make the variants of one stored image if needed and attach them to its courses."""
+        variants = load_variants(db, sha256)
+        if variants is None:
+            rendered = render_variants(media_store.object_path(sha256, extension), self.widths, self.quality)
+            stored = [
+                (width, height, content_type, media_store.store_bytes(db, data, content_type.split("/")[1], content_type))
+                for width, height, content_type, data in rendered
+            ]
+            db.add_all([
+                models.ImageVariant(
+                    source_sha256=sha256,
+                    width=width,
+                    height=height,
+                    content_type=content_type,
+                    media_file_id=media.id
+                )
+                for width, height, content_type, media in stored
+            ])
+            try:
+                db.commit()
+                with self._lock:
+                    self.generated += 1
+            except IntegrityError:
+                # Another worker made them first
+                db.rollback()
+            variants = load_variants(db, sha256)
+
+        result = db.execute(
+            update(models.Course).where(
+                models.Course.thumbnail_url.like(f"%/api/media/{sha256}.%")
+            ).values(thumbnail_variants=variants)
+        )
+        db.commit()
+        if result.rowcount:
+            catalog.invalidate_catalog()
+        return variants
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "pending": len(self._pending),
+                "generated": self.generated,
+                "failed": self.failed,
+            }
+
+
+def _before_flush(session: Session, flush_context, instances) -> None:
+    """Give courses whose thumbnail changed the variant set of the new image."""
+    for instance in list(session.new) + list(session.dirty):
+        if not isinstance(instance, models.Course):
+            continue
+        if instance in session.dirty and not inspect(instance).attrs.thumbnail_url.history.has_changes():
+            continue
+        source = source_of(instance.thumbnail_url)
+        instance.thumbnail_variants = load_variants(session, source[0]) if source else None
+        if source and instance.thumbnail_variants is None:
+            # Made after commit, so the worker's update can see this course
+            session.info.setdefault("image_variants", set()).add(source)
+
+
+def _after_commit(session: Session) -> None:
+    for sha256, extension in session.info.pop("image_variants", ()):
+        image_variants.schedule(sha256, extension)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop("image_variants", None)
+
+
+image_variants = ImageVariantPool(
+    workers=settings.IMAGE_VARIANT_WORKERS,
+    widths=[int(width) for width in settings.IMAGE_VARIANT_WIDTHS.split(",") if width.strip()],
+    quality=settings.IMAGE_VARIANT_QUALITY,
+)
+event.listen(SessionLocal, "before_flush", _before_flush)
+event.listen(SessionLocal, "after_commit", _after_commit)
+event.listen(SessionLocal, "after_rollback", _after_rollback)
+metrics.register("image_variants", image_variants.stats)
@@ -0,0 +1,205 @@
+from contextvars import ContextVar
+from queue import Empty, SimpleQueue
+from threading import Thread
+from typing import Any, Dict, Optional
+import atexit
+import json
+import logging
+import logging.handlers
+import random
+import sys
+import time
+import uuid
+
+from .config import settings
+
+# Request-scoped fields. The middleware installs a fresh dict per request and
+# bind() updates it in place, so values set in threadpool dependencies are
+# still visible when the access log is written.
+_request_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_context", default=None)
+
+access_logger = logging.getLogger("app.access")
+
+
+def bind(**fields: Any) -> None:
+    """Attach fields (e.g. user_id) to the current request's log context."""
+    context = _request_context.get()
+    if context is not None:
+        context.update(fields)
+
+
+class ContextFilter(logging.Filter):
+    """Copy the request context onto each record when it is emitted."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _request_context.get() or {}
+        record.request_id = context.get("request_id")
+        record.user_id = context.get("user_id")
+        record.route = context.get("route")
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in ("request_id", "user_id", "route"):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        http = getattr(record, "http", None)
+        if http:
+            entry["http"] = http
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        http = getattr(record, "http", None)
+        if http:
+            line += " " + " ".join(f"{key}={value}" for key, value in http.items())
+        return line
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue records without formatting them; the writer thread formats them.
+    Safe because the queue never leaves the process.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class BatchWriter(Thread):
+    """Drain queued records and write them in batches on a background thread."""
+
+    def __init__(self, queue: SimpleQueue, formatter: logging.Formatter, batch_size: int, stream=None):
+        super().__init__(name="log-writer", daemon=True)
+        self.queue = queue
+        self.formatter = formatter
+        self.batch_size = batch_size
+        self.stream = stream or sys.stderr
+
+    def run(self) -> None:
+        while True:
+            record = self.queue.get()
+            if record is None:
+                return
+            batch = [record]
+            while len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get_nowait()
+                except Empty:
+                    break
+                if record is None:
+                    self._write(batch)
+                    return
+                batch.append(record)
+            self._write(batch)
+
+    def _write(self, batch) -> None:
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self.formatter.format(record))
+            except Exception:
+                lines.append(f"Unformattable log record from {record.name}: {record.msg!r}")
+        try:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+        except Exception:
+            pass
+
+    def stop(self) -> None:
+        self.queue.put(None)
+        self.join(timeout=5)
+
+
+_writer: Optional[BatchWriter] = None
+
+
+def configure_logging() -> None:
+    """Route all application logs through the batched background writer."""
+    global _writer
+    if _writer is not None:
+        return
+
+    formatter = JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter()
+    queue: SimpleQueue = SimpleQueue()
+    _writer = BatchWriter(queue, formatter, settings.LOG_BATCH_SIZE)
+    _writer.start()
+    atexit.register(_writer.stop)
+
+    handler = DeferredQueueHandler(queue)
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+
+class RequestContextMiddleware:
+    """
+    Pure ASGI middleware that sets up the request log context, echoes an
+    X-Request-ID header and writes a (sampled) access log line.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        context = {"request_id": request_id or uuid.uuid4().hex, "user_id": None, "route": None}
+        token = _request_context.set(context)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", ()))
+                headers.append((b"x-request-id", context["request_id"].encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            context["route"] = getattr(route, "path", None) or scope.get("path")
+            if access_logger.isEnabledFor(logging.INFO) and (
+                status_code >= 500 or random.random() < settings.ACCESS_LOG_SAMPLE_RATE
+            ):
+                access_logger.info(
+                    "%s %s %s",
+                    scope["method"],
+                    context["route"],
+                    status_code,
+                    extra={"http": {
+                        "method": scope["method"],
+                        "path": scope.get("path"),
+                        "status": status_code,
+                        "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                    }},
+                )
+            _request_context.reset(token)
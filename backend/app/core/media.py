@@ -0,0 +1,187 @@
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional, Tuple
+import os
+import re
+
+import anyio
+from starlette.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+
+from ..config import settings  # upload settings live with the app settings
+from . import metrics
+
+_BYTES_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# How response bodies were sent, and how many bytes
+_stats: Dict[str, int] = {
+    "full": 0,
+    "partial": 0,
+    "not_modified": 0,
+    "unsatisfiable": 0,
+    "accel_redirect": 0,
+    "pathsend": 0,
+    "zerocopy": 0,
+    "streamed": 0,
+    "bytes_sent": 0,
+}
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Return the (first, last) byte offsets of a single-range ``Range``
+    header. ``None`` means send the whole file, which is also how
+    multi-range and malformed headers are answered; a range starting past
+    the end raises RangeNotSatisfiable.
+    """
+    match = _BYTES_RANGE.match(header.strip()) if header else None
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        if not int(last) or not size:
+            raise RangeNotSatisfiable()
+        return max(size - int(last), 0), size - 1
+    if last and int(last) < int(first):
+        return None
+    if int(first) >= size:
+        raise RangeNotSatisfiable()
+    return int(first), min(int(last), size - 1) if last else size - 1
+
+
+def _not_modified(headers: Mapping[str, str], etag: str, mtime: float) -> bool:
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class RangeFileResponse(FileResponse):
+    """
+    ``FileResponse`` for ``count`` bytes of a file starting at ``offset``.
+
+    The body is handed to the server when it offers the ASGI
+    ``http.response.pathsend`` (whole files) or ``http.response.zerocopy``
+    extension, so the kernel copies it; otherwise it is read in blocks of
+    ``MEDIA_BLOCK_SIZE`` off the event loop.
+    """
+
+    chunk_size = settings.MEDIA_BLOCK_SIZE
+
+    def __init__(self, path: Path, offset: int, count: int, **kwargs: Any):
+        super().__init__(path, **kwargs)
+        self.offset = offset
+        self.count = count
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        extensions = scope.get("extensions") or {}
+        if self.send_header_only or not self.count:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif "http.response.pathsend" in extensions and self.offset == 0 and self.count == self.stat_result.st_size:
+            _stats["pathsend"] += 1
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+        elif "http.response.zerocopy" in extensions:
+            _stats["zerocopy"] += 1
+            with await anyio.to_thread.run_sync(open, self.path, "rb") as file:
+                await send({
+                    "type": "http.response.zerocopy",
+                    "file": file,
+                    "offset": self.offset,
+                    "count": self.count,
+                    "more_body": False,
+                })
+        else:
+            _stats["streamed"] += 1
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                await file.seek(self.offset)
+                remaining = self.count
+                while remaining:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    # A file truncated under us ends the body early
+                    remaining = remaining - len(chunk) if chunk else 0
+                    await send({"type": "http.response.body", "body": chunk, "more_body": bool(remaining)})
+        if not self.send_header_only:
+            _stats["bytes_sent"] += self.count
+        if self.background is not None:
+            await self.background()
+
+
+def file_response(
+    headers: Mapping[str, str],
+    method: str,
+    path: Path,
+    media_type: str,
+    etag: str,
+    cache_control: str,
+    accel_redirect: Optional[str] = None
+) -> Response:
+    """
+    Answer a GET or HEAD of ``path``: 304 for a matching ``If-None-Match``
+    or ``If-Modified-Since``, 206 for a single satisfiable ``Range`` (unless
+    ``If-Range`` is stale), 416 past the end, else the whole file. With
+    ``accel_redirect`` the body is left to the fronting proxy.
+    """
+    stat_result = os.stat(path)
+    common = {
+        "accept-ranges": "bytes",
+        "cache-control": cache_control,
+        "etag": etag,
+        "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+    }
+
+    if _not_modified(headers, etag, stat_result.st_mtime):
+        _stats["not_modified"] += 1
+        return Response(status_code=304, headers=common)
+
+    if accel_redirect is not None:
+        # The proxy serves the file itself, ranges included
+        _stats["accel_redirect"] += 1
+        return Response(media_type=media_type, headers={**common, "x-accel-redirect": accel_redirect})
+
+    size = stat_result.st_size
+    if_range = headers.get("if-range")
+    try:
+        byte_range = None
+        if if_range is None or if_range.strip() in (etag, common["last-modified"]):
+            byte_range = parse_range(headers.get("range"), size)
+    except RangeNotSatisfiable:
+        _stats["unsatisfiable"] += 1
+        return Response(status_code=416, headers={**common, "content-range": f"bytes */{size}"})
+
+    if byte_range is None:
+        _stats["full"] += 1
+        first, last, status_code = 0, size - 1, 200
+    else:
+        _stats["partial"] += 1
+        (first, last), status_code = byte_range, 206
+        common["content-range"] = f"bytes {first}-{last}/{size}"
+    return RangeFileResponse(
+        path,
+        offset=first,
+        count=last - first + 1,
+        status_code=status_code,
+        headers={**common, "content-length": str(last - first + 1)},
+        media_type=media_type,
+        stat_result=stat_result,
+        method=method
+    )
+
+
+metrics.register("media", lambda: dict(_stats))
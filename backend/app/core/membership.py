@@ -0,0 +1,130 @@
+from dataclasses import dataclass
+from typing import Any, Callable, FrozenSet, Optional
+
+from fastapi import Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..auth import get_current_principal
+from ..database import get_db
+from . import metrics
+from .cache import TTLCache
+from .config import settings
+
+# Enrolled course ids keyed by user id
+membership_cache = TTLCache(maxsize=settings.MEMBERSHIP_CACHE_SIZE, ttl=settings.MEMBERSHIP_CACHE_TTL)
+metrics.register("membership_cache", membership_cache.stats)
+
+# Course id keyed by module id; modules never move between courses
+module_course_cache = TTLCache(maxsize=settings.MEMBERSHIP_CACHE_SIZE, ttl=settings.MEMBERSHIP_CACHE_TTL)
+metrics.register("module_course_cache", module_course_cache.stats)
+
+
+def _load(db: Session, user_id: int) -> FrozenSet[int]:
+    course_ids = frozenset(
+        course_id for (course_id,) in db.query(models.Enrollment.course_id).filter(
+            models.Enrollment.user_id == user_id
+        )
+    )
+    membership_cache.set(user_id, course_ids)
+    return course_ids
+
+
+def enrolled_course_ids(db: Session, user_id: int) -> FrozenSet[int]:
+    course_ids = membership_cache.get(user_id)
+    if course_ids is None:
+        course_ids = _load(db, user_id)
+    return course_ids
+
+
+def is_enrolled(db: Session, user_id: int, course_id: int) -> bool:
+    if course_id in enrolled_course_ids(db, user_id):
+        return True
+    # The enrollment may have been made by another worker; look again
+    # before refusing, as refusals are rare
+    return course_id in _load(db, user_id)
+
+
+def enrolled(user_id: int, course_id: int) -> None:
+    """Add a committed enrollment to the user's cached set, if cached."""
+    course_ids = membership_cache.get(user_id)
+    if course_ids is not None:
+        membership_cache.set(user_id, course_ids | {course_id})
+
+
+def unenrolled(user_id: int, course_id: int) -> None:
+    course_ids = membership_cache.get(user_id)
+    if course_ids is not None:
+        membership_cache.set(user_id, course_ids - {course_id})
+
+
+def forget_course(course_id: int) -> None:
+    """Drop a deleted course from every cached set."""
+    membership_cache.discard_where(lambda user_id, course_ids: course_id in course_ids)
+    module_course_cache.discard_where(lambda module_id, cached: cached == course_id)
+
+
+def forget_user(user_id: int) -> None:
+    membership_cache.pop(user_id)
+
+
+def module_course_id(db: Session, module_id: int) -> Optional[int]:
+    course_id = module_course_cache.get(module_id)
+    if course_id is None:
+        course_id = db.query(models.Module.course_id).filter(models.Module.id == module_id).scalar()
+        if course_id is not None:
+            module_course_cache.set(module_id, course_id)
+    return course_id
+
+
+def check_enrolled(db: Session, user: Any, course_id: int, allow_admin: bool = True) -> None:
+    """Raise a 403 unless the user is enrolled in the course; admins get a 404 for missing courses."""
+    if allow_admin and user.role == models.UserRole.ADMIN:
+        if not db.query(models.Course.id).filter(models.Course.id == course_id).first():
+            raise HTTPException(status_code=404, detail="Course not found")
+        return
+    if not is_enrolled(db, user.id, course_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You are not enrolled in this course"
+        )
+
+
+@dataclass(frozen=True)
+class ModuleAccess:
+    """The caller of a module route and the course the module belongs to."""
+    user: Any
+    module_id: int
+    course_id: int
+
+
+def course_member(user_dependency: Callable = get_current_principal, allow_admin: bool = True) -> Callable:
+    """
+    Dependency for routes under a ``course_id``: the caller from
+    ``user_dependency``, who must be enrolled in the course. Admins pass
+    unless ``allow_admin`` is off (routes that write learner state).
+    """
+    def dependency(
+        course_id: int,
+        db: Session = Depends(get_db),
+        current_user: Any = Depends(user_dependency)
+    ) -> Any:
+        check_enrolled(db, current_user, course_id, allow_admin)
+        return current_user
+    return dependency
+
+
+def module_member(user_dependency: Callable = get_current_principal, allow_admin: bool = True) -> Callable:
+    """Like ``course_member`` for routes under a ``module_id``; 404 for unknown modules."""
+    def dependency(
+        module_id: int,
+        db: Session = Depends(get_db),
+        current_user: Any = Depends(user_dependency)
+    ) -> ModuleAccess:
+        course_id = module_course_id(db, module_id)
+        if course_id is None:
+            raise HTTPException(status_code=404, detail="Module not found")
+        if not (allow_admin and current_user.role == models.UserRole.ADMIN):
+            check_enrolled(db, current_user, course_id, allow_admin)
+        return ModuleAccess(user=current_user, module_id=module_id, course_id=course_id)
+    return dependency
@@ -0,0 +1,14 @@
+from typing import Any, Callable, Dict
+
+# Registry of named collectors; each returns a dict of current values
+_collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def register(name: str, collector: Callable[[], Dict[str, Any]]) -> None:
+    """Register a metrics collector under ``name`` (replaces any existing one)."""
+    _collectors[name] = collector
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    """Collect the current values from every registered collector."""
+    return {name: collector() for name, collector in _collectors.items()}
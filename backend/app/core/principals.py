@@ -0,0 +1,130 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from .. import models
+from . import metrics
+from .cache import TTLCache
+from .config import settings
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The subset of a user row needed to authorize a request."""
+    id: int
+    email: str
+    role: models.UserRole
+    is_active: bool
+    token_generation: int = 0
+
+
+# Per-process cache of principals, keyed by email (the token subject)
+principal_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL,
+)
+metrics.register("principal_cache", principal_cache.stats)
+
+# Per-process cache of user id -> current token generation (None when the
+# user is missing or inactive), used to validate claims-only tokens
+generation_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.TOKEN_GENERATION_TTL,
+)
+metrics.register("token_generation_cache", generation_cache.stats)
+
+_MISSING = object()
+
+
+def cache_user(user: models.User) -> Principal:
+    """Store the authorization fields of ``user`` in the principal cache."""
+    principal = Principal(
+        id=user.id,
+        email=user.email,
+        role=user.role,
+        is_active=bool(user.is_active),
+        token_generation=user.token_generation or 0,
+    )
+    principal_cache.set(user.email, principal)
+    return principal
+
+
+def load_user(db: Session, email: str) -> Optional[models.User]:
+    """
+    Return the user for ``email``, skipping the users query on a cache hit.
+
+    On a hit the user is attached to ``db`` from the cached principal without
+    a SELECT; any other column is loaded by primary key on first access, and
+    changes made to the instance are flushed as usual.
+    """
+    principal = principal_cache.get(email)
+    if principal is None:
+        user = db.query(models.User).filter(models.User.email == email).first()
+        if user is not None:
+            cache_user(user)
+        return user
+
+    user = models.User(
+        id=principal.id,
+        email=principal.email,
+        role=principal.role,
+        is_active=principal.is_active,
+        token_generation=principal.token_generation,
+    )
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+
+def current_generation(db: Session, user_id: int) -> Optional[int]:
+    """
+    Return the token generation of an active user, or None if the user no
+    longer exists or is inactive. Cached for TOKEN_GENERATION_TTL seconds.
+    """
+    generation = generation_cache.get(user_id, _MISSING)
+    if generation is _MISSING:
+        row = db.query(
+            models.User.token_generation,
+            models.User.is_active
+        ).filter(models.User.id == user_id).first()
+        generation = (row.token_generation or 0) if row and row.is_active else None
+        generation_cache.set(user_id, generation)
+    return generation
+
+
+def principal_from_claims(payload: Dict[str, Any]) -> Optional[Principal]:
+    """Build a principal from verified token claims, or None if any are missing."""
+    email = payload.get("sub")
+    user_id = payload.get("user_id")
+    role = payload.get("role")
+    if not email or user_id is None or role is None:
+        return None
+    try:
+        role = models.UserRole(role)
+    except ValueError:
+        return None
+    return Principal(
+        id=int(user_id),
+        email=email,
+        role=role,
+        is_active=True,
+        token_generation=int(payload.get("gen", 0)),
+    )
+
+
+def authorization_changed(user: models.User, update_data: Dict[str, Any]) -> bool:
+    """Whether applying ``update_data`` would change the user's role or status."""
+    return any(
+        field in update_data and update_data[field] != getattr(user, field)
+        for field in ("role", "is_active")
+    )
+
+
+def bump_token_generation(user: models.User) -> None:
+    """Invalidate every token issued to ``user`` so far (flushed on commit)."""
+    user.token_generation = (user.token_generation or 0) + 1
+
+
+def invalidate_user(user_id: int) -> None:
+    """Drop any cached principal for ``user_id`` (call after the write commits)."""
+    principal_cache.discard_where(lambda _, principal: principal.id == user_id)
+    generation_cache.pop(user_id)
@@ -0,0 +1,177 @@
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import Integer, and_, case, func, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .. import models
+from . import membership, metrics
+from .cache import TTLCache
+from .config import settings
+
+# Published-module count keyed by course id. Module writes in this process
+# drop the entry; other workers pick changes up within MODULE_COUNT_CACHE_TTL.
+module_count_cache = TTLCache(maxsize=4096, ttl=settings.MODULE_COUNT_CACHE_TTL)
+metrics.register("module_count_cache", module_count_cache.stats)
+
+
+def published_module_count(db: Session, course_id: int) -> int:
+    count = module_count_cache.get(course_id)
+    if count is None:
+        count = db.query(func.count(models.Module.id)).filter(
+            models.Module.course_id == course_id,
+            models.Module.is_published == True
+        ).scalar()
+        module_count_cache.set(course_id, count)
+    return count
+
+
+def _progress(completed, total: int):
+    """Percentage for ``completed`` of ``total`` modules, as a SQL expression."""
+    if total <= 0:
+        return 100
+    return case((completed >= total, 100), else_=completed * 100 // total)
+
+
+def _not_enrolled(db: Session, user_id: int, course_id: int) -> None:
+    """Undo the completion of a learner unenrolled since the check, and refuse."""
+    db.rollback()
+    membership.unenrolled(user_id, course_id)
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="You are not enrolled in this course"
+    )
+
+
+def _check_enrollment(db: Session, user_id: int, course_id: int) -> None:
+    if not db.query(models.Enrollment.id).filter(
+        models.Enrollment.user_id == user_id,
+        models.Enrollment.course_id == course_id
+    ).first():
+        _not_enrolled(db, user_id, course_id)
+
+
+def record_completion(
+    db: Session,
+    user_id: int,
+    course_id: int,
+    module: models.Module
+) -> Tuple[bool, Optional[int]]:
+    """
+    Record that the user completed ``module``. Returns whether it was new
+    and the enrollment's new progress (None when unchanged).
+
+    The completion row's unique key makes repeats no-ops, and the counter
+    is bumped by one ``UPDATE``, so concurrent completions never lose an
+    increment. Unpublished modules are recorded but don't count. Raises a
+    403, recording nothing, if the enrollment is gone (e.g. the learner was
+    unenrolled by another worker since the membership check).
+    """
+    try:
+        db.add(models.ModuleCompletion(user_id=user_id, module_id=module.id, course_id=course_id))
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        return False, None
+    if not module.is_published:
+        _check_enrollment(db, user_id, course_id)
+        db.commit()
+        return True, None
+
+    total = published_module_count(db, course_id)
+    if total <= 0:
+        # This module is published, so a zero count is a stale cache entry
+        module_count_cache.pop(course_id)
+        total = published_module_count(db, course_id)
+        if total <= 0:
+            # Unpublished meanwhile
+            _check_enrollment(db, user_id, course_id)
+            db.commit()
+            return True, None
+
+    completed = models.Enrollment.completed_modules + 1
+    finished = completed >= total
+    derived = _progress(completed, total)
+    recorded = func.coalesce(models.Enrollment.progress, 0)
+    updated = db.execute(
+        update(models.Enrollment).where(
+            models.Enrollment.user_id == user_id,
+            models.Enrollment.course_id == course_id
+        ).values(
+            completed_modules=completed,
+            # Never below progress recorded before completions were counted
+            progress=case((derived > recorded, derived), else_=recorded),
+            completed=case((finished, True), else_=models.Enrollment.completed),
+            completed_at=case(
+                (and_(finished, models.Enrollment.completed_at.is_(None)), func.now()),
+                else_=models.Enrollment.completed_at
+            )
+        ).returning(models.Enrollment.progress)
+    ).first()
+    if updated is None:
+        _not_enrolled(db, user_id, course_id)
+    db.commit()
+    return True, updated.progress
+
+
+def backfill_completed_modules(connection: Connection) -> None:
+    """
+    Seed ``completed_modules`` of enrollments that predate it from their
+    progress percentage, so the next completion counts on from there.
+
+    The old code added ``100 // published`` per completion (capped at 100),
+    so the count is the progress divided by that step, rounded up: 33, 66
+    and 99 of a 3-module course are 1, 2 and 3 modules.
+    """
+    published = select(func.count(models.Module.id)).where(
+        models.Module.course_id == models.Enrollment.course_id,
+        models.Module.is_published == True
+    ).scalar_subquery()
+    # Over 100 modules the old step was 0, so only 100% said anything
+    step = case((published > 100, 100), else_=100 // func.nullif(published, 0, type_=Integer))
+    counted = (models.Enrollment.progress + step - 1) // step
+    connection.execute(
+        update(models.Enrollment).where(
+            models.Enrollment.progress > 0
+        ).values(completed_modules=case(
+            (published == 0, 0),
+            (models.Enrollment.progress >= 100, published),
+            (counted > published, published),
+            else_=counted
+        ))
+    )
+
+
+def clear_completions(db: Session, user_id: int, course_id: int) -> None:
+    """Forget the user's completions in a course (on unenroll); not committed."""
+    db.query(models.ModuleCompletion).filter(
+        models.ModuleCompletion.course_id == course_id,
+        models.ModuleCompletion.user_id == user_id
+    ).delete(synchronize_session=False)
+
+
+def modules_changed(db: Session, course_id: int) -> None:
+    """
+    Re-derive progress for a course after modules were added, removed,
+    published or unpublished; not committed. Each enrollment is recounted
+    from that learner's completions in the course only.
+    """
+    module_count_cache.pop(course_id)
+    total = published_module_count(db, course_id)
+    completed = select(func.count(models.ModuleCompletion.id)).join(
+        models.Module, models.Module.id == models.ModuleCompletion.module_id
+    ).where(
+        models.ModuleCompletion.course_id == course_id,
+        models.ModuleCompletion.user_id == models.Enrollment.user_id,
+        models.Module.is_published == True
+    ).scalar_subquery()
+    db.execute(
+        update(models.Enrollment).where(
+            models.Enrollment.course_id == course_id
+        ).values(
+            completed_modules=completed,
+            progress=_progress(completed, total)
+        ).execution_options(synchronize_session=False)
+    )
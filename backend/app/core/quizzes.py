@@ -0,0 +1,237 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+
+from .. import models, schemas
+from . import metrics
+from .cache import TTLCache
+from .config import settings
+
+PASSING_SCORE = 70  # percent
+SUBMISSION_RETRIES = 3
+
+# Compiled quiz keyed by module id
+quiz_cache = TTLCache(maxsize=4096, ttl=settings.QUIZ_CACHE_TTL)
+metrics.register("quiz_cache", quiz_cache.stats)
+
+
+@dataclass(frozen=True)
+class CompiledOption:
+    id: int
+    option_text: str
+    is_correct: bool
+    question_id: int
+
+
+@dataclass(frozen=True)
+class CompiledQuestion:
+    id: int
+    question: str
+    module_id: int
+    points: int
+    created_at: datetime
+    options: Tuple[CompiledOption, ...]
+
+
+@dataclass(frozen=True)
+class CompiledQuiz:
+    """
+    A module's questions and options in display order, with the answer key
+    (question id -> correct option ids) and the option ids each question
+    accepts, so grading never touches the database.
+    """
+    module_id: int
+    questions: Tuple[CompiledQuestion, ...]
+    answer_key: Mapping[int, FrozenSet[int]]
+    valid_options: Mapping[int, FrozenSet[int]]
+    points: Mapping[int, int]
+    total_points: int
+
+    def correct_option_id(self, question_id: int) -> Optional[int]:
+        return min(self.answer_key.get(question_id, ()), default=None)
+
+
+@dataclass(frozen=True)
+class Grade:
+    score: float
+    total_questions: int
+    correct_answers: int
+    passed: bool
+    # (question id, selected option id, is correct) per graded answer
+    answers: Tuple[Tuple[int, int, bool], ...] = field(default=())
+
+
+def compile_quiz(db: Session, module_id: int) -> CompiledQuiz:
+    questions = db.query(models.QuizQuestion).options(
+        selectinload(models.QuizQuestion.options)
+    ).filter(
+        models.QuizQuestion.module_id == module_id
+    ).order_by(models.QuizQuestion.id).all()
+
+    compiled = tuple(
+        CompiledQuestion(
+            id=question.id,
+            question=question.question,
+            module_id=question.module_id,
+            points=question.points if question.points is not None else 1,
+            created_at=question.created_at,
+            options=tuple(
+                CompiledOption(
+                    id=option.id,
+                    option_text=option.option_text,
+                    is_correct=bool(option.is_correct),
+                    question_id=option.question_id
+                )
+                for option in sorted(question.options, key=lambda option: option.id)
+            )
+        )
+        for question in questions
+    )
+    points = {question.id: question.points for question in compiled}
+    return CompiledQuiz(
+        module_id=module_id,
+        questions=compiled,
+        answer_key=MappingProxyType({
+            question.id: frozenset(option.id for option in question.options if option.is_correct)
+            for question in compiled
+        }),
+        valid_options=MappingProxyType({
+            question.id: frozenset(option.id for option in question.options)
+            for question in compiled
+        }),
+        points=MappingProxyType(points),
+        total_points=sum(points.values())
+    )
+
+
+def get_quiz(db: Session, module_id: int) -> CompiledQuiz:
+    quiz = quiz_cache.get(module_id)
+    if quiz is None:
+        quiz = compile_quiz(db, module_id)
+        quiz_cache.set(module_id, quiz)
+    return quiz
+
+
+def invalidate_quiz(module_id: int) -> None:
+    quiz_cache.pop(module_id)
+
+
+def grade(quiz: CompiledQuiz, answers: List[schemas.QuizAnswer]) -> Grade:
+    """
+    Grade answers against the answer key. Each question counts once (its
+    last answer); answers to other modules' questions are ignored. The
+    score is the percentage of points earned.
+    """
+    selected: Dict[int, int] = {}
+    for answer in answers:
+        if answer.question_id in quiz.answer_key:
+            selected[answer.question_id] = answer.selected_option_id
+
+    graded = tuple(
+        (question_id, option_id, option_id in quiz.answer_key[question_id])
+        for question_id, option_id in selected.items()
+    )
+    earned = sum(quiz.points[question_id] for question_id, _, is_correct in graded if is_correct)
+    score = earned / quiz.total_points * 100 if quiz.total_points > 0 else 0
+    return Grade(
+        score=score,
+        total_questions=len(quiz.questions),
+        correct_answers=sum(1 for _, _, is_correct in graded if is_correct),
+        passed=score >= PASSING_SCORE,
+        answers=graded
+    )
+
+
+def next_attempt_number(db: Session, user_id: int, module_id: int) -> int:
+    latest = db.query(func.max(models.QuizSubmission.attempt_number)).filter(
+        models.QuizSubmission.user_id == user_id,
+        models.QuizSubmission.module_id == module_id
+    ).scalar()
+    return (latest or 0) + 1
+
+
+def record_submission(
+    db: Session,
+    user_id: int,
+    quiz: CompiledQuiz,
+    result: Grade,
+    started_at: Optional[datetime] = None
+) -> models.QuizSubmission:
+    """
+    Store a graded submission under the user's next attempt number, with
+    one attempt row per graded answer written in a single insert, and
+    commit. Two submissions racing for the same number retry with the next.
+    """
+    for tries_left in range(SUBMISSION_RETRIES, 0, -1):
+        submission = models.QuizSubmission(
+            user_id=user_id,
+            module_id=quiz.module_id,
+            attempt_number=next_attempt_number(db, user_id, quiz.module_id),
+            score=result.score,
+            passed=result.passed,
+            correct_answers=result.correct_answers,
+            total_questions=result.total_questions,
+            started_at=started_at,
+            submitted_at=datetime.utcnow()
+        )
+        db.add(submission)
+        try:
+            db.flush()
+        except IntegrityError:
+            db.rollback()
+            if tries_left == 1:
+                raise
+            continue
+        rows: List[Dict[str, Any]] = [
+            {
+                "user_id": user_id,
+                "question_id": question_id,
+                "selected_option_id": option_id,
+                "is_correct": is_correct,
+                "submission_id": submission.id,
+            }
+            for question_id, option_id, is_correct in result.answers
+            # Options of other questions would break the foreign key
+            if option_id in quiz.valid_options[question_id]
+        ]
+        if rows:
+            db.execute(insert(models.QuizAttempt), rows)
+        db.commit()
+        return submission
+
+
+def latest_submission(db: Session, user_id: int, module_id: int) -> Optional[models.QuizSubmission]:
+    return db.query(models.QuizSubmission).filter(
+        models.QuizSubmission.user_id == user_id,
+        models.QuizSubmission.module_id == module_id
+    ).order_by(
+        models.QuizSubmission.submitted_at.desc(), models.QuizSubmission.id.desc()
+    ).first()
+
+
+def best_score(db: Session, user_id: int, module_id: int) -> Optional[float]:
+    return db.query(func.max(models.QuizSubmission.score)).filter(
+        models.QuizSubmission.user_id == user_id,
+        models.QuizSubmission.module_id == module_id
+    ).scalar()
+
+
+def submission_history(
+    db: Session,
+    user_id: int,
+    module_id: int,
+    skip: int = 0,
+    limit: int = 100
+) -> List[models.QuizSubmission]:
+    """The user's submissions of a module's quiz, newest first."""
+    return db.query(models.QuizSubmission).filter(
+        models.QuizSubmission.user_id == user_id,
+        models.QuizSubmission.module_id == module_id
+    ).order_by(
+        models.QuizSubmission.submitted_at.desc(), models.QuizSubmission.id.desc()
+    ).offset(skip).limit(limit).all()
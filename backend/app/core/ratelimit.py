@@ -0,0 +1,231 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+import ipaddress
+import math
+import sys
+import time
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from .. import models
+from ..database import get_db_session
+from . import metrics
+from .config import settings
+
+
+class MemoryBucketStore:
+    """
+    In-process token-bucket state: key -> (tokens, updated_at).
+
+    Entries are kept in least-recently-updated order, so buckets that have
+    refilled completely (and are therefore equivalent to no entry at all)
+    are swept from the front, and the oldest entries are evicted first once
+    ``max_keys`` is reached.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = Lock()
+        self.allowed = 0
+        self.rejected = 0
+
+    def take(self, key: str, capacity: float, rate: float) -> float:
+        """Take one token; return 0 if allowed, else seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+                self.allowed += 1
+            else:
+                wait = (1 - tokens) / rate
+                self.rejected += 1
+            self._buckets[key] = (tokens, now)
+
+            refill_time = capacity / rate
+            while self._buckets:
+                oldest_key, (_, oldest_at) = next(iter(self._buckets.items()))
+                if now - oldest_at < refill_time and len(self._buckets) <= self.max_keys:
+                    break
+                del self._buckets[oldest_key]
+        return wait
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = list(self._buckets.items())
+            allowed, rejected = self.allowed, self.rejected
+        approx_bytes = sys.getsizeof(self._buckets) + sum(
+            sys.getsizeof(key) + sys.getsizeof(value) for key, value in entries
+        )
+        return {
+            "allowed": allowed,
+            "rejected": rejected,
+            "entries": len(entries),
+            "approx_bytes": approx_bytes,
+        }
+
+
+class DatabaseBucketStore:
+    """
+    Token-bucket state in the ``rate_limit_buckets`` table, shared by every
+    worker using the same database. Rows are locked while they are updated
+    and purged once their bucket has refilled.
+    """
+
+    purge_every = 1000
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._calls = 0
+        self._lock = Lock()  # guards the counters; the row lock guards the bucket
+        self.allowed = 0
+        self.rejected = 0
+
+    def take(self, key: str, capacity: float, rate: float) -> float:
+        key = f"{self.namespace}:{key}"
+        for _ in range(2):
+            try:
+                return self._take(key, capacity, rate)
+            except IntegrityError:
+                # Another worker created the bucket first; retry as an update
+                continue
+        return 0.0
+
+    def _take(self, key: str, capacity: float, rate: float) -> float:
+        now = time.time()
+        with get_db_session() as db:
+            bucket = db.query(models.RateLimitBucket).filter(
+                models.RateLimitBucket.key == key
+            ).with_for_update().first()
+            if bucket is None:
+                bucket = models.RateLimitBucket(key=key, tokens=capacity, updated_at=now)
+                db.add(bucket)
+
+            tokens = min(capacity, bucket.tokens + (now - bucket.updated_at) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            bucket.tokens = tokens
+            bucket.updated_at = now
+            bucket.expires_at = now + (capacity - tokens) / rate
+            db.flush()  # a racing insert fails here, before it is counted
+
+            with self._lock:
+                self._calls += 1
+                purge = self._calls % self.purge_every == 0
+                if wait:
+                    self.rejected += 1
+                else:
+                    self.allowed += 1
+            if purge:
+                db.query(models.RateLimitBucket).filter(
+                    models.RateLimitBucket.expires_at < now
+                ).delete(synchronize_session=False)
+            db.commit()
+        return wait
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"allowed": self.allowed, "rejected": self.rejected, "backend": "database"}
+
+
+class TokenBucket:
+    """A named limiter allowing ``burst`` requests, refilled at ``per_minute``."""
+
+    def __init__(self, name: str, burst: int, per_minute: float):
+        self.name = name
+        self.capacity = float(burst)
+        self.rate = per_minute / 60.0
+        if settings.LOGIN_RATE_LIMIT_BACKEND == "database":
+            self.store = DatabaseBucketStore(name)
+        else:
+            self.store = MemoryBucketStore(settings.RATE_LIMIT_MAX_KEYS)
+
+    def take(self, key: str) -> float:
+        """Take one token for ``key``; the store counts allowed and rejected takes."""
+        return self.store.take(key, self.capacity, self.rate)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
+
+
+class ClientAddress:
+    """
+    Client IP for rate limiting. Behind trusted proxies (TRUSTED_PROXIES:
+    addresses or networks, or "*" to trust whichever peer connects) it is
+    the nearest address in X-Forwarded-For that isn't a trusted proxy;
+    otherwise the header is ignored, as any client can send it.
+    """
+
+    def __init__(self, trusted: str):
+        entries = [entry.strip() for entry in trusted.split(",") if entry.strip()]
+        self.trust_any_peer = "*" in entries
+        self.networks = [ipaddress.ip_network(entry, strict=False) for entry in entries if entry != "*"]
+
+    def _is_proxy(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self.networks)
+
+    def __call__(self, request: Request) -> Optional[str]:
+        peer = request.client.host if request.client else None
+        if peer is None or not (self.trust_any_peer or self._is_proxy(peer)):
+            return peer
+        hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        for hop in reversed(hops):
+            if not self._is_proxy(hop):
+                return hop
+        return hops[0] if hops else peer
+
+
+class LoginThrottle:
+    """Per-IP and per-email limits applied before a password is verified."""
+
+    def __init__(self):
+        self.by_ip = TokenBucket(
+            "login-ip",
+            settings.LOGIN_RATE_LIMIT_IP_BURST,
+            settings.LOGIN_RATE_LIMIT_IP_PER_MINUTE,
+        )
+        self.by_email = TokenBucket(
+            "login-email",
+            settings.LOGIN_RATE_LIMIT_EMAIL_BURST,
+            settings.LOGIN_RATE_LIMIT_EMAIL_PER_MINUTE,
+        )
+
+    def check(self, ip: str, email: str) -> None:
+        """Raise a 429 if either limit is exhausted."""
+        wait = self.by_ip.take(ip or "unknown")
+        if not wait:
+            wait = self.by_email.take((email or "").strip().lower())
+        if wait:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts. Please wait and try again.",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+    async def acheck(self, ip: str, email: str) -> None:
+        """check() for async routes; the database backend runs in the threadpool."""
+        if isinstance(self.by_ip.store, MemoryBucketStore):
+            self.check(ip, email)
+        else:
+            await run_in_threadpool(self.check, ip, email)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"ip": self.by_ip.stats(), "email": self.by_email.stats()}
+
+
+client_address = ClientAddress(settings.TRUSTED_PROXIES)
+login_throttle = LoginThrottle()
+metrics.register("login_throttle", login_throttle.stats)
@@ -0,0 +1,136 @@
+from html import escape
+from html.parser import HTMLParser
+from typing import List, Optional, Tuple
+import re
+
+# Tags kept in rendered module content; anything else is dropped but its
+# text is kept, except for the tags in DROP_WITH_CONTENT
+ALLOWED_TAGS = {
+    "a", "abbr", "b", "blockquote", "br", "code", "dd", "div", "dl", "dt",
+    "em", "figcaption", "figure", "h1", "h2", "h3", "h4", "h5", "h6", "hr",
+    "i", "img", "li", "ol", "p", "pre", "s", "small", "span", "strong",
+    "sub", "sup", "table", "tbody", "td", "th", "thead", "tr", "u", "ul",
+}
+VOID_TAGS = {"br", "hr", "img"}
+DROP_WITH_CONTENT = {"script", "style", "iframe", "object", "embed", "template", "noscript"}
+ALLOWED_ATTRIBUTES = {
+    "a": {"href", "title"},
+    "img": {"src", "alt", "title", "width", "height"},
+    "td": {"colspan", "rowspan"},
+    "th": {"colspan", "rowspan"},
+}
+URL_ATTRIBUTES = {"href", "src"}
+SAFE_URL = re.compile(r"^(https?:|mailto:|/|#|\.{0,2}/|[^:/?#]+(?:[/?#]|$))", re.IGNORECASE)
+
+# Block-level tags that end a line in the plain-text extract
+BLOCK_TAGS = {
+    "blockquote", "br", "dd", "div", "dl", "dt", "figcaption", "figure",
+    "h1", "h2", "h3", "h4", "h5", "h6", "hr", "li", "p", "pre", "tr",
+}
+
+_TAG = re.compile(r"<[a-zA-Z/!][^>]*>")
+
+
+def _safe_url(value: str) -> bool:
+    value = "".join(value.split())  # browsers ignore embedded whitespace
+    return bool(SAFE_URL.match(value))
+
+
+class _Renderer(HTMLParser):
+    """Allowlist sanitizer that also collects the plain text it keeps."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.html: List[str] = []
+        self.text: List[str] = []
+        self.open_tags: List[str] = []
+        self.dropping: Optional[str] = None
+        self.drop_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self.dropping:
+            if tag == self.dropping:
+                self.drop_depth += 1
+            return
+        if tag in DROP_WITH_CONTENT:
+            self.dropping, self.drop_depth = tag, 1
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append("\n")
+        if tag not in ALLOWED_TAGS:
+            return
+
+        allowed = ALLOWED_ATTRIBUTES.get(tag, set())
+        rendered = []
+        for name, value in attrs:
+            if name not in allowed or value is None:
+                continue
+            if name in URL_ATTRIBUTES and not _safe_url(value):
+                continue
+            rendered.append(f' {name}="{escape(value, quote=True)}"')
+        if tag == "a":
+            rendered.append(' rel="noopener noreferrer nofollow"')
+        self.html.append(f"<{tag}{''.join(rendered)}>")
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag in self.open_tags and tag not in VOID_TAGS and not self.dropping:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.dropping:
+            if tag == self.dropping:
+                self.drop_depth -= 1
+                if not self.drop_depth:
+                    self.dropping = None
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append("\n")
+        if tag not in self.open_tags:
+            return
+        # Close anything left open inside this tag so the output stays balanced
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.html.append(f"</{open_tag}>")
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self.dropping:
+            return
+        self.html.append(escape(data, quote=False))
+        self.text.append(data)
+
+    def close(self):
+        super().close()
+        while self.open_tags:
+            self.html.append(f"</{self.open_tags.pop()}>")
+
+
+def _plain_text(parts: List[str]) -> str:
+    lines = (" ".join(line.split()) for line in "".join(parts).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def render_content(content: Optional[str]) -> Tuple[str, str]:
+    """
+    Return (sanitized HTML, plain-text extract) for module content.
+
+    Content containing tags is sanitized against an allowlist; anything else
+    is treated as plain text, with blank lines separating paragraphs.
+    """
+    content = content or ""
+    if not _TAG.search(content):
+        paragraphs = [p.strip() for p in re.split(r"\n\s*\n", content) if p.strip()]
+        html = "".join(
+            "<p>" + "<br>".join(escape(line, quote=False) for line in p.splitlines()) + "</p>"
+            for p in paragraphs
+        )
+        return html, _plain_text([content])
+
+    renderer = _Renderer()
+    renderer.feed(content)
+    renderer.close()
+    return "".join(renderer.html), _plain_text(renderer.text)
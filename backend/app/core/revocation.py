@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Any, Dict, Optional
+import logging
+import time
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import get_db_session
+from . import metrics
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _epoch(value: datetime) -> float:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class RevocationList:
+    """
+    Per-worker view of the ``revoked_tokens`` table.
+
+    Checking a token is a dict lookup. Every ``refresh_interval`` seconds the
+    first request to check a token pulls the rows revoked since the last
+    refresh, going back ``overlap`` further for rows that committed late,
+    so workers pick up revocations from each other without a DB round trip
+    per request. Expired entries are pruned from memory on each
+    refresh and purged from the table every ``gc_interval`` seconds.
+    """
+
+    def __init__(self, refresh_interval: float, gc_interval: float, overlap: float):
+        self.refresh_interval = refresh_interval
+        self.gc_interval = gc_interval
+        self.overlap = timedelta(seconds=overlap)
+        self._revoked: Dict[str, float] = {}  # jti -> expiry (epoch seconds)
+        self._last_seen: Optional[datetime] = None  # latest revoked_at read
+        self._next_refresh = 0.0
+        self._next_gc = 0.0
+        self._lock = Lock()
+        self.refreshes = 0
+        self.rejected = 0
+        self.purged = 0
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        if not jti:
+            return False
+        self._maybe_refresh()
+        if jti in self._revoked:
+            self.rejected += 1
+            return True
+        return False
+
+    def revoke(self, db: Session, jti: str, expires_at: datetime, user_id: Optional[int] = None) -> None:
+        """Record ``jti`` as revoked until ``expires_at`` and apply it locally at once."""
+        db.add(models.RevokedToken(jti=jti, user_id=user_id, expires_at=expires_at))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Revoked already, possibly by a concurrent logout with the same token
+            db.rollback()
+        # Under the lock, or a refresh replacing the dict could drop it
+        with self._lock:
+            self._revoked[jti] = _epoch(expires_at)
+
+    def _maybe_refresh(self) -> None:
+        now = time.monotonic()
+        # Only one thread refreshes; the others keep using the current view
+        if now < self._next_refresh or not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._next_refresh = now + self.refresh_interval
+            self.refresh()
+        except Exception:
+            logger.exception("Could not refresh the token revocation list")
+        finally:
+            self._lock.release()
+
+    def refresh(self) -> None:
+        """Pull new revocations and prune expired ones; call with ``_lock`` held."""
+        with get_db_session() as db:
+            query = db.query(
+                models.RevokedToken.jti,
+                models.RevokedToken.expires_at,
+                models.RevokedToken.revoked_at
+            )
+            if self._last_seen is not None:
+                # Re-read a trailing window: a row can commit after rows
+                # stamped later than it were read, and would be missed by
+                # a strict high-water mark
+                query = query.filter(models.RevokedToken.revoked_at >= self._last_seen - self.overlap)
+
+            for row in query.all():
+                self._revoked[row.jti] = _epoch(row.expires_at)
+                if row.revoked_at is not None and (self._last_seen is None or row.revoked_at > self._last_seen):
+                    self._last_seen = row.revoked_at
+
+            if time.monotonic() >= self._next_gc:
+                self._next_gc = time.monotonic() + self.gc_interval
+                self.purged += db.query(models.RevokedToken).filter(
+                    models.RevokedToken.expires_at < datetime.utcnow()
+                ).delete(synchronize_session=False)
+                db.commit()
+
+        now = time.time()
+        self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+        self.refreshes += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._revoked),
+            "refreshes": self.refreshes,
+            "rejected": self.rejected,
+            "purged": self.purged,
+        }
+
+
+revocation_list = RevocationList(
+    refresh_interval=settings.REVOCATION_REFRESH_SECONDS,
+    gc_interval=settings.REVOCATION_GC_SECONDS,
+    overlap=settings.REVOCATION_OVERLAP_SECONDS,
+)
+metrics.register("revocation_list", revocation_list.stats)
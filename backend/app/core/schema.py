@@ -0,0 +1,88 @@
+"""
+Additive upgrades for databases created before a column or index existed.
+
+Tables are made with ``create_all``, which never alters a table that is
+already there. ``upgrade_schema`` adds the columns and indexes listed here
+when they are missing (running each column's backfill once, right after
+adding it) and is safe to run on every start.
+"""
+from typing import Callable, List, Optional, Tuple
+import logging
+
+from sqlalchemy import Column, Index, inspect, text
+from sqlalchemy.engine import Connection, Dialect, Engine
+
+from .. import models
+from .progress import backfill_completed_modules
+
+logger = logging.getLogger(__name__)
+
+Backfill = Callable[[Connection], None]
+
+# Columns added to existing tables, oldest first, with an optional backfill
+COLUMNS: List[Tuple[Column, Optional[Backfill]]] = [
+    (models.User.__table__.c.token_generation, None),
+    # Null until scripts/backfill_module_content.py runs; readers cope
+    (models.Module.__table__.c.content_length, None),
+    (models.Module.__table__.c.content_hash, None),
+    (models.Module.__table__.c.content_html, None),
+    (models.Module.__table__.c.content_text, None),
+    (models.Course.__table__.c.thumbnail_variants, None),
+    (models.Enrollment.__table__.c.completed_modules, backfill_completed_modules),
+    # Older answers keep a null submission and are left out of results
+    (models.QuizAttempt.__table__.c.submission_id, None),
+]
+
+
+def _index(model, name: str) -> Index:
+    return next(index for index in model.__table__.indexes if index.name == name)
+
+
+# Indexes added to existing tables
+INDEXES: List[Index] = [
+    _index(models.Course, "ix_courses_published_created_id"),
+    _index(models.Course, "ix_courses_teacher_created_id"),
+    _index(models.QuizAttempt, "ix_quiz_attempts_submission_id"),
+]
+
+
+def column_ddl(column: Column, dialect: Dialect) -> str:
+    """The ``ADD COLUMN`` clause for a model column."""
+    ddl = f"{column.name} {column.type.compile(dialect=dialect)}"
+    if column.server_default is not None:
+        ddl += f" DEFAULT {column.server_default.arg}"
+    if not column.nullable:
+        ddl += " NOT NULL"
+    for foreign_key in column.foreign_keys:
+        target = foreign_key.column
+        ddl += f" REFERENCES {target.table.name} ({target.name})"
+        if foreign_key.ondelete:
+            ddl += f" ON DELETE {foreign_key.ondelete}"
+    return ddl
+
+
+def upgrade_schema(engine: Engine) -> List[str]:
+    """Add missing columns and indexes; returns what was added."""
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    added = []
+    with engine.begin() as connection:
+        for column, backfill in COLUMNS:
+            table = column.table.name
+            if table not in tables:
+                continue  # create_all makes it with every column
+            if column.name in {c["name"] for c in inspector.get_columns(table)}:
+                continue
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column_ddl(column, connection.dialect)}"))
+            if backfill is not None:
+                backfill(connection)
+            added.append(f"{table}.{column.name}")
+        for index in INDEXES:
+            if index.table.name not in tables:
+                continue
+            if index.name not in {i["name"] for i in inspector.get_indexes(index.table.name)}:
+                index.create(connection)
+                added.append(index.name)
+    if added:
+        logger.info("Schema upgraded: added %s", ", ".join(added))
+    return added
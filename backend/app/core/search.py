@@ -0,0 +1,263 @@
+from typing import Any, Dict, Iterable, List, Optional, Set
+import logging
+import re
+
+from sqlalchemy import bindparam, event, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import SessionLocal, engine
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Course and module columns that feed the index; writes touching any other
+# column leave the index alone
+COURSE_FIELDS = ("title", "description")
+MODULE_FIELDS = ("title", "description", "content", "content_text", "course_id")
+
+MAX_TERMS = 16
+
+# Documents are keyed by ref_id * 2 + kind, so a course and a module with the
+# same id never collide and a document can be replaced by primary key
+COURSE_KIND = 0
+MODULE_KIND = 1
+
+_SQLITE = {
+    "create": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+        "kind UNINDEXED, ref_id UNINDEXED, course_id UNINDEXED, title, body, "
+        "tokenize='porter unicode61')",
+    ],
+    "populated": "SELECT EXISTS (SELECT 1 FROM search_index)",
+    "delete": "DELETE FROM search_index WHERE rowid IN :doc_ids",
+    "clear": "DELETE FROM search_index",
+    "insert_courses": (
+        "INSERT INTO search_index (rowid, kind, ref_id, course_id, title, body) "
+        "SELECT c.id * 2, 0, c.id, c.id, c.title, coalesce(c.description, '') "
+        "FROM courses c {where}"
+    ),
+    "insert_modules": (
+        "INSERT INTO search_index (rowid, kind, ref_id, course_id, title, body) "
+        "SELECT m.id * 2 + 1, 1, m.id, m.course_id, m.title, "
+        "coalesce(m.description, '') || ' ' || coalesce(m.content_text, m.content, '') "
+        "FROM modules m {where}"
+    ),
+    # bm25 weights follow the column order; a title match counts 10x
+    "search": (
+        "SELECT search_index.kind, search_index.ref_id, search_index.course_id, search_index.title, "
+        "snippet(search_index, -1, '<mark>', '</mark>', '…', 16) AS snippet, "
+        "-bm25(search_index, 0, 0, 0, 10.0, 1.0) AS score "
+        "FROM search_index "
+        "JOIN courses c ON c.id = search_index.course_id "
+        "LEFT JOIN modules m ON search_index.kind = 1 AND m.id = search_index.ref_id "
+        "WHERE search_index MATCH :query AND c.is_published = 1 "
+        "AND (search_index.kind = 0 OR (:include_modules AND m.is_published = 1)) "
+        "ORDER BY bm25(search_index, 0, 0, 0, 10.0, 1.0), search_index.rowid "
+        "LIMIT :limit OFFSET :offset"
+    ),
+}
+
+_POSTGRES_DOCUMENT = (
+    "setweight(to_tsvector('english', {title}), 'A') || "
+    "setweight(to_tsvector('english', {body}), 'B')"
+)
+
+_POSTGRES = {
+    "create": [
+        "CREATE TABLE IF NOT EXISTS search_documents ("
+        "id BIGINT PRIMARY KEY, kind SMALLINT NOT NULL, ref_id INTEGER NOT NULL, "
+        "course_id INTEGER NOT NULL, title TEXT NOT NULL, body TEXT NOT NULL, "
+        "document TSVECTOR NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS ix_search_documents_document "
+        "ON search_documents USING GIN (document)",
+    ],
+    "populated": "SELECT EXISTS (SELECT 1 FROM search_documents)",
+    "delete": "DELETE FROM search_documents WHERE id IN :doc_ids",
+    "clear": "DELETE FROM search_documents",
+    "insert_courses": (
+        "INSERT INTO search_documents (id, kind, ref_id, course_id, title, body, document) "
+        "SELECT c.id * 2, 0, c.id, c.id, c.title, coalesce(c.description, ''), "
+        + _POSTGRES_DOCUMENT.format(title="c.title", body="coalesce(c.description, '')")
+        + " FROM courses c {where}"
+    ),
+    "insert_modules": (
+        "INSERT INTO search_documents (id, kind, ref_id, course_id, title, body, document) "
+        "SELECT m.id * 2 + 1, 1, m.id, m.course_id, m.title, "
+        "coalesce(m.description, '') || ' ' || coalesce(m.content_text, m.content), "
+        + _POSTGRES_DOCUMENT.format(
+            title="m.title", body="coalesce(m.description, '') || ' ' || coalesce(m.content_text, m.content)"
+        )
+        + " FROM modules m {where}"
+    ),
+    # Rank and page on the GIN index first; headlines are only built for the page
+    "search": (
+        "WITH q AS (SELECT websearch_to_tsquery('english', :query) AS query), "
+        "page AS ("
+        "SELECT d.id, d.kind, d.ref_id, d.course_id, d.title, d.body, "
+        "ts_rank_cd(d.document, q.query) AS score "
+        "FROM search_documents d CROSS JOIN q "
+        "JOIN courses c ON c.id = d.course_id "
+        "LEFT JOIN modules m ON d.kind = 1 AND m.id = d.ref_id "
+        "WHERE d.document @@ q.query AND c.is_published "
+        "AND (d.kind = 0 OR (:include_modules AND m.is_published)) "
+        "ORDER BY score DESC, d.id LIMIT :limit OFFSET :offset) "
+        "SELECT page.kind, page.ref_id, page.course_id, page.title, "
+        "ts_headline('english', page.body, q.query, "
+        "'StartSel=<mark>, StopSel=</mark>, MaxWords=24, MinWords=8') AS snippet, "
+        "page.score FROM page CROSS JOIN q ORDER BY page.score DESC, page.id"
+    ),
+}
+
+
+class SearchIndex:
+    """
+    Full-text index over course and module titles, descriptions and content.
+
+    SQLite uses an FTS5 table and Postgres a table with a GIN-indexed
+    ``tsvector``. Documents are rewritten in the same transaction as the
+    course or module write that changed them (see ``_after_flush``), and
+    queries only touch the index plus the course/module rows of the hits,
+    never ``modules.content``. Other databases have no search.
+    """
+
+    def __init__(self, bind: Engine):
+        self.bind = bind
+        # Set by init(); until then writes are not indexed and search is off
+        self.sql: Optional[Dict[str, Any]] = None
+        self.reindexed = 0
+        self.queries = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.sql is not None
+
+    def init(self) -> None:
+        """Create the index if needed, building it from existing rows when new."""
+        sql = {"sqlite": _SQLITE, "postgresql": _POSTGRES}.get(self.bind.dialect.name)
+        if sql is None:
+            logger.warning("Full-text search is not supported on %s", self.bind.dialect.name)
+            return
+        try:
+            with self.bind.begin() as connection:
+                for statement in sql["create"]:
+                    connection.execute(text(statement))
+                self.sql = sql
+                if not connection.execute(text(sql["populated"])).scalar():
+                    self.rebuild(connection)
+        except (OperationalError, ProgrammingError):
+            logger.exception("Could not create the search index; search is disabled")
+            self.sql = None
+
+    def rebuild(self, connection: Connection) -> None:
+        """Re-index every course and module."""
+        connection.execute(text(self.sql["clear"]))
+        connection.execute(text(self.sql["insert_courses"].format(where="")))
+        connection.execute(text(self.sql["insert_modules"].format(where="")))
+
+    def reindex(
+        self,
+        connection: Connection,
+        course_ids: Iterable[int] = (),
+        module_ids: Iterable[int] = ()
+    ) -> None:
+        """Rewrite the documents of the given courses and modules; deleted rows drop out."""
+        course_ids, module_ids = sorted(set(course_ids)), sorted(set(module_ids))
+        doc_ids = [i * 2 + COURSE_KIND for i in course_ids] + [i * 2 + MODULE_KIND for i in module_ids]
+        if not doc_ids:
+            return
+        connection.execute(
+            text(self.sql["delete"]).bindparams(bindparam("doc_ids", expanding=True)),
+            {"doc_ids": doc_ids}
+        )
+        if course_ids:
+            connection.execute(
+                text(self.sql["insert_courses"].format(where="WHERE c.id IN :ids"))
+                .bindparams(bindparam("ids", expanding=True)),
+                {"ids": course_ids}
+            )
+        if module_ids:
+            connection.execute(
+                text(self.sql["insert_modules"].format(where="WHERE m.id IN :ids"))
+                .bindparams(bindparam("ids", expanding=True)),
+                {"ids": module_ids}
+            )
+        self.reindexed += len(doc_ids)
+
+    def search(
+        self,
+        db: Session,
+        query: str,
+        limit: int,
+        offset: int,
+        include_modules: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Ranked hits in published courses (and published modules if asked)."""
+        query = self._prepare_query(query)
+        if not query:
+            return []
+        self.queries += 1
+        rows = db.execute(text(self.sql["search"]), {
+            "query": query,
+            "limit": limit,
+            "offset": offset,
+            "include_modules": include_modules,
+        }).mappings().all()
+        return [
+            {
+                "kind": "course" if row["kind"] == COURSE_KIND else "module",
+                "id": row["ref_id"],
+                "course_id": row["course_id"],
+                "title": row["title"],
+                "snippet": (row["snippet"] or "").strip(),
+                "score": float(row["score"] or 0),
+            }
+            for row in rows
+        ]
+
+    def _prepare_query(self, query: str) -> str:
+        terms = re.findall(r"\w+", query)[:MAX_TERMS]
+        if not terms or self.sql is not _SQLITE:
+            return " ".join(terms)
+        # Quote every term so user input is never parsed as FTS5 syntax, and
+        # let the last one match as a prefix for search-as-you-type
+        return " ".join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.bind.dialect.name if self.enabled else None,
+            "reindexed": self.reindexed,
+            "queries": self.queries,
+        }
+
+
+def _changed(instance: Any, fields: Iterable[str]) -> bool:
+    state = inspect(instance)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    """Re-index the courses and modules written by this flush, in its transaction."""
+    if not search_index.enabled:
+        return
+    course_ids: Set[int] = set()
+    module_ids: Set[int] = set()
+    for instance in list(session.new) + list(session.deleted):
+        if isinstance(instance, models.Course):
+            course_ids.add(instance.id)
+        elif isinstance(instance, models.Module):
+            module_ids.add(instance.id)
+    for instance in session.dirty:
+        if isinstance(instance, models.Course) and _changed(instance, COURSE_FIELDS):
+            course_ids.add(instance.id)
+        elif isinstance(instance, models.Module) and _changed(instance, MODULE_FIELDS):
+            module_ids.add(instance.id)
+    if course_ids or module_ids:
+        search_index.reindex(session.connection(), course_ids, module_ids)
+
+
+search_index = SearchIndex(engine)
+event.listen(SessionLocal, "after_flush", _after_flush)
+metrics.register("search", search_index.stats)
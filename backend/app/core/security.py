@@ -8,14 +8,19 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 import os
 import logging
+import uuid
 from dotenv import load_dotenv
 
 from .. import models, schemas
 from ..database import get_db
+from . import log, principals
+from .revocation import revocation_list
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Security configurations - Import from config
 from .config import settings
 SECRET_KEY = settings.SECRET_KEY
@@ -23,7 +28,24 @@ ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def build_password_context(scheme: str, rounds: int) -> CryptContext:
+    """
+    Build the password context for ``scheme`` at ``rounds`` cost.
+    
+    bcrypt stays registered as a deprecated scheme so existing hashes still
+    verify; needs_update() flags them, and any hash made with another cost.
+    """
+    schemes = [scheme] if scheme == "bcrypt" else [scheme, "bcrypt"]
+    return CryptContext(
+        schemes=schemes,
+        deprecated="auto",
+        **{f"{scheme}__rounds": rounds}
+    )
+
+pwd_context = build_password_context(
+    settings.PASSWORD_HASH_SCHEME,
+    settings.PASSWORD_HASH_ROUNDS
+)
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
@@ -36,6 +58,10 @@ def get_password_hash(password: str) -> str:
     """Generate a password hash."""
     return pwd_context.hash(password)
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Whether a stored hash was made with an outdated scheme or cost."""
+    return pwd_context.needs_update(hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -49,6 +75,9 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     
     to_encode.update({"exp": expire})
     
+    # Unique token id so the token can be revoked on logout
+    to_encode.setdefault("jti", uuid.uuid4().hex)
+    
     # Convert any non-JSON-serializable data to strings
     for key, value in to_encode.items():
         if isinstance(value, (datetime, timedelta)):
@@ -75,64 +104,63 @@ def get_current_user(
     )
     
     try:
-        # Log the token for debugging (remove in production)
-        logger = logging.getLogger(__name__)
-        logger.setLevel(logging.DEBUG)
-        
-        logger.debug(f"Received token: {token}")
-        
         # Check if token is present
         if not token or token == "null" or token == "undefined":
-            logger.error("No token provided in the Authorization header")
+            logger.info("No token provided in the Authorization header")
             raise credentials_exception
             
         # Decode the JWT token
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            logger.debug(f"Decoded token payload: {payload}")
         except jwt.ExpiredSignatureError:
-            logger.error("Token has expired")
+            logger.info("Token has expired")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Token has expired. Please log in again.",
                 headers={"WWW-Authenticate": "Bearer"},
             )
         except jwt.InvalidTokenError as e:
-            logger.error(f"Invalid token: {str(e)}")
+            logger.info("Invalid token: %s", e)
             raise credentials_exception
             
         # Get the subject (email) from the token
         email: str = payload.get("sub")
         if not email:
-            logger.error("No 'sub' claim in token")
+            logger.info("No 'sub' claim in token")
+            raise credentials_exception
+        
+        if revocation_list.is_revoked(payload.get("jti")):
+            logger.info("Token has been revoked")
             raise credentials_exception
             
-        # Log the email for debugging
-        logger.debug(f"Looking up user with email: {email}")
-            
-        # Get the user from the database
-        user = db.query(models.User).filter(models.User.email == email).first()
+        # Get the user from the principal cache or database
+        user = principals.load_user(db, email)
         if not user:
-            logger.error(f"User with email {email} not found")
+            logger.info("User with email %s not found", email)
+            raise credentials_exception
+            
+        # Reject tokens issued before the user's last role/status change
+        if payload.get("gen", 0) != user.token_generation:
+            logger.info("Token generation for user %s is outdated", user.id)
             raise credentials_exception
             
         # Check if user is active
         if not user.is_active:
-            logger.error(f"User {email} is inactive")
+            logger.info("User %s is inactive", user.id)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="User account is inactive. Please contact support.",
             )
-            
-        logger.debug(f"Successfully authenticated user: {email}")
+        
+        log.bind(user_id=user.id)
         return user
         
     except HTTPException:
         # Re-raise HTTP exceptions
         raise
         
-    except Exception as e:
-        print(f"Unexpected error in get_current_user: {str(e)}")
+    except Exception:
+        logger.exception("Unexpected error in get_current_user")
         raise credentials_exception
 
 def get_current_active_user(
@@ -0,0 +1,323 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, AsyncIterator, BinaryIO, Dict, Optional, Tuple
+import hashlib
+import logging
+import mimetypes
+import os
+import uuid
+
+from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .. import models
+from ..config import settings  # upload settings live with the app settings
+from . import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent chunks for one upload are not guarded
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def _write_block(fileobj: BinaryIO, hasher: Optional[Any], block: bytes) -> None:
+    fileobj.write(block)
+    if hasher is not None:
+        hasher.update(block)
+
+
+def _hash_file(path: Path, block_size: int) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class MediaStore:
+    """
+    Content-addressed store for uploaded files under ``UPLOAD_FOLDER``.
+
+    Request bodies are streamed into ``partial/`` in blocks of
+    ``UPLOAD_CHUNK_SIZE`` (the size limit is enforced as bytes arrive) and
+    hashed on the way. The finished file is renamed to
+    ``objects/ab/cd/<sha256>.<ext>``, or dropped when that content is
+    already stored, so identical files take disk space once.
+
+    Resumable uploads append chunks to ``partial/<session id>``; the bytes
+    on disk are the upload's offset, so a chunk cut off by a dropped
+    connection is resumed from wherever it stopped.
+    """
+
+    def __init__(self, root: str, max_size: int, block_size: int):
+        self.root = Path(root)
+        self.max_size = max_size
+        self.block_size = block_size
+        self.stored = 0
+        self.deduplicated = 0
+        self.bytes_received = 0
+
+    def object_path(self, sha256: str, extension: str) -> Path:
+        return self.root / "objects" / sha256[:2] / sha256[2:4] / f"{sha256}.{extension}"
+
+    def path_for(self, media: models.MediaFile) -> Path:
+        return self.object_path(media.sha256, media.extension)
+
+    def url_for(self, media: models.MediaFile) -> str:
+        return f"/api/media/{media.stored_name}"
+
+    def _partial_path(self, name: str) -> Path:
+        path = self.root / "partial" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def check_filename(self, filename: str) -> Tuple[str, str]:
+        """Return (extension, content type) for an allowed file name, or raise a 415."""
+        extension = Path(filename).suffix.lower().lstrip(".")
+        if extension not in settings.ALLOWED_EXTENSIONS:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail=f"Allowed file types: {', '.join(sorted(settings.ALLOWED_EXTENSIONS))}"
+            )
+        content_type = mimetypes.guess_type(f"file.{extension}")[0] or "application/octet-stream"
+        return extension, content_type
+
+    def _too_large(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Files may be at most {self.max_size // (1024 * 1024)} MB"
+        )
+
+    def check_size(self, size: int) -> None:
+        if size > self.max_size:
+            raise self._too_large()
+
+    async def _receive(
+        self,
+        stream: AsyncIterator[bytes],
+        fileobj: BinaryIO,
+        hasher: Optional[Any],
+        received: int,
+        limit: int
+    ) -> int:
+        """
+        Write a request body to ``fileobj`` and return the bytes written.
+        ``received`` bytes are already on disk; going past ``limit`` is a 413.
+        Whatever arrived before an error is still written.
+        """
+        buffer = bytearray()
+        written = 0
+        try:
+            async for chunk in stream:
+                if received + written + len(buffer) + len(chunk) > limit:
+                    raise self._too_large()
+                buffer += chunk
+                if len(buffer) >= self.block_size:
+                    await run_in_threadpool(_write_block, fileobj, hasher, bytes(buffer))
+                    written += len(buffer)
+                    buffer.clear()
+        finally:
+            if buffer:
+                await run_in_threadpool(_write_block, fileobj, hasher, bytes(buffer))
+                written += len(buffer)
+            self.bytes_received += written
+        return written
+
+    def _commit(
+        self,
+        db: Session,
+        partial: Path,
+        sha256: str,
+        extension: str,
+        content_type: str,
+        size: int,
+        user_id: Optional[int]
+    ) -> models.MediaFile:
+        """Record a received file and move it into the store unless its content is already there."""
+        media = db.query(models.MediaFile).filter(models.MediaFile.sha256 == sha256).first()
+        if media is None:
+            db.add(models.MediaFile(
+                sha256=sha256,
+                extension=extension,
+                content_type=content_type,
+                size=size,
+                uploaded_by=user_id
+            ))
+            try:
+                db.commit()
+            except IntegrityError:
+                # The same content was uploaded concurrently
+                db.rollback()
+            media = db.query(models.MediaFile).filter(models.MediaFile.sha256 == sha256).one()
+
+        # The row is written first: a crash in between leaves a row whose
+        # file is put back by the next upload of that content
+        target = self.path_for(media)
+        if target.exists():
+            self.deduplicated += 1
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(partial, target)
+            self.stored += 1
+        return media
+
+    async def store(
+        self,
+        db: Session,
+        stream: AsyncIterator[bytes],
+        filename: str,
+        user_id: int,
+        content_length: Optional[int] = None
+    ) -> models.MediaFile:
+        """Stream a whole file into the store in one request."""
+        extension, content_type = self.check_filename(filename)
+        if content_length is not None:
+            self.check_size(content_length)
+
+        partial = self._partial_path(f"{uuid.uuid4().hex}.upload")
+        hasher = hashlib.sha256()
+        try:
+            with open(partial, "wb") as f:
+                size = await self._receive(stream, f, hasher, 0, self.max_size)
+            if not size:
+                raise HTTPException(status_code=400, detail="The uploaded file is empty")
+            return await run_in_threadpool(
+                self._commit, db, partial, hasher.hexdigest(), extension, content_type, size, user_id
+            )
+        finally:
+            partial.unlink(missing_ok=True)
+
+    def store_bytes(
+        self,
+        db: Session,
+        data: bytes,
+        extension: str,
+        content_type: str,
+        user_id: Optional[int] = None
+    ) -> models.MediaFile:
+        """Store content generated by the server, such as image variants."""
+        partial = self._partial_path(f"{uuid.uuid4().hex}.upload")
+        try:
+            partial.write_bytes(data)
+            return self._commit(
+                db, partial, hashlib.sha256(data).hexdigest(), extension, content_type, len(data), user_id
+            )
+        finally:
+            partial.unlink(missing_ok=True)
+
+    # Resumable uploads
+
+    def create_session(self, db: Session, user_id: int, filename: str, size: int) -> models.UploadSession:
+        extension, content_type = self.check_filename(filename)
+        self.check_size(size)
+        self.purge_expired(db)
+
+        session = models.UploadSession(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            filename=filename,
+            extension=extension,
+            content_type=content_type,
+            size=size,
+            expires_at=datetime.utcnow() + timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS)
+        )
+        db.add(session)
+        db.commit()
+        self._partial_path(session.id).touch()
+        return session
+
+    def get_session(self, db: Session, session_id: str, user_id: int) -> models.UploadSession:
+        session = db.query(models.UploadSession).filter(
+            models.UploadSession.id == session_id,
+            models.UploadSession.user_id == user_id,
+            models.UploadSession.expires_at > datetime.utcnow()
+        ).first()
+        if session is None:
+            raise HTTPException(status_code=404, detail="Upload not found or expired")
+        return session
+
+    def offset(self, session: models.UploadSession) -> int:
+        try:
+            return self._partial_path(session.id).stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    async def append(self, session: models.UploadSession, stream: AsyncIterator[bytes], offset: int) -> int:
+        """
+        Append a chunk that starts at ``offset`` and return the new offset.
+        A chunk that doesn't start at the current offset is a 409 carrying
+        the offset to resume from in ``Upload-Offset``.
+        """
+        with open(self._partial_path(session.id), "ab") as f:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail="Another chunk of this upload is being received"
+                    )
+            current = os.fstat(f.fileno()).st_size
+            if offset != current:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Upload is at offset {current}",
+                    headers={"Upload-Offset": str(current)}
+                )
+            written = await self._receive(stream, f, None, current, session.size)
+        return current + written
+
+    def _finish(self, db: Session, session: models.UploadSession) -> models.MediaFile:
+        partial = self._partial_path(session.id)
+        sha256 = _hash_file(partial, self.block_size)
+        media = self._commit(
+            db, partial, sha256, session.extension, session.content_type, session.size, session.user_id
+        )
+        db.delete(session)
+        db.commit()
+        partial.unlink(missing_ok=True)
+        return media
+
+    async def complete(self, db: Session, session: models.UploadSession) -> models.MediaFile:
+        """Store a fully received upload and close its session."""
+        received = self.offset(session)
+        if received != session.size:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Received {received} of {session.size} bytes",
+                headers={"Upload-Offset": str(received)}
+            )
+        return await run_in_threadpool(self._finish, db, session)
+
+    def purge_expired(self, db: Session) -> int:
+        """Delete expired upload sessions and their partial files."""
+        expired = [
+            session_id for (session_id,) in db.query(models.UploadSession.id).filter(
+                models.UploadSession.expires_at <= datetime.utcnow()
+            )
+        ]
+        if not expired:
+            return 0
+        db.query(models.UploadSession).filter(
+            models.UploadSession.id.in_(expired)
+        ).delete(synchronize_session=False)
+        db.commit()
+        for session_id in expired:
+            self._partial_path(session_id).unlink(missing_ok=True)
+        logger.info("Discarded %d expired uploads", len(expired))
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "bytes_received": self.bytes_received,
+        }
+
+
+media_store = MediaStore(settings.UPLOAD_FOLDER, settings.MAX_CONTENT_LENGTH, settings.UPLOAD_CHUNK_SIZE)
+metrics.register("uploads", media_store.stats)
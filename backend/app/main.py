@@ -4,16 +4,26 @@ from sqlalchemy.orm import Session
 from datetime import datetime
 from . import models, schemas
 from .database import engine, SessionLocal
-from .routers import auth, users, courses, quizzes, enrollments, modules
+from .routers import auth, users, courses, quizzes, enrollments, modules, search, uploads, media
 from .api import admin
+from .core.log import RequestContextMiddleware, configure_logging
+from .core.search import search_index
+from .core import images  # keeps course thumbnail variants in step
+from .core.schema import upgrade_schema
 from app.seed_data import init_db
 import os
 
-# Create database tables and seed demo data
+configure_logging()
+
+# Create database tables, add columns and indexes that existing tables
+# lack, and seed demo data
+models.Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
 if os.getenv("ENVIRONMENT") == "production":
     init_db()  # Auto-seed in production
-else:
-    models.Base.metadata.create_all(bind=engine)
+
+# Full-text search index (built from existing rows on first start)
+search_index.init()
 
 # Database dependency
 def get_db():
@@ -63,10 +73,13 @@ app.add_middleware(
         "X-Requested-With",
         "X-CSRF-Token",
     ],
-    expose_headers=["Content-Length", "X-Total-Count"],
+    expose_headers=["Content-Length", "X-Total-Count", "X-Next-Cursor"],
     max_age=600,  # Cache preflight requests for 10 minutes
 )
 
+# Request id, log context and batched access logging
+app.add_middleware(RequestContextMiddleware)
+
 # Include routers with /api prefix
 app.include_router(auth.router, prefix="/api")
 app.include_router(users.router, prefix="/api")
@@ -74,6 +87,9 @@ app.include_router(courses.router, prefix="/api")
 app.include_router(quizzes.router, prefix="/api")
 app.include_router(enrollments.router, prefix="/api")
 app.include_router(modules.router, prefix="/api")
+app.include_router(search.router, prefix="/api")
+app.include_router(uploads.router, prefix="/api")
+app.include_router(media.router, prefix="/api")
 app.include_router(admin.router, prefix="")
 
 # Root endpoint
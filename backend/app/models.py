@@ -1,8 +1,10 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Text, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Boolean, Column, ForeignKey, Integer, JSON, String, DateTime, Text, Enum, Float, Index, UniqueConstraint
+from sqlalchemy.orm import deferred, relationship, validates
 from sqlalchemy.sql import func
 from app.database import Base
+from app.core.rendering import render_content
 import enum
+import hashlib
 
 class UserRole(str, enum.Enum):
     STUDENT = "student"
@@ -20,6 +22,8 @@ class User(Base):
     institution = Column(String, nullable=True)
     role = Column(Enum(UserRole), default=UserRole.STUDENT, nullable=False)
     is_active = Column(Boolean, default=True)
+    # Bumped to invalidate every token issued so far (role change, deactivation)
+    token_generation = Column(Integer, default=0, server_default="0", nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -40,6 +44,8 @@ class Course(Base):
     description = Column(Text, nullable=True)
     thumbnail_url = Column(String, nullable=True)
     video_url = Column(String, nullable=True)  # Added video support
+    # Resized copies of an uploaded thumbnail, kept in step by core.images
+    thumbnail_variants = Column(JSON, nullable=True)
     content_type = Column(String, default="text")  # text, video, mixed
     is_published = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -53,6 +59,29 @@ class Course(Base):
     modules = relationship("Module", back_populates="course", cascade="all, delete-orphan")
     enrollments = relationship("Enrollment", back_populates="course", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Keyset pagination of the catalog: published courses newest first,
+        # and each teacher's own courses newest first
+        Index("ix_courses_published_created_id", "is_published", "created_at", "id"),
+        Index("ix_courses_teacher_created_id", "teacher_id", "created_at", "id"),
+    )
+
+def content_fingerprint(content):
+    """(length in characters, sha256 hex) of module content"""
+    content = content or ""
+    return len(content), hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def derive_content_fields(content):
+    """Stored renditions of module content, keyed by column name"""
+    length, content_hash = content_fingerprint(content)
+    html, text = render_content(content)
+    return {
+        "content_length": length,
+        "content_hash": content_hash,
+        "content_html": html,
+        "content_text": text,
+    }
+
 class Module(Base):
     __tablename__ = "modules"
 
@@ -65,12 +94,26 @@ class Module(Base):
     course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
     order = Column(Integer, nullable=False, default=0)
     is_published = Column(Boolean, default=False)
+    # Derived from content whenever it is written: listings use the length
+    # and hash, readers get the sanitized HTML and search the plain text.
+    # The renditions are only loaded when asked for (group "rendered").
+    content_length = Column(Integer, nullable=True)
+    content_hash = Column(String(64), nullable=True)
+    content_html = deferred(Column(Text, nullable=True), group="rendered")
+    content_text = deferred(Column(Text, nullable=True), group="rendered")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
     course = relationship("Course", back_populates="modules")
     quiz_questions = relationship("QuizQuestion", back_populates="module")
+    completions = relationship("ModuleCompletion", cascade="all, delete-orphan")
+
+    @validates("content")
+    def _track_content(self, key, content):
+        for field, value in derive_content_fields(content).items():
+            setattr(self, field, value)
+        return content
 
 class QuizQuestion(Base):
     __tablename__ = "quiz_questions"
@@ -105,6 +148,8 @@ class Enrollment(Base):
     course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
     completed = Column(Boolean, default=False)
     progress = Column(Integer, default=0)  # percentage
+    # Published modules completed; progress is derived from it (core.progress)
+    completed_modules = Column(Integer, default=0, server_default="0", nullable=False)
     enrolled_at = Column(DateTime(timezone=True), server_default=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
 
@@ -112,6 +157,46 @@ class Enrollment(Base):
     user = relationship("User", back_populates="enrollments")
     course = relationship("Course", back_populates="enrollments")
 
+class ModuleCompletion(Base):
+    """A module a user has completed; recorded once per user and module."""
+    __tablename__ = "module_completions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    module_id = Column(Integer, ForeignKey("modules.id", ondelete="CASCADE"), nullable=False)
+    course_id = Column(Integer, ForeignKey("courses.id", ondelete="CASCADE"), nullable=False)
+    completed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "module_id", name="uq_module_completions_user_module"),
+        # Recounting and clearing one learner's completions in a course
+        Index("ix_module_completions_course_user", "course_id", "user_id"),
+    )
+
+class QuizSubmission(Base):
+    """One graded submission of a module's quiz; its answers are quiz_attempts rows."""
+    __tablename__ = "quiz_submissions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    module_id = Column(Integer, ForeignKey("modules.id", ondelete="CASCADE"), nullable=False)
+    attempt_number = Column(Integer, nullable=False)
+    score = Column(Float, nullable=False)
+    passed = Column(Boolean, nullable=False)
+    correct_answers = Column(Integer, nullable=False)
+    total_questions = Column(Integer, nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)  # as reported by the client
+    submitted_at = Column(DateTime(timezone=True), nullable=False)
+
+    # Relationships
+    attempts = relationship("QuizAttempt", back_populates="submission")
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "module_id", "attempt_number", name="uq_quiz_submissions_user_module_attempt"),
+        # Latest result, best score and history of one learner's quiz
+        Index("ix_quiz_submissions_user_module_submitted", "user_id", "module_id", "submitted_at"),
+    )
+
 class QuizAttempt(Base):
     __tablename__ = "quiz_attempts"
 
@@ -120,9 +205,77 @@ class QuizAttempt(Base):
     question_id = Column(Integer, ForeignKey("quiz_questions.id"), nullable=False)
     selected_option_id = Column(Integer, ForeignKey("quiz_options.id"), nullable=False)
     is_correct = Column(Boolean, nullable=False)
+    # Null for answers recorded before submissions were kept
+    submission_id = Column(Integer, ForeignKey("quiz_submissions.id", ondelete="CASCADE"), nullable=True, index=True)
     attempted_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
     user = relationship("User", back_populates="quiz_attempts")
     question = relationship("QuizQuestion", back_populates="attempts")
     selected_option = relationship("QuizOption")
+    submission = relationship("QuizSubmission", back_populates="attempts")
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    jti = Column(String, unique=True, index=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    revoked_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class RateLimitBucket(Base):
+    """Token-bucket state shared between workers (database rate-limit backend)."""
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String, primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)  # epoch seconds
+    expires_at = Column(Float, nullable=False, index=True)  # when the bucket is full again
+
+class MediaFile(Base):
+    """Uploaded file, stored once on disk under the SHA-256 of its content."""
+    __tablename__ = "media_files"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, index=True, nullable=False)
+    extension = Column(String(10), nullable=False)
+    content_type = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    uploaded_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    @property
+    def stored_name(self) -> str:
+        return f"{self.sha256}.{self.extension}"
+
+class UploadSession(Base):
+    """Resumable upload in progress; the bytes received so far live in a partial file."""
+    __tablename__ = "upload_sessions"
+
+    id = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    filename = Column(String, nullable=False)
+    extension = Column(String(10), nullable=False)
+    content_type = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+class ImageVariant(Base):
+    """A resized copy of an uploaded image, itself stored as a media file."""
+    __tablename__ = "image_variants"
+
+    id = Column(Integer, primary_key=True, index=True)
+    source_sha256 = Column(String(64), nullable=False, index=True)
+    width = Column(Integer, nullable=False)
+    height = Column(Integer, nullable=False)
+    content_type = Column(String, nullable=False)
+    media_file_id = Column(Integer, ForeignKey("media_files.id"), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    media_file = relationship("MediaFile")
+
+    __table_args__ = (
+        UniqueConstraint("source_sha256", "width", "content_type", name="uq_image_variants_source_width_type"),
+    )
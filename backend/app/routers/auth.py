@@ -1,13 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from datetime import timedelta
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime, timedelta
 from typing import Optional
 import logging
+import jwt
 
 from .. import models, schemas, auth
 from ..database import get_db
 from ..config import settings
+from ..core.hashing import password_pool
+from ..core.ratelimit import client_address, login_throttle
+from ..core.revocation import revocation_list
 
 logger = logging.getLogger(__name__)
 
@@ -17,24 +22,29 @@ router = APIRouter(
 )
 
 @router.post("/register", response_model=schemas.Token, status_code=status.HTTP_201_CREATED)
-def register_user(
+async def register_user(
     user: schemas.UserCreate,
     db: Session = Depends(get_db)
 ):
     """
     Register a new user and return an access token.
+    
+    DB work runs on the shared threadpool; the bcrypt hash runs on the
+    dedicated password pool, which answers 503 when it is saturated.
     """
     # Check if user with this email already exists
-    db_user = auth.get_user_by_email(db, email=user.email)
+    db_user = await run_in_threadpool(auth.get_user_by_email, db, user.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
+    hashed_password = await password_pool.run(auth.get_password_hash, user.password)
+    
     try:
         # Create the user
-        db_user = auth.create_user(db=db, user=user)
+        db_user = await run_in_threadpool(auth.create_user, db, user, hashed_password)
         
         # Create access token with user claims
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -43,13 +53,14 @@ def register_user(
                 "sub": db_user.email,  # Standard JWT practice is to use email as sub
                 "email": db_user.email,
                 "role": db_user.role.value,  # Convert enum to string
-                "user_id": db_user.id
+                "user_id": db_user.id,
+                "gen": db_user.token_generation
             },
             expires_delta=access_token_expires
         )
         
         # Log successful registration
-        logger.info(f"Successfully registered user: {db_user.email} (ID: {db_user.id})")
+        logger.info("Registered user %s", db_user.id)
         
         return {
             "access_token": access_token,
@@ -62,7 +73,7 @@ def register_user(
         
     except Exception as e:
         # Log the error
-        logger.error(f"Error during user registration: {str(e)}", exc_info=True)
+        logger.error("Error during user registration: %s", e, exc_info=True)
         
         # Rollback any database changes
         db.rollback()
@@ -73,19 +84,28 @@ def register_user(
         )
 
 @router.post("/login", response_model=schemas.Token)
-def login_for_access_token(
+async def login_for_access_token(
+    request: Request,
+    background_tasks: BackgroundTasks,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
     """
     OAuth2 compatible token login, get an access token for future requests.
+    
+    Attempts are throttled per IP and per email (429) before any password
+    work. Password verification runs on the dedicated password pool, which
+    answers 503 when it is saturated. Hashes made with outdated settings
+    are upgraded in the background after the response is sent.
     """
-    print(f"DEBUG: Login attempt - username: {form_data.username}, password length: {len(form_data.password) if form_data.password else 0}")
-    user = auth.authenticate_user(
-        db, 
-        email=form_data.username,  # OAuth2 uses 'username' field for email
-        password=form_data.password
-    )
+    await login_throttle.acheck(client_address(request), form_data.username)
+    
+    # OAuth2 uses 'username' field for email
+    user = await run_in_threadpool(auth.get_user_by_email, db, form_data.username)
+    if user and not await password_pool.run(
+        auth.verify_password, form_data.password, user.hashed_password
+    ):
+        user = None
     
     if not user:
         raise HTTPException(
@@ -94,6 +114,11 @@ def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    if auth.password_needs_rehash(user.hashed_password):
+        background_tasks.add_task(
+            auth.rehash_password, user.id, form_data.password, user.hashed_password
+        )
+    
     try:
         # Create access token with user claims
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -102,7 +127,8 @@ def login_for_access_token(
                 "sub": user.email,  # Standard JWT practice is to use email as sub
                 "email": user.email,
                 "role": user.role.value if hasattr(user.role, 'value') else str(user.role),
-                "user_id": user.id
+                "user_id": user.id,
+                "gen": user.token_generation
             },
             expires_delta=access_token_expires
         )
@@ -112,54 +138,20 @@ def login_for_access_token(
             "token_type": "bearer"
         }
     except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Error creating access token: {str(e)}")
+        logger.error("Error creating access token: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Could not create access token"
         )
 
 @router.get("/me", response_model=schemas.UserOut)
-async def read_users_me(
+def read_users_me(
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     """
     Get current user information.
     """
-    try:
-        import logging
-        logging.basicConfig(level=logging.DEBUG)
-        logger = logging.getLogger(__name__)
-        
-        logger.debug(f"Current user: {current_user}")
-        logger.debug(f"User ID: {current_user.id}")
-        logger.debug(f"User email: {current_user.email}")
-        logger.debug(f"User role: {current_user.role}")
-        
-        # Convert the user object to a dictionary to check for any serialization issues
-        user_dict = {
-            "id": current_user.id,
-            "email": current_user.email,
-            "first_name": current_user.first_name,
-            "last_name": current_user.last_name,
-            "role": current_user.role,
-            "is_active": current_user.is_active,
-            "created_at": current_user.created_at.isoformat() if current_user.created_at else None,
-            "updated_at": current_user.updated_at.isoformat() if current_user.updated_at else None
-        }
-        logger.debug(f"User dict: {user_dict}")
-        
-        return current_user
-    except Exception as e:
-        logger.error(f"Error in /me endpoint: {str(e)}")
-        logger.error(f"Error type: {type(e).__name__}")
-        import traceback
-        logger.error(f"Traceback: {traceback.format_exc()}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Internal server error: {str(e)}"
-        )
+    return current_user
 
 @router.post("/refresh")
 def refresh_token(
@@ -177,7 +169,8 @@ def refresh_token(
                 "sub": current_user.email,  # Use email as sub (standard JWT practice)
                 "email": current_user.email,
                 "role": current_user.role,
-                "user_id": current_user.id
+                "user_id": current_user.id,
+                "gen": current_user.token_generation
             },
             expires_delta=access_token_expires
         )
@@ -187,18 +180,33 @@ def refresh_token(
             "token_type": "bearer"
         }
     except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Error refreshing token: {str(e)}")
+        logger.error("Error refreshing token: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Could not refresh token"
         )
 
 @router.post("/logout")
-def logout():
+def logout(
+    token: str = Depends(auth.oauth2_scheme),
+    db: Session = Depends(get_db)
+):
     """
-    Logout user (client should delete the token).
-    In a real app, you might want to implement token blacklisting here.
+    Logout user by revoking the presented token until it expires.
+    The client should still delete its copy of the token.
     """
+    try:
+        payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+    except jwt.PyJWTError:
+        # Already unusable, nothing to revoke
+        return {"message": "Successfully logged out"}
+    
+    jti = payload.get("jti")
+    if jti and payload.get("exp"):
+        revocation_list.revoke(
+            db,
+            jti=jti,
+            expires_at=datetime.utcfromtimestamp(payload["exp"]),
+            user_id=payload.get("user_id")
+        )
     return {"message": "Successfully logged out"}
@@ -1,63 +1,125 @@
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from sqlalchemy import String, and_, func, literal, or_, update
+from sqlalchemy.orm import Session, defer, selectinload
+from typing import List, Optional, Tuple
+import base64
+import binascii
 
 from .. import models, schemas, auth
 from ..database import get_db
+from ..core import catalog, course_io, dashboard, membership, progress
+from ..core.search import search_index
 
 router = APIRouter(
     prefix="/courses",
     tags=["courses"]
 )
 
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(course: models.Course) -> str:
+    """Opaque keyset cursor pointing just after ``course``: its (created_at, id)."""
+    return base64.urlsafe_b64encode(f"c|{course.created_at.isoformat()}|{course.id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        prefix, created_at, course_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        if prefix != "c":
+            raise ValueError(prefix)
+        return datetime.fromisoformat(created_at), int(course_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _after_anchor(db: Session, created_at: datetime, after_id: int):
+    """Filter for courses that come after (created_at, after_id), newest first."""
+    if db.get_bind().dialect.name == "sqlite":
+        # SQLite keeps timestamps as text: CURRENT_TIMESTAMP writes no
+        # fractional seconds, SQLAlchemy writes six digits. A whole second
+        # may be stored either way; the bare form sorts first.
+        created_at = created_at.replace(tzinfo=None)
+        stamps = [created_at.strftime("%Y-%m-%d %H:%M:%S.%f")]
+        if not created_at.microsecond:
+            stamps.insert(0, created_at.strftime("%Y-%m-%d %H:%M:%S"))
+        anchors = [literal(stamp, String) for stamp in stamps]
+    else:
+        anchors = [literal(created_at, models.Course.created_at.type)]
+    return or_(
+        models.Course.created_at < anchors[0],
+        and_(models.Course.created_at.in_(anchors), models.Course.id < after_id)
+    )
+
+def query_courses(
+    db: Session,
+    current_user: Optional[models.User],
+    skip: int,
+    limit: int,
+    cursor: Optional[str]
+):
+    """Return one page of the courses visible to ``current_user`` and the next cursor."""
+    query = db.query(models.Course)
+    
+    # Teachers see only their courses, admins see all courses, and
+    # anonymous users and students see only published courses
+    if current_user is not None and current_user.role == models.UserRole.TEACHER:
+        query = query.filter(models.Course.teacher_id == current_user.id)
+    elif current_user is None or current_user.role != models.UserRole.ADMIN:
+        query = query.filter(models.Course.is_published == True)
+    
+    if cursor:
+        # The anchor is carried in the cursor, so paging goes on even if
+        # that course was deleted or unpublished since
+        query = query.filter(_after_anchor(db, *decode_cursor(cursor)))
+    
+    query = query.order_by(models.Course.created_at.desc(), models.Course.id.desc())
+    if skip and not cursor:
+        query = query.offset(skip)
+    
+    courses = query.limit(limit + 1).all()
+    if limit > 0 and len(courses) > limit:
+        courses = courses[:limit]
+        return courses, encode_cursor(courses[-1])
+    return courses, None
+
 @router.get("/", response_model=List[schemas.CourseOut])
 def get_courses(
-    skip: int = 0, 
-    limit: int = 100, 
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user_optional)
+    current_user: models.User = Depends(auth.get_current_principal_optional)
 ):
-    # If no user is logged in, return only published courses
-    if current_user is None:
-        courses = (
-            db.query(models.Course)
-            .filter(models.Course.is_published == True)
-            .order_by(models.Course.created_at.desc())
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
-    # If user is a teacher, return only their courses
-    elif current_user.role == models.UserRole.TEACHER:
-        courses = (
-            db.query(models.Course)
-            .filter(models.Course.teacher_id == current_user.id)
-            .order_by(models.Course.created_at.desc())
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
-    # If user is admin, return all courses
-    elif current_user.role == models.UserRole.ADMIN:
-        courses = (
-            db.query(models.Course)
-            .order_by(models.Course.created_at.desc())
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
-    # For students, return only published courses
-    else:
-        courses = (
-            db.query(models.Course)
-            .filter(models.Course.is_published == True)
-            .order_by(models.Course.created_at.desc())
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
-    return courses
+    """
+    List courses newest first.
+    
+    Pass ``cursor`` (from the previous page's X-Next-Cursor header) for
+    keyset pagination on (created_at, id); ``skip`` is still honoured for
+    offset paging but gets slower on deep pages.
+    
+    The published catalog seen by anonymous users and students is served
+    pre-serialized from an in-process cache with a strong ETag; teacher and
+    admin views are always built fresh and marked uncacheable.
+    """
+    if current_user is not None and current_user.role in (models.UserRole.TEACHER, models.UserRole.ADMIN):
+        courses, next_cursor = query_courses(db, current_user, skip, limit, cursor)
+        response.headers["Cache-Control"] = "private, no-store"
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return courses
+    
+    key = (0 if cursor else skip, limit, cursor)
+    page = catalog.get_page(key)
+    if page is None:
+        courses, next_cursor = query_courses(db, None, skip, limit, cursor)
+        page = catalog.build_page(courses, next_cursor)
+        catalog.store_page(key, page)
+    
+    headers = catalog.public_headers(page, anonymous=current_user is None)
+    if page.matches(if_none_match):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=page.body, media_type="application/json", headers=headers)
 
 def check_course_permission(db: Session, course_id: int, user: models.User):
     """Check if user has permission to modify the course"""
@@ -70,7 +132,7 @@ def check_course_permission(db: Session, course_id: int, user: models.User):
         return db_course
         
     # Teachers can only modify their own courses
-    if user.role == models.UserRole.TEACHER and db_course.created_by == user.id:
+    if user.role == models.UserRole.TEACHER and db_course.teacher_id == user.id:
         return db_course
         
     raise HTTPException(
@@ -82,7 +144,7 @@ def check_course_permission(db: Session, course_id: int, user: models.User):
 def get_course(
     course_id: int, 
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    current_user: models.User = Depends(auth.get_current_principal)
 ):
     db_course = db.query(models.Course).filter(models.Course.id == course_id).first()
     if db_course is None:
@@ -97,6 +159,64 @@ def get_course(
         
     return db_course
 
+def load_course_detail(db: Session, course_id: int, user) -> schemas.CourseDetail:
+    """
+    Build the course page for ``user`` in a fixed number of queries: the
+    course, its published modules (selectin-loaded without content), the
+    quiz question count per module, and the caller's enrollment.
+    """
+    db_course = db.query(models.Course).options(
+        selectinload(
+            models.Course.modules.and_(models.Module.is_published == True)
+        ).defer(models.Module.content, raiseload=True)
+    ).filter(models.Course.id == course_id).first()
+    if db_course is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    
+    # Only show unpublished courses to the creator or admin
+    if not db_course.is_published and db_course.teacher_id != user.id and user.role != models.UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have permission to view this course"
+        )
+    
+    modules = sorted(db_course.modules, key=lambda module: (module.order, module.id))
+    question_counts = {}
+    if modules:
+        question_counts = dict(
+            db.query(models.QuizQuestion.module_id, func.count(models.QuizQuestion.id))
+            .filter(models.QuizQuestion.module_id.in_([module.id for module in modules]))
+            .group_by(models.QuizQuestion.module_id)
+            .all()
+        )
+    
+    enrollment = db.query(models.Enrollment).filter(
+        models.Enrollment.course_id == course_id,
+        models.Enrollment.user_id == user.id
+    ).first()
+    
+    detail = schemas.CourseDetail.model_validate(db_course)
+    detail.modules = [
+        schemas.ModuleSummary.model_validate(module).model_copy(
+            update={"quiz_question_count": question_counts.get(module.id, 0)}
+        )
+        for module in modules
+    ]
+    detail.modules_count = len(modules)
+    if enrollment is not None:
+        detail.enrollment = schemas.EnrollmentOut.model_validate(enrollment)
+        detail.progress = enrollment.progress or 0
+    return detail
+
+@router.get("/{course_id}/detail", response_model=schemas.CourseDetail)
+def get_course_detail(
+    course_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_principal)
+):
+    """Course, published module outline, quiz counts and the caller's enrollment in one response"""
+    return load_course_detail(db, course_id, current_user)
+
 @router.post("/", response_model=schemas.CourseOut)
 def create_course(
     course: schemas.CourseCreate, 
@@ -114,6 +234,8 @@ def create_course(
     db_course = models.Course(**course.dict(), teacher_id=current_user.id)
     db.add(db_course)
     db.commit()
+    catalog.invalidate_catalog()
+    dashboard.invalidate_teacher(db_course.teacher_id)
     db.refresh(db_course)
     return db_course
 
@@ -134,9 +256,30 @@ def update_course(
     
     db_course.updated_at = datetime.utcnow()
     db.commit()
+    catalog.invalidate_catalog()
+    dashboard.invalidate_course(course_id)
     db.refresh(db_course)
     return db_course
 
+@router.post("/{course_id}/clone", response_model=schemas.CourseOut, status_code=status.HTTP_201_CREATED)
+def clone_course(
+    course_id: int,
+    clone: Optional[schemas.CourseClone] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """
+    Copy a course with its modules, quiz questions and options as a new
+    unpublished course owned by the caller (course owner or admin only).
+    """
+    db_course = check_course_permission(db, course_id, current_user)
+    
+    new_course_id = course_io.clone_course(
+        db, db_course, current_user.id, title=clone.title if clone else None
+    )
+    dashboard.invalidate_teacher(current_user.id)
+    return db.query(models.Course).filter(models.Course.id == new_course_id).first()
+
 @router.post("/{course_id}/modules", response_model=schemas.ModuleOut)
 def create_module(
     course_id: int,
@@ -155,10 +298,91 @@ def create_module(
     
     db_module = models.Module(**module_data, course_id=course_id)
     db.add(db_module)
+    db.flush()
+    progress.modules_changed(db, course_id)
     db.commit()
+    dashboard.invalidate_course(course_id)
     db.refresh(db_module)
     return db_module
 
+@router.patch("/{course_id}/modules", response_model=List[schemas.ModuleSummary])
+def bulk_update_modules(
+    course_id: int,
+    changes: schemas.ModuleBulkUpdate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """
+    Reorder and/or patch many modules of a course in one transaction
+    (admin and teachers only). Returns the course's modules in their new
+    order. Module order values must stay unique within the course.
+    """
+    check_course_permission(db, course_id, current_user)
+    
+    current_order = dict(
+        db.query(models.Module.id, models.Module.order)
+        .filter(models.Module.course_id == course_id)
+        .all()
+    )
+    
+    rows = {}
+    if changes.order is not None:
+        if sorted(changes.order) != sorted(current_order):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="order must list every module of the course exactly once"
+            )
+        for position, module_id in enumerate(changes.order, start=1):
+            rows[module_id] = {"id": module_id, "order": position}
+    
+    for patch in changes.modules:
+        if patch.id not in current_order:
+            raise HTTPException(status_code=404, detail=f"Module {patch.id} not found in this course")
+        values = patch.model_dump(exclude_unset=True, exclude={"id"})
+        if "order_index" in values:
+            if changes.order is not None:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Give module positions either in order or in order_index, not both"
+                )
+            values["order"] = values.pop("order_index")
+        if "content" in values:
+            values.update(models.derive_content_fields(values["content"]))
+        rows.setdefault(patch.id, {"id": patch.id}).update(values)
+    
+    new_order = {**current_order, **{
+        module_id: row["order"] for module_id, row in rows.items() if "order" in row
+    }}
+    if len(set(new_order.values())) != len(new_order):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Module order values must be unique within a course"
+        )
+    
+    if rows:
+        # One executemany UPDATE by primary key per distinct set of columns;
+        # a plain reorder is a single statement
+        db.execute(update(models.Module), sorted(rows.values(), key=lambda row: sorted(row)))
+        reindex = [
+            module_id for module_id, row in rows.items()
+            if row.keys() & {"title", "description", "content"}
+        ]
+        # Bulk updates bypass the ORM flush hook that maintains the index
+        if reindex and search_index.enabled:
+            search_index.reindex(db.connection(), module_ids=reindex)
+        publishing = any("is_published" in row for row in rows.values())
+        if publishing:
+            progress.modules_changed(db, course_id)
+        db.commit()
+        if publishing:
+            dashboard.invalidate_course(course_id)
+    
+    return db.query(models.Module).options(
+        defer(models.Module.content, raiseload=True)
+    ).filter(
+        models.Module.course_id == course_id
+    ).order_by(models.Module.order, models.Module.id).all()
+
 @router.delete("/{course_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_course(
     course_id: int,
@@ -171,4 +395,7 @@ def delete_course(
     # Delete the course
     db.delete(db_course)
     db.commit()
+    membership.forget_course(course_id)
+    catalog.invalidate_catalog()
+    dashboard.invalidate_course(course_id)
     return None
@@ -6,6 +6,7 @@ from datetime import datetime
 from .. import models, schemas
 from ..database import get_db
 from ..auth import get_current_active_user, get_current_active_admin
+from ..core import dashboard, membership, progress
 
 router = APIRouter(
     prefix="/enrollments",
@@ -56,6 +57,8 @@ def enroll_in_course(
     
     db.add(db_enrollment)
     db.commit()
+    membership.enrolled(current_user.id, enrollment.course_id)
+    dashboard.invalidate_course(enrollment.course_id)
     db.refresh(db_enrollment)
     
     return db_enrollment
@@ -139,6 +142,7 @@ def update_enrollment(
     db_enrollment.updated_at = datetime.utcnow()
     
     db.commit()
+    dashboard.invalidate_course(db_enrollment.course_id)
     db.refresh(db_enrollment)
     
     return db_enrollment
@@ -167,8 +171,12 @@ def unenroll_from_course(
             detail="Not authorized to unenroll from this course"
         )
     
+    user_id, course_id = db_enrollment.user_id, db_enrollment.course_id
+    progress.clear_completions(db, user_id, course_id)
     db.delete(db_enrollment)
     db.commit()
+    membership.unenrolled(user_id, course_id)
+    dashboard.invalidate_course(course_id)
     return None
 
 @router.get("/course/{course_id}", response_model=List[schemas.EnrollmentOut])
@@ -0,0 +1,43 @@
+from fastapi import APIRouter, HTTPException, Request
+import mimetypes
+import re
+
+from ..config import settings
+from ..core.media import file_response
+from ..core.uploads import media_store
+
+router = APIRouter(
+    prefix="/media",
+    tags=["media"]
+)
+
+# Stored names are <sha256>.<extension>, so a URL always names the same bytes
+STORED_NAME = re.compile(r"^([0-9a-f]{64})\.([a-z0-9]{1,10})$")
+
+@router.api_route("/{name}", methods=["GET", "HEAD"])
+def get_media(name: str, request: Request):
+    """
+    Serve an uploaded file by its content-addressed name, with Range
+    requests for seeking and cached forever by browsers and proxies.
+    """
+    match = STORED_NAME.match(name)
+    if not match:
+        raise HTTPException(status_code=404, detail="File not found")
+    sha256, extension = match.groups()
+    path = media_store.object_path(sha256, extension)
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="File not found")
+
+    accel_redirect = None
+    if settings.MEDIA_ACCEL_REDIRECT:
+        relative = path.relative_to(media_store.root / "objects").as_posix()
+        accel_redirect = settings.MEDIA_ACCEL_REDIRECT.rstrip("/") + "/" + relative
+    return file_response(
+        request.headers,
+        request.method,
+        path,
+        media_type=mimetypes.guess_type(name)[0] or "application/octet-stream",
+        etag=f'"{sha256}"',
+        cache_control="public, max-age=31536000, immutable",
+        accel_redirect=accel_redirect
+    )
@@ -1,41 +1,38 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, defer, undefer
 from typing import List
 
 from .. import models, schemas
 from ..database import get_db
 from ..auth import get_current_active_user
+from ..core import dashboard, membership
+from ..core.progress import record_completion
+from ..core.rendering import render_content
 
 router = APIRouter(
     prefix="/courses/{course_id}/modules",
     tags=["modules"]
 )
 
-@router.get("/", response_model=List[schemas.ModuleOut])
+# Enrollment checks come from the membership cache; admins may read any
+# course but only record progress in courses they are enrolled in
+course_reader = membership.course_member()
+course_learner = membership.course_member(get_current_active_user, allow_admin=False)
+
+@router.get("/", response_model=List[schemas.ModuleSummary])
 def get_course_modules(
     course_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user)
+    current_user: models.User = Depends(course_reader)
 ):
-    # Verify course exists
-    db_course = db.query(models.Course).filter(models.Course.id == course_id).first()
-    if not db_course:
-        raise HTTPException(status_code=404, detail="Course not found")
-    
-    # Check if user is enrolled in the course
-    if current_user.role != models.UserRole.ADMIN:
-        enrollment = db.query(models.Enrollment).filter(
-            models.Enrollment.user_id == current_user.id,
-            models.Enrollment.course_id == course_id
-        ).first()
-        if not enrollment:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You are not enrolled in this course"
-            )
-    
+    """
+    Table of contents of a course. Module content is never loaded here;
+    fetch it from the single-module endpoint.
+    """
     # Get all published modules for the course
-    modules = db.query(models.Module).filter(
+    modules = db.query(models.Module).options(
+        defer(models.Module.content, raiseload=True)
+    ).filter(
         models.Module.course_id == course_id,
         models.Module.is_published == True
     ).order_by(models.Module.order).all()
@@ -47,27 +44,12 @@ def get_module(
     course_id: int,
     module_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user)
+    current_user: models.User = Depends(course_reader)
 ):
-    # Verify course exists
-    db_course = db.query(models.Course).filter(models.Course.id == course_id).first()
-    if not db_course:
-        raise HTTPException(status_code=404, detail="Course not found")
-    
-    # Check if user is enrolled in the course
-    if current_user.role != models.UserRole.ADMIN:
-        enrollment = db.query(models.Enrollment).filter(
-            models.Enrollment.user_id == current_user.id,
-            models.Enrollment.course_id == course_id
-        ).first()
-        if not enrollment:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You are not enrolled in this course"
-            )
-    
     # Get the module with its quiz questions if any
-    module = db.query(models.Module).filter(
+    module = db.query(models.Module).options(
+        undefer(models.Module.content_html)
+    ).filter(
         models.Module.id == module_id,
         models.Module.course_id == course_id
     ).first()
@@ -75,21 +57,26 @@ def get_module(
     if not module:
         raise HTTPException(status_code=404, detail="Module not found")
     
-    return module
+    result = schemas.ModuleWithContent.model_validate(module)
+    if result.content_html is None:
+        # Not rendered yet (see scripts/backfill_module_content.py)
+        result.content_html, _ = render_content(module.content)
+    return result
 
 @router.post("/{module_id}/complete", status_code=status.HTTP_200_OK)
 def complete_module(
     course_id: int,
     module_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user)
+    current_user: models.User = Depends(course_learner)
 ):
-    # Verify course and module exist
-    db_course = db.query(models.Course).filter(models.Course.id == course_id).first()
-    if not db_course:
-        raise HTTPException(status_code=404, detail="Course not found")
-    
-    module = db.query(models.Module).filter(
+    """
+    Mark a module as completed for the current user. Completing it again
+    changes nothing; progress is the share of published modules completed.
+    """
+    module = db.query(models.Module).options(
+        defer(models.Module.content, raiseload=True)
+    ).filter(
         models.Module.id == module_id,
         models.Module.course_id == course_id
     ).first()
@@ -97,34 +84,15 @@ def complete_module(
     if not module:
         raise HTTPException(status_code=404, detail="Module not found")
     
-    # Check if user is enrolled in the course
-    enrollment = db.query(models.Enrollment).filter(
-        models.Enrollment.user_id == current_user.id,
-        models.Enrollment.course_id == course_id
-    ).first()
-    
-    if not enrollment:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You are not enrolled in this course"
-        )
-    
-    # Update progress
-    total_modules = db.query(models.Module).filter(
-        models.Module.course_id == course_id,
-        models.Module.is_published == True
-    ).count()
-    
-    # In a real app, you would update a user's progress in a more sophisticated way
-    # This is a simplified version that just increments the progress
-    if enrollment.progress < 100:
-        progress_per_module = 100 // total_modules
-        enrollment.progress = min(100, enrollment.progress + progress_per_module)
-        
-        if enrollment.progress >= 100 and not enrollment.completed:
-            enrollment.completed = True
-            enrollment.completed_at = datetime.utcnow()
-        
-        db.commit()
-    
-    return {"message": "Module marked as completed", "progress": enrollment.progress}
+    recorded, progress = record_completion(db, current_user.id, course_id, module)
+    if progress is not None:
+        dashboard.invalidate_course(course_id)
+    else:
+        progress = db.query(models.Enrollment.progress).filter(
+            models.Enrollment.user_id == current_user.id,
+            models.Enrollment.course_id == course_id
+        ).scalar() or 0
+    return {
+        "message": "Module marked as completed" if recorded else "Module already completed",
+        "progress": progress
+    }
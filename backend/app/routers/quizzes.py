@@ -1,235 +1,149 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session, load_only
 from typing import List, Dict, Any
-from datetime import datetime
 
 from .. import models, schemas
 from ..database import get_db
 from ..core.security import get_current_active_user
+from ..core import dashboard, membership
+from ..core.progress import record_completion
+from ..core.quizzes import (
+    best_score,
+    get_quiz,
+    grade,
+    latest_submission,
+    record_submission,
+    submission_history
+)
 
 router = APIRouter(
     prefix="/quizzes",
     tags=["quizzes"]
 )
 
+MAX_HISTORY_SIZE = 500
+
+# Admins may read any quiz; taking one needs an enrollment
+quiz_reader = membership.module_member()
+quiz_taker = membership.module_member(get_current_active_user, allow_admin=False)
+
 @router.get("/module/{module_id}", response_model=List[schemas.QuizQuestionOut])
 def get_quiz_questions(
     module_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user)
+    access: membership.ModuleAccess = Depends(quiz_reader)
 ):
     """
     Get all quiz questions for a specific module.
     """
-    # Verify the module exists and user has access to it
-    module = db.query(models.Module).filter(models.Module.id == module_id).first()
-    if not module:
-        raise HTTPException(status_code=404, detail="Module not found")
-    
-    # Check if user is enrolled in the course
-    if current_user.role != models.UserRole.ADMIN:
-        enrollment = db.query(models.Enrollment).filter(
-            models.Enrollment.user_id == current_user.id,
-            models.Enrollment.course_id == module.course_id
-        ).first()
-        
-        if not enrollment:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You are not enrolled in this course"
-            )
-    
-    # Get all published quiz questions for the module with their options
-    questions = db.query(models.QuizQuestion).filter(
-        models.QuizQuestion.module_id == module_id
-    ).all()
-    
-    return questions
+    return get_quiz(db, module_id).questions
 
 @router.post("/submit/{module_id}", response_model=schemas.QuizResult)
 def submit_quiz_answers(
     module_id: int,
     submission: schemas.QuizSubmission,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user)
+    access: membership.ModuleAccess = Depends(quiz_taker)
 ):
     """
-    Submit quiz answers and get results.
+    Submit quiz answers and get results. Every submission is kept as a
+    numbered attempt; passing the quiz completes the module.
     """
-    # Verify the module exists and user has access to it
-    module = db.query(models.Module).filter(models.Module.id == module_id).first()
-    if not module:
-        raise HTTPException(status_code=404, detail="Module not found")
-    
-    # Check if user is enrolled in the course
-    enrollment = db.query(models.Enrollment).filter(
-        models.Enrollment.user_id == current_user.id,
-        models.Enrollment.course_id == module.course_id
-    ).first()
-    
-    if not enrollment:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You are not enrolled in this course"
-        )
-    
-    # Get all questions for the module
-    questions = db.query(models.QuizQuestion).filter(
-        models.QuizQuestion.module_id == module_id
-    ).all()
-    
-    if not questions:
+    current_user = access.user
+    quiz = get_quiz(db, module_id)
+    if not quiz.questions:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No questions found for this module"
         )
     
-    # Process the submission
-    total_questions = len(questions)
-    correct_answers = 0
-    question_results: List[Dict[str, Any]] = []
+    result = grade(quiz, submission.answers)
+    attempt_number = record_submission(db, current_user.id, quiz, result, submission.started_at).attempt_number
     
-    # Get all question IDs for validation
-    question_ids = {q.id for q in questions}
-    
-    # Check each answer
-    for answer in submission.answers:
-        if answer.question_id not in question_ids:
-            continue  # Skip invalid question IDs
-        
-        # Get the question and its correct options
-        question = next((q for q in questions if q.id == answer.question_id), None)
-        if not question:
-            continue
-        
-        # Get the selected option
-        selected_option = db.query(models.QuizOption).filter(
-            models.QuizOption.id == answer.selected_option_id,
-            models.QuizOption.question_id == answer.question_id
-        ).first()
-        
-        is_correct = bool(selected_option and selected_option.is_correct)
-        
-        # Record the attempt
-        attempt = models.QuizAttempt(
-            user_id=current_user.id,
-            question_id=answer.question_id,
-            selected_option_id=answer.selected_option_id,
-            is_correct=is_correct
-        )
-        db.add(attempt)
-        
-        # Update stats
-        if is_correct:
-            correct_answers += 1
-        
-        # Add to results
-        question_results.append({
-            "question_id": answer.question_id,
-            "selected_option_id": answer.selected_option_id,
-            "is_correct": is_correct,
-            "correct_option_id": next(
-                (opt.id for opt in question.options if opt.is_correct), None
-            ) if question.options else None
-        })
-    
-    # Calculate score
-    score = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
-    passed = score >= 70  # 70% passing score
-    
-    # Update user progress if this is the first attempt or the score is better
-    db_attempt = db.query(models.QuizAttempt).filter(
-        models.QuizAttempt.user_id == current_user.id,
-        models.QuizAttempt.question_id.in_([q.id for q in questions])
-    ).first()
-    
-    if not db_attempt or score > (enrollment.progress or 0):
-        enrollment.progress = int(score)
-        if passed and not enrollment.completed:
-            enrollment.completed = True
-            enrollment.completed_at = datetime.utcnow()
-    
-    db.commit()
+    if result.passed:
+        module = db.query(models.Module).options(
+            load_only(models.Module.id, models.Module.is_published)
+        ).filter(models.Module.id == module_id).first()
+        record_completion(db, current_user.id, access.course_id, module)
+    dashboard.invalidate_course(access.course_id)
     
     return {
-        "score": score,
-        "total_questions": total_questions,
-        "correct_answers": correct_answers,
-        "passed": passed,
-        "feedback": "Congratulations! You passed!" if passed else "Keep trying! You can do better!"
+        "score": result.score,
+        "total_questions": result.total_questions,
+        "correct_answers": result.correct_answers,
+        "passed": result.passed,
+        "feedback": "Congratulations! You passed!" if result.passed else "Keep trying! You can do better!",
+        "attempt_number": attempt_number
     }
 
 @router.get("/results/{module_id}", response_model=Dict[str, Any])
 def get_quiz_results(
     module_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user)
+    access: membership.ModuleAccess = Depends(quiz_taker)
 ):
     """
-    Get quiz results for a specific module.
+    Get the latest quiz result for a specific module, with the best score
+    over all attempts.
     """
-    # Verify the module exists and user has access to it
-    module = db.query(models.Module).filter(models.Module.id == module_id).first()
-    if not module:
-        raise HTTPException(status_code=404, detail="Module not found")
-    
-    # Check if user is enrolled in the course
-    enrollment = db.query(models.Enrollment).filter(
-        models.Enrollment.user_id == current_user.id,
-        models.Enrollment.course_id == module.course_id
-    ).first()
-    
-    if not enrollment:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You are not enrolled in this course"
-        )
-    
-    # Get all questions for the module
-    questions = db.query(models.QuizQuestion).filter(
-        models.QuizQuestion.module_id == module_id
-    ).all()
+    current_user = access.user
     
+    quiz = get_quiz(db, module_id)
+    questions = quiz.questions
     if not questions:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No questions found for this module"
         )
     
-    # Get all user's attempts for these questions
-    attempts = db.query(models.QuizAttempt).filter(
-        models.QuizAttempt.user_id == current_user.id,
-        models.QuizAttempt.question_id.in_([q.id for q in questions])
-    ).all()
-    
-    # Calculate results
-    total_questions = len(questions)
-    correct_answers = sum(1 for a in attempts if a.is_correct)
-    score = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
-    passed = score >= 70
+    latest = latest_submission(db, current_user.id, module_id)
+    answers = {}
+    if latest:
+        answers = {
+            attempt.question_id: attempt
+            for attempt in db.query(models.QuizAttempt).filter(
+                models.QuizAttempt.submission_id == latest.id
+            )
+        }
     
     # Get detailed results for each question
     question_results = []
     for question in questions:
-        attempt = next((a for a in attempts if a.question_id == question.id), None)
-        correct_option = next((opt for opt in question.options if opt.is_correct), None)
-        
+        attempt = answers.get(question.id)
         question_results.append({
             "question_id": question.id,
             "question_text": question.question,
             "selected_option_id": attempt.selected_option_id if attempt else None,
             "is_correct": attempt.is_correct if attempt else False,
-            "correct_option_id": correct_option.id if correct_option else None,
+            "correct_option_id": quiz.correct_option_id(question.id),
             "explanation": ""  # Could be added to the Question model
         })
     
     return {
         "module_id": module_id,
-        "score": score,
-        "passed": passed,
-        "total_questions": total_questions,
-        "correct_answers": correct_answers,
-        "attempts": len(attempts) // len(questions) if questions else 0,
-        "completed_at": enrollment.completed_at,
+        "score": latest.score if latest else 0,
+        "passed": latest.passed if latest else False,
+        "best_score": best_score(db, current_user.id, module_id) if latest else None,
+        "total_questions": len(questions),
+        "correct_answers": latest.correct_answers if latest else 0,
+        "attempts": latest.attempt_number if latest else 0,
+        "submitted_at": latest.submitted_at if latest else None,
+        "completed_at": db.query(models.Enrollment.completed_at).filter(
+            models.Enrollment.user_id == current_user.id,
+            models.Enrollment.course_id == access.course_id
+        ).scalar(),
         "questions": question_results
     }
+
+@router.get("/history/{module_id}", response_model=List[schemas.QuizSubmissionOut])
+def get_quiz_history(
+    module_id: int,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_HISTORY_SIZE),
+    db: Session = Depends(get_db),
+    access: membership.ModuleAccess = Depends(quiz_taker)
+):
+    """
+    The current user's submissions of a module's quiz, newest first.
+    """
+    return submission_history(db, access.user.id, module_id, skip, limit)
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from .. import models, schemas
+from ..auth import get_current_principal_optional
+from ..database import get_db
+from ..core.search import search_index
+
+router = APIRouter(
+    prefix="/search",
+    tags=["search"]
+)
+
+@router.get("/", response_model=schemas.SearchResults)
+def search(
+    query: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=50),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    current_user: Optional[models.User] = Depends(get_current_principal_optional)
+):
+    """
+    Ranked full-text search over published courses and their modules.
+    
+    Anonymous callers only get course hits; module titles, descriptions and
+    content are searched for signed-in users.
+    """
+    if not search_index.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Search is not available"
+        )
+    
+    params = schemas.SearchQuery(query=query, limit=limit, offset=offset)
+    hits = search_index.search(
+        db,
+        params.query,
+        limit=params.limit + 1,
+        offset=params.offset,
+        include_modules=current_user is not None
+    )
+    next_offset = None
+    if len(hits) > params.limit:
+        hits = hits[:params.limit]
+        next_offset = params.offset + params.limit
+    return schemas.SearchResults(
+        query=params.query,
+        limit=params.limit,
+        offset=params.offset,
+        results=hits,
+        next_offset=next_offset
+    )
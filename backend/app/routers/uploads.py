@@ -0,0 +1,127 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .. import models, schemas
+from ..auth import get_current_active_user
+from ..database import get_db
+from ..core.images import image_variants
+from ..core.uploads import media_store
+
+router = APIRouter(
+    prefix="/uploads",
+    tags=["uploads"]
+)
+
+def get_uploader(current_user: models.User = Depends(get_current_active_user)) -> models.User:
+    if current_user.role not in [models.UserRole.TEACHER, models.UserRole.ADMIN]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only teachers and admins can upload files"
+        )
+    return current_user
+
+def _file_response(media: models.MediaFile, filename: str) -> schemas.FileUploadResponse:
+    # Images get their resized variants made ahead of being used as thumbnails
+    image_variants.schedule(media.sha256, media.extension)
+    return schemas.FileUploadResponse(
+        filename=filename,
+        content_type=media.content_type,
+        size=media.size,
+        url=media_store.url_for(media),
+        sha256=media.sha256
+    )
+
+def _session_response(session: models.UploadSession, offset: int, response: Response) -> schemas.UploadSessionOut:
+    response.headers["Upload-Offset"] = str(offset)
+    return schemas.UploadSessionOut(
+        id=session.id,
+        filename=session.filename,
+        content_type=session.content_type,
+        size=session.size,
+        offset=offset,
+        expires_at=session.expires_at
+    )
+
+@router.post("/", response_model=schemas.FileUploadResponse, status_code=status.HTTP_201_CREATED)
+async def upload_file(
+    request: Request,
+    filename: str = Query(..., min_length=1, max_length=255),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_uploader)
+):
+    """
+    Upload a file sent as the raw request body (not multipart).
+
+    The body is streamed to disk and hashed as it arrives; identical files
+    are stored once and get the same URL. Use an upload session for large
+    files on unreliable connections.
+    """
+    content_length = request.headers.get("content-length")
+    media = await media_store.store(
+        db,
+        request.stream(),
+        filename,
+        current_user.id,
+        int(content_length) if content_length and content_length.isdigit() else None
+    )
+    return _file_response(media, filename)
+
+@router.post("/sessions", response_model=schemas.UploadSessionOut, status_code=status.HTTP_201_CREATED)
+def create_upload_session(
+    upload: schemas.UploadSessionCreate,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_uploader)
+):
+    """
+    Start a resumable upload. Send the file in chunks with PATCH, each
+    starting at the current offset, then complete the upload.
+    """
+    session = media_store.create_session(db, current_user.id, upload.filename, upload.size)
+    return _session_response(session, 0, response)
+
+@router.get("/sessions/{session_id}", response_model=schemas.UploadSessionOut)
+def get_upload_session(
+    session_id: str,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_uploader)
+):
+    """Offset to resume an interrupted upload from"""
+    session = media_store.get_session(db, session_id, current_user.id)
+    return _session_response(session, media_store.offset(session), response)
+
+@router.patch("/sessions/{session_id}", response_model=schemas.UploadSessionOut)
+async def upload_chunk(
+    session_id: str,
+    request: Request,
+    response: Response,
+    offset: int = Query(..., ge=0),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_uploader)
+):
+    """
+    Append the request body to an upload. ``offset`` must equal the bytes
+    received so far; otherwise the answer is a 409 whose ``Upload-Offset``
+    header says where to resume.
+    """
+    session = await run_in_threadpool(media_store.get_session, db, session_id, current_user.id)
+    new_offset = await media_store.append(session, request.stream(), offset)
+    return _session_response(session, new_offset, response)
+
+@router.post(
+    "/sessions/{session_id}/complete",
+    response_model=schemas.FileUploadResponse,
+    status_code=status.HTTP_201_CREATED
+)
+async def complete_upload(
+    session_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_uploader)
+):
+    """Store a fully received upload; the session is closed"""
+    session = await run_in_threadpool(media_store.get_session, db, session_id, current_user.id)
+    filename = session.filename
+    media = await media_store.complete(db, session)
+    return _file_response(media, filename)
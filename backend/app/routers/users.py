@@ -4,6 +4,7 @@ from typing import List, Optional
 
 from .. import models, schemas
 from ..database import get_db
+from ..core import membership, principals
 from ..auth import (
     get_current_active_user,
     get_current_active_admin,
@@ -86,10 +87,14 @@ def update_user_me(
     if "password" in update_data:
         update_data["hashed_password"] = get_password_hash(update_data.pop("password"))
     
+    if principals.authorization_changed(current_user, update_data):
+        principals.bump_token_generation(current_user)
+    
     for field, value in update_data.items():
         setattr(current_user, field, value)
     
     db.commit()
+    principals.invalidate_user(current_user.id)
     db.refresh(current_user)
     return current_user
 
@@ -112,10 +117,14 @@ def update_user(
     if "password" in update_data:
         update_data["hashed_password"] = get_password_hash(update_data.pop("password"))
     
+    if principals.authorization_changed(db_user, update_data):
+        principals.bump_token_generation(db_user)
+    
     for field, value in update_data.items():
         setattr(db_user, field, value)
     
     db.commit()
+    principals.invalidate_user(user_id)
     db.refresh(db_user)
     return db_user
 
@@ -140,6 +149,8 @@ def delete_user(
     
     db.delete(db_user)
     db.commit()
+    principals.invalidate_user(user_id)
+    membership.forget_user(user_id)
     return None
 
 @router.get("/me/courses", response_model=List[schemas.EnrollmentOut])
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, Field, model_validator
 from typing import List, Optional, Union
 from enum import Enum
 from datetime import datetime
@@ -59,12 +59,24 @@ class CourseUpdate(CourseBase):
     content_type: Optional[str] = None
     is_published: Optional[bool] = None
 
+class CourseClone(BaseModel):
+    title: Optional[str] = None  # defaults to "<source title> (copy)"
+
+class ImageVariant(BaseModel):
+    """A resized copy of an image, for srcset / <picture> sources"""
+    url: str
+    width: int
+    height: int
+    content_type: str
+
 class CourseOut(CourseBase):
     id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
     modules_count: Optional[int] = 0
     enrolled_users_count: Optional[int] = 0
+    # Smallest first per content type; None until made (or for external images)
+    thumbnail_variants: Optional[List[ImageVariant]] = None
 
     class Config:
         from_attributes = True
@@ -97,13 +109,37 @@ class ModuleUpdate(BaseModel):
     order_index: Optional[int] = None
     is_published: Optional[bool] = None
 
+class ModulePatch(ModuleUpdate):
+    id: int
+
+    @model_validator(mode="after")
+    def _no_null_required_fields(self):
+        # Fields left out are unchanged, but these columns cannot be cleared
+        cleared = sorted(
+            name for name in self.model_fields_set & {"title", "content", "content_type", "order_index", "is_published"}
+            if getattr(self, name) is None
+        )
+        if cleared:
+            raise ValueError(f"{', '.join(cleared)} cannot be null")
+        return self
+
+class ModuleBulkUpdate(BaseModel):
+    """
+    Either the full ordering of a course's modules (module ids, first to
+    last) or partial patches for some of them, or both
+    """
+    order: Optional[List[int]] = None
+    modules: List[ModulePatch] = []
+
 class ModuleOut(BaseModel):
     id: int
     title: str
     description: Optional[str] = None
     content: Optional[str] = None
+    content_html: Optional[str] = None  # sanitized rendition of content, rendered on write
+    content_hash: Optional[str] = None
     content_type: str = "text"
-    duration: int = 0
+    duration: Optional[int] = 0
     order_index: int = 0
     is_published: bool = True
     course_id: int
@@ -117,13 +153,19 @@ class ModuleOut(BaseModel):
 class QuizOptionBase(BaseModel):
     option_text: str
     is_correct: bool = False
-    question_id: int
 
 class QuizOptionCreate(QuizOptionBase):
-    pass
+    question_id: int
+
+class QuizQuestionOptionCreate(QuizOptionBase):
+    """An option created along with its question, which supplies the id"""
+
+    class Config:
+        extra = "forbid"
 
 class QuizOptionOut(QuizOptionBase):
     id: int
+    question_id: int
 
     class Config:
         from_attributes = True
@@ -134,7 +176,7 @@ class QuizQuestionBase(BaseModel):
     points: int = 1
 
 class QuizQuestionCreate(QuizQuestionBase):
-    options: List[QuizOptionCreate]
+    options: List[QuizQuestionOptionCreate]
 
 class QuizQuestionOut(QuizQuestionBase):
     id: int
@@ -150,6 +192,7 @@ class QuizAnswer(BaseModel):
 
 class QuizSubmission(BaseModel):
     answers: List[QuizAnswer]
+    started_at: Optional[datetime] = None  # when the learner opened the quiz
 
 class QuizResult(BaseModel):
     score: float
@@ -157,6 +200,21 @@ class QuizResult(BaseModel):
     correct_answers: int
     passed: bool
     feedback: Optional[str] = None
+    attempt_number: Optional[int] = None
+
+class QuizSubmissionOut(BaseModel):
+    id: int
+    module_id: int
+    attempt_number: int
+    score: float
+    passed: bool
+    correct_answers: int
+    total_questions: int
+    started_at: Optional[datetime] = None
+    submitted_at: datetime
+
+    class Config:
+        from_attributes = True
 
 # Enrollment related schemas
 class EnrollmentBase(BaseModel):
@@ -227,15 +285,118 @@ class CourseWithModules(CourseOut):
     class Config:
         from_attributes = True
 
+class ModuleSummary(BaseModel):
+    """A module as listed in a course outline, without its content"""
+    id: int
+    title: str
+    description: Optional[str] = None
+    content_type: str = "text"
+    duration: Optional[int] = 0
+    order_index: int = Field(0, validation_alias=AliasChoices("order_index", "order"))
+    is_published: bool = True
+    content_length: Optional[int] = None
+    content_hash: Optional[str] = None
+    quiz_question_count: Optional[int] = None
+    
+    class Config:
+        from_attributes = True
+
+class CourseDetail(CourseOut):
+    """Everything a course page needs, for the calling user"""
+    modules: List[ModuleSummary] = []
+    enrollment: Optional[EnrollmentOut] = None
+    progress: int = 0
+    
+    class Config:
+        from_attributes = True
+
+class CourseStats(BaseModel):
+    """Teacher dashboard figures for one course"""
+    course_id: int
+    title: str
+    is_published: bool
+    enrollment_count: int = 0
+    completion_count: int = 0
+    completion_rate: float = 0.0  # 0-1
+    average_progress: float = 0.0  # 0-100
+    quiz_attempt_count: int = 0  # submitted quizzes
+    average_quiz_score: Optional[float] = None  # mean submission score, 0-100
+
+# Course import/export (one CourseExport per JSON Lines record)
+class QuizOptionExport(BaseModel):
+    option_text: str
+    is_correct: bool = False
+
+class QuizQuestionExport(BaseModel):
+    question: str
+    points: int = 1
+    options: List[QuizOptionExport] = []
+
+class ModuleExport(BaseModel):
+    title: str
+    description: Optional[str] = None
+    content: str = ""
+    content_type: str = "text"
+    duration: Optional[int] = 0
+    order_index: int = 0
+    is_published: bool = True
+    questions: List[QuizQuestionExport] = []
+
+class CourseExport(BaseModel):
+    title: str
+    description: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    video_url: Optional[str] = None
+    content_type: str = "text"
+    is_published: bool = False
+    modules: List[ModuleExport] = []
+
+class CourseImportError(BaseModel):
+    line: int
+    error: str
+
+class CourseImportResult(BaseModel):
+    imported: int = 0
+    course_ids: List[int] = []
+    errors: List[CourseImportError] = []
+
 # Search and filter
 class SearchQuery(BaseModel):
     query: str
     limit: int = 10
     offset: int = 0
 
+class SearchHit(BaseModel):
+    kind: str  # course or module
+    id: int
+    course_id: int
+    title: str
+    snippet: str = ""  # matching text with terms wrapped in <mark>
+    score: float = 0.0
+
+class SearchResults(BaseModel):
+    query: str
+    limit: int
+    offset: int
+    results: List[SearchHit] = []
+    next_offset: Optional[int] = None
+
 # File upload
 class FileUploadResponse(BaseModel):
     filename: str
     content_type: str
     size: int
     url: str
+    sha256: Optional[str] = None
+
+class UploadSessionCreate(BaseModel):
+    filename: str = Field(..., min_length=1, max_length=255)
+    size: int = Field(..., gt=0)
+
+class UploadSessionOut(BaseModel):
+    id: str
+    filename: str
+    content_type: str
+    size: int
+    offset: int = 0  # bytes received so far; send the next chunk from here
+    expires_at: datetime
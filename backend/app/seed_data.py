@@ -7,6 +7,7 @@ import os
 from sqlalchemy.orm import Session
 from app.database import SessionLocal, engine
 from app import models, auth
+from app.core.schema import upgrade_schema
 from app.core.security import get_password_hash
 
 def seed_demo_data():
@@ -211,8 +212,9 @@ def seed_demo_data():
 
 def init_db():
     """Initialize database tables and seed demo data"""
-    # Create tables
+    # Create tables and bring existing ones up to date
     models.Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
     print("Database tables created successfully!")
     
     # Seed demo data
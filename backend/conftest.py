@@ -0,0 +1,112 @@
+"""
+pytest fixtures: the app against a throwaway SQLite database, emptied (with
+the per-process caches) before each test, and users to call it as.
+
+Run from backend/:
+    python -m pytest -q
+"""
+import importlib
+import os
+import tempfile
+
+import pytest
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/test.db"
+os.environ["UPLOAD_FOLDER"] = os.path.join(_tmp_dir, "uploads")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+# Scripts that talk to a running server, or set up their own database
+collect_ignore = ["test_auth.py", "test_login.py", "test_password.py", "scripts"]
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app.main import app
+    return app
+
+
+@pytest.fixture
+def client(app):
+    from fastapi.testclient import TestClient
+    return TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clean_database(app):
+    from app import models
+    from app.core import catalog, dashboard, membership, principals, progress, quizzes
+    from app.database import engine
+
+    with engine.begin() as connection:
+        for table in reversed(models.Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+    # Row ids are reused once tables are emptied, so cached rows must go too
+    for cache in (
+        catalog.catalog_cache,
+        dashboard.dashboard_cache,
+        membership.membership_cache,
+        membership.module_course_cache,
+        principals.principal_cache,
+        principals.generation_cache,
+        progress.module_count_cache,
+        quizzes.quiz_cache,
+    ):
+        cache.clear()
+    yield
+
+
+@pytest.fixture
+def db(app):
+    from app.database import SessionLocal
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_user(db):
+    from app import models
+
+    def make_user(email: str, role=None):
+        user = models.User(
+            email=email,
+            hashed_password="x",
+            first_name="Test",
+            last_name="User",
+            role=role or models.UserRole.STUDENT
+        )
+        db.add(user)
+        db.commit()
+        return user
+    return make_user
+
+
+@pytest.fixture
+def auth_headers():
+    # app.auth, not the app.routers.auth module that shadows it on the package
+    auth = importlib.import_module("app.auth")
+
+    def auth_headers(user) -> dict:
+        return {"Authorization": f"Bearer {auth.create_access_token({'sub': user.email})}"}
+    return auth_headers
+
+
+@pytest.fixture
+def teacher(make_user):
+    from app import models
+    return make_user("teacher@example.com", models.UserRole.TEACHER)
+
+
+@pytest.fixture
+def student(make_user):
+    return make_user("student@example.com")
+
+
+@pytest.fixture
+def admin(make_user):
+    from app import models
+    return make_user("admin@example.com", models.UserRole.ADMIN)
@@ -0,0 +1,75 @@
+"""
+Render stored module content for existing rows: sanitized HTML, plain-text
+extract, length and hash.
+
+New and edited modules get these when their content is written; run this
+once after the app has added the columns to an existing database (see
+app/core/schema.py), and again whenever the renderer changes (with --all).
+
+Rendering runs in a process pool; the main process reads batches, writes
+the results back with one bulk UPDATE per batch and refreshes the search
+index for those modules.
+
+Usage:
+    python scripts/backfill_module_content.py [--workers 4] [--batch-size 200] [--all]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import or_, select, update
+
+from app import models
+from app.core.search import search_index
+from app.database import get_db_session
+
+
+def render(row):
+    module_id, content = row
+    return {"id": module_id, **models.derive_content_fields(content)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--all", action="store_true", help="re-render every module, not just missing ones")
+    args = parser.parse_args()
+
+    search_index.init()
+    query = select(models.Module.id, models.Module.content).order_by(models.Module.id)
+    if not args.all:
+        query = query.where(or_(
+            models.Module.content_html.is_(None),
+            models.Module.content_hash.is_(None)
+        ))
+
+    updated = 0
+    last_id = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool, get_db_session() as db:
+        while True:
+            # Keyset batches, so only one batch of content is in memory
+            batch = db.execute(
+                query.where(models.Module.id > last_id).limit(args.batch_size)
+            ).all()
+            if not batch:
+                break
+            chunksize = max(1, len(batch) // (args.workers * 4))
+            values = list(pool.map(render, [tuple(row) for row in batch], chunksize=chunksize))
+            db.execute(update(models.Module), values)
+            if search_index.enabled:
+                search_index.reindex(db.connection(), module_ids=[row["id"] for row in values])
+            db.commit()
+            last_id = batch[-1].id
+            updated += len(values)
+            print(f"{updated} modules rendered ({updated / (time.perf_counter() - started):.0f}/s)")
+    print(f"Done: {updated} modules")
+
+
+if __name__ == "__main__":
+    main()
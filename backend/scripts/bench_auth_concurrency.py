@@ -0,0 +1,142 @@
+"""
+Benchmark concurrent-request latency of the auth dependency chain.
+
+Compares the old ``async def`` dependency (a synchronous user query run on the
+event loop) against the current ``app.auth.get_current_user`` (run in the
+threadpool). Every database statement is delayed by --db-latency-ms to mimic
+the round trip to a remote Postgres.
+
+Keep --concurrency below the connection pool size (15 by default): past that
+the old dependency stalls for the pool timeout, because it waits for a pooled
+connection while blocking the loop that would release one.
+
+Usage:
+    python scripts/bench_auth_concurrency.py --requests 200 --concurrency 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Use a throwaway SQLite database for the benchmark
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/bench.db"
+
+import httpx
+import jwt
+from fastapi import Depends, FastAPI
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import models
+from app.auth import (
+    ALGORITHM,
+    SECRET_KEY,
+    create_access_token,
+    get_current_user,
+    get_user_by_email,
+    oauth2_scheme
+)
+from app.core import principals
+from app.database import engine, SessionLocal, get_db
+
+
+async def legacy_get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> models.User:
+    """The pre-change dependency: async, but with a blocking query inside."""
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    return get_user_by_email(db, email=payload.get("sub"))
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/before")
+    def before(current_user: models.User = Depends(legacy_get_current_user)):
+        return {"id": current_user.id}
+
+    @app.get("/after")
+    def after(current_user: models.User = Depends(get_current_user)):
+        return {"id": current_user.id}
+
+    return app
+
+
+def seed_user() -> str:
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = models.User(
+        email="bench@example.com",
+        hashed_password="not-used",
+        first_name="Bench",
+        last_name="User",
+        role=models.UserRole.STUDENT,
+        is_active=True
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    db.close()
+    return create_access_token({"sub": user.email, "user_id": user.id})
+
+
+async def run(app: FastAPI, path: str, token: str, total: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                latencies.append((time.perf_counter() - start) * 1000)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--db-latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    token = seed_user()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def simulate_latency(*_):
+        time.sleep(args.db_latency_ms / 1000)
+
+    # Measure the dependency itself, not the principal cache in front of it
+    principals.principal_cache.ttl = 0
+
+    app = build_app()
+    print(f"{args.requests} requests, concurrency {args.concurrency}, "
+          f"{args.db_latency_ms}ms per DB statement")
+    for label, path in (("before (async + blocking query)", "/before"),
+                        ("after  (threadpool dependency)", "/after")):
+        result = asyncio.run(run(app, path, token, args.requests, args.concurrency))
+        print(f"{label}: {result['rps']:8.1f} req/s  "
+              f"p50 {result['p50']:7.1f}ms  p99 {result['p99']:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
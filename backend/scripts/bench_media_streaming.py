@@ -0,0 +1,189 @@
+"""
+Benchmark concurrent media streaming from GET /api/media/{name}.
+
+Streams one uploaded file to --concurrency clients at a time and compares:
+
+- memory:   the file read into Python memory and sent as one body (a generic
+            ``Response(path.read_bytes())`` route)
+- streamed: the media route reading blocks of MEDIA_BLOCK_SIZE off the loop
+- zerocopy: the media route on a server offering the ASGI
+            ``http.response.zerocopy`` extension (``os.sendfile``)
+
+Requests are driven straight through the ASGI app and every body is written
+to a local socket drained by another thread, so each mode pays for getting
+the bytes into a socket. Also reports random 1 MiB range requests and the
+peak Python memory of one concurrent round per mode.
+
+Usage:
+    python scripts/bench_media_streaming.py --size-mb 64 --requests 32 --concurrency 8
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Serve from a throwaway upload folder
+os.environ["UPLOAD_FOLDER"] = tempfile.mkdtemp()
+
+import anyio
+from fastapi import FastAPI, Response
+
+from app.core.uploads import media_store
+from app.routers import media
+
+SHA256 = "ab" * 32
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(media.router, prefix="/api")
+
+    @app.get("/memory/{name}")
+    def read_into_memory(name: str):
+        return Response(media_store.object_path(SHA256, "mp4").read_bytes(), media_type="video/mp4")
+
+    return app
+
+
+def seed_file(size: int) -> None:
+    path = media_store.object_path(SHA256, "mp4")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        for _ in range(size // (1024 * 1024)):
+            f.write(os.urandom(1024 * 1024))
+
+
+class Sink:
+    """A connected socket whose far end is drained by a thread."""
+
+    def __init__(self):
+        self.sock, self.peer = socket.socketpair()
+        self.received = 0
+        self.thread = threading.Thread(target=self._drain, daemon=True)
+        self.thread.start()
+
+    def _drain(self):
+        buffer = bytearray(1024 * 1024)
+        while True:
+            n = self.peer.recv_into(buffer)
+            if not n:
+                break
+            self.received += n
+
+    def sendfile(self, file, offset: int, count: int) -> None:
+        while count:
+            sent = os.sendfile(self.sock.fileno(), file.fileno(), offset, count)
+            offset, count = offset + sent, count - sent
+
+    def close(self) -> int:
+        self.sock.close()
+        self.thread.join()
+        self.peer.close()
+        return self.received
+
+
+async def fetch(app, path: str, headers: dict, zerocopy: bool) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+        "extensions": {"http.response.zerocopy": {}} if zerocopy else {},
+    }
+    sink = Sink()
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            await anyio.to_thread.run_sync(sink.sock.sendall, message["body"])
+        elif message["type"] == "http.response.zerocopy":
+            await anyio.to_thread.run_sync(sink.sendfile, message["file"], message["offset"], message["count"])
+
+    await app(scope, receive, send)
+    return await anyio.to_thread.run_sync(sink.close)
+
+
+async def run(app, path: str, total: int, concurrency: int, zerocopy: bool, size: int, ranges: bool) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    sent = 0
+
+    async def one():
+        nonlocal sent
+        headers = {}
+        if ranges:
+            first = random.randrange(0, size - 1024 * 1024)
+            headers["range"] = f"bytes={first}-{first + 1024 * 1024 - 1}"
+        async with semaphore:
+            start = time.perf_counter()
+            sent += await fetch(app, path, headers, zerocopy)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    return {
+        "mb_per_s": sent / elapsed / (1024 * 1024),
+        "rps": total / elapsed,
+        "p50": statistics.median(latencies),
+    }
+
+
+def peak_memory(app, path: str, concurrency: int, zerocopy: bool, size: int) -> float:
+    tracemalloc.start()
+    asyncio.run(run(app, path, concurrency, concurrency, zerocopy, size, ranges=False))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    seed_file(size)
+    app = build_app()
+    name = f"{SHA256}.mp4"
+
+    print(f"{args.requests} downloads of {args.size_mb} MB, concurrency {args.concurrency}")
+    for label, path, zerocopy in (
+        ("memory  ", f"/memory/{name}", False),
+        ("streamed", f"/api/media/{name}", False),
+        ("zerocopy", f"/api/media/{name}", True),
+    ):
+        result = asyncio.run(run(app, path, args.requests, args.concurrency, zerocopy, size, ranges=False))
+        peak = peak_memory(app, path, args.concurrency, zerocopy, size)
+        print(f"{label}: {result['mb_per_s']:8.1f} MB/s  p50 {result['p50']:8.1f}ms  "
+              f"peak Python memory {peak:8.1f} MB")
+
+    print(f"{args.requests * 8} random 1 MiB range requests, concurrency {args.concurrency}")
+    for label, zerocopy in (("streamed", False), ("zerocopy", True)):
+        result = asyncio.run(run(app, f"/api/media/{name}", args.requests * 8, args.concurrency, zerocopy, size, ranges=True))
+        print(f"{label}: {result['rps']:8.1f} req/s  p50 {result['p50']:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
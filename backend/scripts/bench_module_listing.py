@@ -0,0 +1,138 @@
+"""
+Benchmark the course module listing before and after dropping content.
+
+Seeds a throwaway SQLite database with one course of --modules modules of
+--content-kb KB each, then compares the old listing (every module as
+ModuleOut, content included) with the current
+``GET /courses/{course_id}/modules/`` (ModuleSummary, content deferred).
+
+Usage:
+    python scripts/bench_module_listing.py --modules 200 --content-kb 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Use a throwaway SQLite database for the benchmark
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/bench.db"
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+from app.auth import create_access_token, get_current_principal
+from app.database import engine, SessionLocal, get_db
+from app.routers import modules as modules_router
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/before/{course_id}", response_model=List[schemas.ModuleOut])
+    def before(
+        course_id: int,
+        db: Session = Depends(get_db),
+        current_user: models.User = Depends(get_current_principal)
+    ):
+        """The pre-change listing: full rows, content included."""
+        return db.query(models.Module).filter(
+            models.Module.course_id == course_id,
+            models.Module.is_published == True
+        ).order_by(models.Module.order).all()
+
+    app.include_router(modules_router.router)
+    return app
+
+
+def seed(module_count: int, content_kb: int) -> tuple:
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    admin = models.User(
+        email="bench@example.com",
+        hashed_password="not-used",
+        first_name="Bench",
+        last_name="Admin",
+        role=models.UserRole.ADMIN,
+        is_active=True
+    )
+    db.add(admin)
+    db.flush()
+    course = models.Course(title="Benchmark course", is_published=True, teacher_id=admin.id)
+    db.add(course)
+    db.flush()
+    paragraph = "<p>" + "Digital literacy lesson text. " * 34 + "</p>\n"
+    content = paragraph * max(1, content_kb * 1024 // len(paragraph))
+    db.add_all([
+        models.Module(
+            title=f"Module {index}",
+            description="A module of the benchmark course",
+            content=content,
+            content_type="text",
+            duration=15,
+            course_id=course.id,
+            order=index,
+            is_published=True
+        )
+        for index in range(module_count)
+    ])
+    db.commit()
+    token = create_access_token({"sub": admin.email, "user_id": admin.id, "role": admin.role.value})
+    course_id = course.id
+    db.close()
+    return course_id, token
+
+
+async def run(app: FastAPI, path: str, token: str, total: int) -> dict:
+    latencies = []
+    size = 0
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        for _ in range(total):
+            start = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+            response.raise_for_status()
+            size = len(response.content)
+    latencies.sort()
+    return {
+        "bytes": size,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modules", type=int, default=200)
+    parser.add_argument("--content-kb", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    course_id, token = seed(args.modules, args.content_kb)
+    app = build_app()
+    print(f"{args.modules} modules of ~{args.content_kb}KB, {args.requests} sequential requests")
+    results = {}
+    for label, path in (("before (ModuleOut, content)  ", f"/before/{course_id}"),
+                        ("after  (ModuleSummary, slim) ", f"/courses/{course_id}/modules/")):
+        result = asyncio.run(run(app, path, token, args.requests))
+        results[label] = result
+        print(f"{label}: {result['bytes']:>10,} bytes  "
+              f"p50 {result['p50']:7.1f}ms  p95 {result['p95']:7.1f}ms")
+
+    before, after = results.values()
+    print(f"bytes saved: {before['bytes'] - after['bytes']:,} "
+          f"({1 - after['bytes'] / before['bytes']:.1%}), "
+          f"p50 speedup: {before['p50'] / after['p50']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
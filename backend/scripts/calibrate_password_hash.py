@@ -0,0 +1,88 @@
+"""
+Measure password hashing time on this host and suggest a cost setting.
+
+Hashes a sample password at increasing rounds and reports the highest cost
+whose median hash time stays within the target latency. "Rounds" means
+something different for each scheme, so each has its own sweep: the log2
+cost for bcrypt, the iteration count for pbkdf2_sha256 (doubled each step)
+and the number of passes for argon2.
+
+Usage:
+    python scripts/calibrate_password_hash.py --target-ms 250
+    python scripts/calibrate_password_hash.py --scheme bcrypt --min-rounds 8 --max-rounds 15
+    python scripts/calibrate_password_hash.py --scheme pbkdf2_sha256
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.core.security import build_password_context
+
+# scheme -> (first rounds, last rounds, next rounds)
+SWEEPS = {
+    "bcrypt": (8, 15, lambda rounds: rounds + 1),
+    "pbkdf2_sha256": (100_000, 3_200_000, lambda rounds: rounds * 2),
+    "argon2": (1, 10, lambda rounds: rounds + 1),
+}
+
+
+def sweep(scheme: str, min_rounds: int, max_rounds: int):
+    """Rounds to try for ``scheme``, from ``min_rounds`` up to ``max_rounds``."""
+    step = SWEEPS[scheme][2]
+    rounds = min_rounds
+    while rounds <= max_rounds:
+        yield rounds
+        rounds = step(rounds)
+
+
+def measure(scheme: str, rounds: int, samples: int) -> float:
+    """Median milliseconds to hash one password at ``rounds``."""
+    context = build_password_context(scheme, rounds)
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        context.hash("calibration-password")
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scheme", choices=sorted(SWEEPS), default=settings.PASSWORD_HASH_SCHEME)
+    parser.add_argument("--target-ms", type=float, default=250.0)
+    parser.add_argument("--min-rounds", type=int, help="default depends on --scheme")
+    parser.add_argument("--max-rounds", type=int, help="default depends on --scheme")
+    parser.add_argument("--samples", type=int, default=3)
+    args = parser.parse_args()
+    if args.scheme not in SWEEPS:
+        parser.error(f"PASSWORD_HASH_SCHEME={args.scheme} is not supported; pass --scheme")
+    default_min, default_max, _ = SWEEPS[args.scheme]
+    min_rounds = args.min_rounds if args.min_rounds is not None else default_min
+    max_rounds = args.max_rounds if args.max_rounds is not None else default_max
+
+    print(f"Calibrating {args.scheme} for a target of {args.target_ms:.0f}ms per hash")
+    suggested = None
+    for rounds in sweep(args.scheme, min_rounds, max_rounds):
+        elapsed = measure(args.scheme, rounds, args.samples)
+        marker = "ok" if elapsed <= args.target_ms else "too slow"
+        print(f"  rounds={rounds:<9} {elapsed:9.1f}ms  {marker}")
+        if elapsed > args.target_ms:
+            break
+        suggested = rounds
+
+    if suggested is None:
+        print(f"\nEven {min_rounds} rounds exceeds the target; lower --min-rounds or raise --target-ms.")
+        sys.exit(1)
+
+    print("\nSuggested settings:")
+    print(f"  PASSWORD_HASH_SCHEME={args.scheme}")
+    print(f"  PASSWORD_HASH_ROUNDS={suggested}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Export and import whole course trees (course, modules, quiz questions and
+options) as JSON Lines, one course per line.
+
+Much faster than the row-by-row scripts for loading a real curriculum:
+each course is inserted with one bulk insert per table in a single
+transaction.
+
+Usage:
+    python scripts/course_jsonl.py export courses.jsonl [--teacher-id 3]
+    python scripts/course_jsonl.py import courses.jsonl --teacher-email teacher@test.com
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import models
+from app.core import course_io
+from app.core.search import search_index
+from app.database import get_db_session
+
+
+def export(args):
+    count = 0
+    with get_db_session() as db, open(args.path, "w", encoding="utf-8") as out:
+        for line in course_io.export_courses(db, args.teacher_id, args.batch_size):
+            out.write(line)
+            count += 1
+    print(f"Exported {count} courses to {args.path}")
+    return 0
+
+
+def import_(args):
+    search_index.init()
+    with get_db_session() as db, open(args.path, encoding="utf-8") as lines:
+        teacher = db.query(models.User).filter(models.User.email == args.teacher_email).first()
+        if not teacher:
+            print(f"No user with email {args.teacher_email}")
+            return 1
+        result = course_io.import_courses(db, lines, teacher.id)
+
+    for error in result.errors:
+        print(f"Line {error.line}: {error.error}")
+    print(f"Imported {result.imported} courses ({len(result.errors)} errors)")
+    return 1 if result.errors else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="write courses to a JSON Lines file")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--teacher-id", type=int, default=None, help="only this teacher's courses")
+    export_parser.add_argument("--batch-size", type=int, default=course_io.EXPORT_BATCH_SIZE)
+    export_parser.set_defaults(func=export)
+
+    import_parser = commands.add_parser("import", help="load courses from a JSON Lines file")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--teacher-email", required=True, help="owner of the imported courses")
+    import_parser.set_defaults(func=import_)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
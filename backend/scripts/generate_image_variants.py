@@ -0,0 +1,63 @@
+"""
+Make the resized variants of uploaded images that don't have them yet and
+attach them to the courses using those images as thumbnails.
+
+New uploads are processed as they arrive. Run this once for older uploads
+(the app adds courses.thumbnail_variants to an existing database on start),
+or with --all to refresh every course whose thumbnail was changed outside
+the app.
+
+Usage:
+    python scripts/generate_image_variants.py [--all]
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+
+from app import models
+from app.core.images import IMAGE_EXTENSIONS, image_variants
+from app.database import get_db_session
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--all", action="store_true", help="also re-attach images that already have variants")
+    args = parser.parse_args()
+
+    if not image_variants.enabled:
+        sys.exit("Image variants are disabled (is Pillow installed and IMAGE_VARIANT_WORKERS > 0?)")
+
+    query = select(models.MediaFile.sha256, models.MediaFile.extension).where(
+        models.MediaFile.extension.in_(IMAGE_EXTENSIONS)
+    ).order_by(models.MediaFile.id)
+    if not args.all:
+        query = query.where(~models.MediaFile.sha256.in_(select(models.ImageVariant.source_sha256)))
+
+    processed = 0
+    with get_db_session() as db:
+        # Variants are themselves media files; skip them
+        variant_files = set(db.scalars(
+            select(models.MediaFile.sha256).join(
+                models.ImageVariant, models.ImageVariant.media_file_id == models.MediaFile.id
+            )
+        ))
+        for sha256, extension in db.execute(query).all():
+            if sha256 in variant_files:
+                continue
+            try:
+                variants = image_variants.process(db, sha256, extension)
+            except Exception as e:
+                db.rollback()
+                print(f"{sha256}.{extension}: {e}")
+                continue
+            processed += 1
+            print(f"{sha256}.{extension}: {len(variants or [])} variants")
+    print(f"Done: {processed} images")
+
+
+if __name__ == "__main__":
+    main()
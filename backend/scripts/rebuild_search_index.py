@@ -0,0 +1,30 @@
+"""
+Rebuild the full-text search index from the courses and modules tables.
+
+The index is kept current as courses and modules are written through the
+app; run this after bulk changes made directly in the database.
+
+Usage:
+    python scripts/rebuild_search_index.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.search import search_index
+
+
+def main():
+    search_index.init()
+    if not search_index.enabled:
+        print("Full-text search is not available on this database")
+        return 1
+    with search_index.bind.begin() as connection:
+        search_index.rebuild(connection)
+    print("Search index rebuilt")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
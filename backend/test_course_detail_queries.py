@@ -0,0 +1,80 @@
+"""
+The course detail endpoint loads in a fixed number of queries: the count
+must not grow with the number of modules or quiz questions.
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app import models
+from app.core.principals import Principal
+from app.database import engine
+from app.routers.courses import load_course_detail
+
+# course, modules (selectinload), question counts, enrollment
+EXPECTED_QUERIES = 4
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def seed(db, teacher, student, module_count):
+    course = models.Course(
+        title=f"Course with {module_count} modules",
+        is_published=True,
+        teacher_id=teacher.id
+    )
+    db.add(course)
+    db.flush()
+    for index in range(module_count):
+        module = models.Module(
+            title=f"Module {index}",
+            content="x" * 10000,
+            content_type="text",
+            course_id=course.id,
+            order=module_count - index,
+            is_published=index % 5 != 4
+        )
+        db.add(module)
+        db.flush()
+        for number in range(index % 3):
+            db.add(models.QuizQuestion(question=f"Q{number}", module_id=module.id))
+    db.add(models.Enrollment(user_id=student.id, course_id=course.id, progress=40))
+    db.commit()
+    return course.id
+
+
+def test_course_detail_query_count(db, teacher, student):
+    caller = Principal(
+        id=student.id, email=student.email, role=student.role, is_active=True
+    )
+
+    for module_count in (3, 40):
+        course_id = seed(db, teacher, student, module_count)
+        db.expire_all()
+
+        with count_queries() as statements:
+            detail = load_course_detail(db, course_id, caller)
+
+        assert len(statements) == EXPECTED_QUERIES, (
+            f"{module_count} modules took {len(statements)} queries:\n" + "\n".join(statements)
+        )
+        published = [module for module in range(module_count) if module % 5 != 4]
+        assert len(detail.modules) == len(published)
+        orders = [module.order_index for module in detail.modules]
+        assert orders == sorted(orders)
+        assert sum(module.quiz_question_count for module in detail.modules) == sum(
+            index % 3 for index in published
+        )
+        assert detail.enrollment is not None and detail.progress == 40
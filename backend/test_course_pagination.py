@@ -0,0 +1,78 @@
+"""Keyset pagination of GET /api/courses/."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import models
+
+
+@pytest.fixture
+def courses(db, teacher):
+    """Seven published courses, two sharing a timestamp, newest first."""
+    start = datetime(2024, 1, 1, 12, 0, 0)
+    stamps = [start + timedelta(minutes=minute) for minute in (6, 5, 4, 4, 3, 2, 1)]
+    rows = [
+        models.Course(title=f"Course {index}", is_published=True, teacher_id=teacher.id, created_at=stamp)
+        for index, stamp in enumerate(stamps)
+    ]
+    db.add_all(rows)
+    db.commit()
+    ordered = sorted(rows, key=lambda course: (course.created_at, course.id), reverse=True)
+    return [course.id for course in ordered]
+
+
+def pages(client, headers=None, limit=2):
+    ids, cursor = [], None
+    while True:
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/courses/", params=params, headers=headers or {})
+        assert response.status_code == 200
+        ids.extend(course["id"] for course in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return ids
+
+
+def test_cursor_walks_every_course_once(client, courses):
+    assert pages(client) == courses
+
+
+def test_teacher_pages(client, courses, teacher, auth_headers):
+    assert pages(client, auth_headers(teacher), limit=3) == courses
+
+
+@pytest.mark.parametrize("params", [{"limit": 0}, {"limit": -1}, {"skip": -1}, {"limit": 10_000}])
+def test_invalid_page_parameters(client, courses, teacher, auth_headers, params):
+    assert client.get("/api/courses/", params=params).status_code == 422
+    assert client.get("/api/courses/", params=params, headers=auth_headers(teacher)).status_code == 422
+
+
+def test_invalid_cursor(client, courses):
+    assert client.get("/api/courses/", params={"cursor": "not a cursor"}).status_code == 400
+
+
+@pytest.mark.parametrize("change", ["delete", "unpublish"])
+def test_cursor_survives_anchor_removal(client, db, courses, change):
+    first = client.get("/api/courses/", params={"limit": 3})
+    cursor = first.headers["X-Next-Cursor"]
+    anchor = db.get(models.Course, courses[2])
+    if change == "delete":
+        db.delete(anchor)
+    else:
+        anchor.is_published = False
+    db.commit()
+
+    rest = client.get("/api/courses/", params={"limit": 10, "cursor": cursor})
+    assert rest.status_code == 200
+    assert [course["id"] for course in rest.json()] == courses[3:]
+
+
+def test_cursor_with_database_timestamps(client, db, teacher):
+    # created_at from the server default: whole seconds, mostly shared
+    rows = [models.Course(title=f"Course {index}", is_published=True, teacher_id=teacher.id) for index in range(5)]
+    db.add_all(rows)
+    db.commit()
+    expected = [course.id for course in sorted(rows, key=lambda course: (course.created_at, course.id), reverse=True)]
+    assert pages(client) == expected
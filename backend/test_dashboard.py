@@ -0,0 +1,39 @@
+"""Teacher dashboard figures."""
+from app import models
+
+
+def test_quiz_figures_count_submissions_not_answers(client, db, teacher, student, auth_headers):
+    course = models.Course(title="Course", is_published=True, teacher_id=teacher.id)
+    db.add(course)
+    db.flush()
+    module = models.Module(title="Quiz", content="quiz", content_type="quiz",
+                           course_id=course.id, is_published=True)
+    db.add(module)
+    db.flush()
+    questions = []
+    for number in range(2):
+        question = models.QuizQuestion(question=f"Q{number}", module_id=module.id)
+        question.options = [
+            models.QuizOption(option_text="right", is_correct=True),
+            models.QuizOption(option_text="wrong", is_correct=False),
+        ]
+        questions.append(question)
+    db.add_all(questions)
+    db.add(models.Enrollment(user_id=student.id, course_id=course.id))
+    db.commit()
+
+    def submit(answers):
+        response = client.post(f"/api/quizzes/submit/{module.id}", headers=auth_headers(student), json={
+            "answers": [{"question_id": q.id, "selected_option_id": q.options[o].id} for q, o in answers]
+        })
+        assert response.status_code == 200, response.text
+        return response.json()["score"]
+
+    assert submit([(questions[0], 0), (questions[1], 0)]) == 100
+    assert submit([(questions[0], 1)]) == 0  # one answer row, scored over both questions
+
+    response = client.get("/api/admin/dashboard/courses", headers=auth_headers(teacher))
+    assert response.status_code == 200
+    [stats] = response.json()
+    assert stats["quiz_attempt_count"] == 2
+    assert stats["average_quiz_score"] == 50.0
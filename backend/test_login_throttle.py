@@ -0,0 +1,52 @@
+"""Login throttling and the client address it keys on."""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from starlette.requests import Request
+
+from app.core.ratelimit import ClientAddress, DatabaseBucketStore, MemoryBucketStore, login_throttle
+
+
+def request(peer, forwarded=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "headers": headers, "client": (peer, 50000)})
+
+
+@pytest.mark.parametrize("trusted, peer, forwarded, expected", [
+    ("", "203.0.113.5", "198.51.100.1", "203.0.113.5"),
+    ("10.0.0.0/8", "198.51.100.9", "198.51.100.1", "198.51.100.9"),
+    ("10.0.0.0/8", "10.1.2.3", "198.51.100.1", "198.51.100.1"),
+    # A spoofed leftmost entry is skipped: the nearest untrusted hop wins
+    ("10.0.0.0/8", "10.1.2.3", "1.1.1.1, 198.51.100.1, 10.9.9.9", "198.51.100.1"),
+    ("*", "172.16.0.1", "1.1.1.1, 198.51.100.1", "198.51.100.1"),
+    ("*", "172.16.0.1", None, "172.16.0.1"),
+])
+def test_client_address(trusted, peer, forwarded, expected):
+    assert ClientAddress(trusted)(request(peer, forwarded)) == expected
+
+
+def test_a_class_behind_one_address_can_log_in(client, monkeypatch):
+    for bucket in (login_throttle.by_ip, login_throttle.by_email):
+        monkeypatch.setattr(bucket, "store", MemoryBucketStore(100))
+    for number in range(30):
+        response = client.post(
+            "/api/auth/login",
+            data={"username": f"pupil{number}@example.com", "password": "wrong"}
+        )
+        assert response.status_code == 401
+
+
+def test_counters_lose_no_takes_under_concurrency():
+    store = MemoryBucketStore(100)
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda n: store.take(f"key{n % 3}", 50.0, 0.001), range(2000)))
+    stats = store.stats()
+    assert stats["allowed"] + stats["rejected"] == 2000
+    assert stats["allowed"] == 150
+
+
+def test_database_store_counts_takes(app):
+    store = DatabaseBucketStore("test")
+    waits = [store.take("key", 2.0, 0.001) for _ in range(3)]
+    assert [bool(wait) for wait in waits] == [False, False, True]
+    assert store.stats() == {"allowed": 2, "rejected": 1, "backend": "database"}
@@ -0,0 +1,75 @@
+"""PATCH /api/courses/{course_id}/modules: bulk reorder and partial updates."""
+import pytest
+
+from app import models
+
+
+@pytest.fixture
+def course(db, teacher):
+    course = models.Course(title="Course", is_published=True, teacher_id=teacher.id)
+    db.add(course)
+    db.flush()
+    db.add_all([
+        models.Module(title=f"Module {index}", content="text", content_type="text",
+                      course_id=course.id, order=index, is_published=True)
+        for index in (1, 2, 3)
+    ])
+    db.commit()
+    return course
+
+
+def module_ids(db, course):
+    return [module_id for (module_id,) in db.query(models.Module.id).filter(
+        models.Module.course_id == course.id
+    ).order_by(models.Module.order)]
+
+
+@pytest.mark.parametrize("field", ["title", "content", "content_type", "order_index", "is_published"])
+def test_null_for_required_field_is_rejected(client, db, course, teacher, auth_headers, field):
+    first = module_ids(db, course)[0]
+    response = client.patch(
+        f"/api/courses/{course.id}/modules",
+        json={"modules": [{"id": first, field: None}]},
+        headers=auth_headers(teacher)
+    )
+    assert response.status_code == 422
+    assert db.get(models.Module, first).title == "Module 1"
+
+
+def test_null_description_clears_it(client, db, course, teacher, auth_headers):
+    first = module_ids(db, course)[0]
+    response = client.patch(
+        f"/api/courses/{course.id}/modules",
+        json={"modules": [{"id": first, "description": None, "title": "Renamed"}]},
+        headers=auth_headers(teacher)
+    )
+    assert response.status_code == 200
+    db.expire_all()
+    module = db.get(models.Module, first)
+    assert (module.title, module.description) == ("Renamed", None)
+
+
+def test_reorder_and_patch_content(client, db, course, teacher, auth_headers):
+    ids = module_ids(db, course)
+    response = client.patch(
+        f"/api/courses/{course.id}/modules",
+        json={"order": ids[::-1], "modules": [{"id": ids[0], "content": "**new**"}]},
+        headers=auth_headers(teacher)
+    )
+    assert response.status_code == 200
+    assert [module["id"] for module in response.json()] == ids[::-1]
+    db.expire_all()
+    assert module_ids(db, course) == ids[::-1]
+    module = db.get(models.Module, ids[0])
+    assert module.content == "**new**"
+    assert module.content_length == len("**new**")
+    assert "new" in module.content_html
+
+
+def test_students_cannot_patch(client, db, course, student, auth_headers):
+    response = client.patch(
+        f"/api/courses/{course.id}/modules",
+        json={"modules": [{"id": module_ids(db, course)[0], "title": "x"}]},
+        headers=auth_headers(student)
+    )
+    assert response.status_code == 403
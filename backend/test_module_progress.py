@@ -0,0 +1,125 @@
+"""Module completions and the enrollment progress derived from them."""
+import pytest
+
+from app import models
+from app.core import progress
+
+
+@pytest.fixture
+def course(db, teacher):
+    course = models.Course(title="Course", is_published=True, teacher_id=teacher.id)
+    db.add(course)
+    db.flush()
+    db.add_all([
+        models.Module(title=f"Module {index}", content="text", content_type="text",
+                      course_id=course.id, order=index, is_published=index < 4)
+        for index in range(5)
+    ])
+    db.commit()
+    return course
+
+
+@pytest.fixture
+def modules(db, course):
+    return db.query(models.Module).filter(models.Module.course_id == course.id).order_by(models.Module.order).all()
+
+
+@pytest.fixture
+def enrollment(db, course, student):
+    enrollment = models.Enrollment(user_id=student.id, course_id=course.id)
+    db.add(enrollment)
+    db.commit()
+    return enrollment
+
+
+def complete(client, course, module, headers):
+    return client.post(f"/api/courses/{course.id}/modules/{module.id}/complete", headers=headers)
+
+
+def test_completion_is_idempotent(client, db, course, modules, enrollment, student, auth_headers):
+    headers = auth_headers(student)
+    assert complete(client, course, modules[0], headers).json() == {
+        "message": "Module marked as completed", "progress": 25
+    }
+    assert complete(client, course, modules[0], headers).json() == {
+        "message": "Module already completed", "progress": 25
+    }
+    assert complete(client, course, modules[1], headers).json()["progress"] == 50
+    db.refresh(enrollment)
+    assert (enrollment.completed_modules, enrollment.completed) == (2, False)
+    assert db.query(models.ModuleCompletion).count() == 2
+
+
+def test_completing_every_published_module_finishes_the_course(client, db, course, modules, enrollment, student, auth_headers):
+    headers = auth_headers(student)
+    for module in modules:
+        assert complete(client, course, module, headers).status_code == 200
+    db.refresh(enrollment)
+    assert (enrollment.progress, enrollment.completed_modules, enrollment.completed) == (100, 4, True)
+    assert enrollment.completed_at is not None
+
+
+def test_unpublished_module_does_not_count(client, db, course, modules, enrollment, student, auth_headers):
+    response = complete(client, course, modules[4], auth_headers(student))
+    assert response.json() == {"message": "Module marked as completed", "progress": 0}
+    db.refresh(enrollment)
+    assert enrollment.completed_modules == 0
+
+
+def test_not_enrolled(client, course, modules, student, auth_headers):
+    assert complete(client, course, modules[0], auth_headers(student)).status_code == 403
+
+
+def test_stale_zero_module_count_is_recounted(client, db, course, modules, enrollment, student, auth_headers):
+    progress.module_count_cache.set(course.id, 0)
+    assert complete(client, course, modules[0], auth_headers(student)).json()["progress"] == 25
+    db.refresh(enrollment)
+    assert not enrollment.completed
+
+
+def test_progress_recorded_before_completions_is_kept(client, db, course, modules, enrollment, student, auth_headers):
+    enrollment.progress = 60
+    db.commit()
+    assert complete(client, course, modules[0], auth_headers(student)).json()["progress"] == 60
+
+
+def test_backfill_counts_on_from_legacy_progress(client, db, course, modules, enrollment, student, auth_headers):
+    enrollment.progress = 50
+    db.commit()
+    from app.database import engine
+    with engine.begin() as connection:
+        progress.backfill_completed_modules(connection)
+    db.refresh(enrollment)
+    assert enrollment.completed_modules == 2
+    assert complete(client, course, modules[0], auth_headers(student)).json()["progress"] == 75
+
+
+def test_publishing_a_module_recounts_progress(client, db, course, modules, enrollment, student, teacher, auth_headers):
+    complete(client, course, modules[0], auth_headers(student))
+    response = client.patch(
+        f"/api/courses/{course.id}/modules",
+        json={"modules": [{"id": modules[4].id, "is_published": True}]},
+        headers=auth_headers(teacher)
+    )
+    assert response.status_code == 200
+    db.refresh(enrollment)
+    assert (enrollment.progress, enrollment.completed_modules) == (20, 1)
+
+
+def test_unenrolling_clears_completions(client, db, course, modules, enrollment, student, auth_headers):
+    headers = auth_headers(student)
+    complete(client, course, modules[0], headers)
+    assert client.delete(f"/api/enrollments/{enrollment.id}", headers=headers).status_code == 204
+    assert db.query(models.ModuleCompletion).count() == 0
+
+
+@pytest.mark.parametrize("index", [1, 4])  # published, unpublished
+def test_unenrolled_by_another_worker_records_nothing(client, db, course, modules, enrollment, student, auth_headers, index):
+    headers = auth_headers(student)
+    assert complete(client, course, modules[0], headers).status_code == 200  # membership now cached
+    db.query(models.ModuleCompletion).delete()
+    db.delete(enrollment)
+    db.commit()
+
+    assert complete(client, course, modules[index], headers).status_code == 403
+    assert db.query(models.ModuleCompletion).count() == 0
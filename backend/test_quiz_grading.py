@@ -0,0 +1,90 @@
+"""Grading against the compiled quiz, and recompiling it after admin edits."""
+import pytest
+
+from app import models
+
+
+@pytest.fixture
+def quiz(db, teacher, student):
+    course = models.Course(title="Course", is_published=True, teacher_id=teacher.id)
+    db.add(course)
+    db.flush()
+    module = models.Module(title="Quiz", content="quiz", content_type="quiz",
+                           course_id=course.id, is_published=True)
+    db.add(module)
+    db.flush()
+    for number, points in enumerate((3, 1)):
+        question = models.QuizQuestion(question=f"Q{number}", module_id=module.id, points=points)
+        question.options = [
+            models.QuizOption(option_text="right", is_correct=True),
+            models.QuizOption(option_text="wrong", is_correct=False),
+        ]
+        db.add(question)
+    db.add(models.Enrollment(user_id=student.id, course_id=course.id))
+    db.commit()
+    return module
+
+
+@pytest.fixture
+def submit(client, quiz, student, auth_headers):
+    def submit(*answers):
+        """Submit (question, option) pairs."""
+        response = client.post(f"/api/quizzes/submit/{quiz.id}", headers=auth_headers(student), json={
+            "answers": [{"question_id": q.id, "selected_option_id": o.id} for q, o in answers]
+        })
+        assert response.status_code == 200, response.text
+        return response.json()
+    return submit
+
+
+def test_score_is_weighted_by_points(submit, quiz):
+    heavy, light = quiz.quiz_questions
+    result = submit((heavy, heavy.options[0]), (light, light.options[1]))
+    assert (result["score"], result["correct_answers"], result["passed"]) == (75, 1, True)
+    assert submit((heavy, heavy.options[1]), (light, light.options[0]))["score"] == 25
+
+
+def test_each_question_counts_once(submit, quiz):
+    heavy, light = quiz.quiz_questions
+    result = submit(*[(heavy, heavy.options[0])] * 3, (light, light.options[1]), (light, light.options[0]))
+    assert result["score"] == 100
+    assert result["correct_answers"] == 2
+
+
+def test_options_of_other_questions_are_wrong_and_not_stored(submit, db, quiz):
+    heavy, light = quiz.quiz_questions
+    result = submit((heavy, light.options[0]), (light, light.options[0]))
+    assert result["score"] == 25
+    stored = db.query(models.QuizAttempt.question_id).all()
+    assert [row.question_id for row in stored] == [light.id]
+
+
+def test_admin_edits_regrade_later_submissions(client, submit, db, quiz, student, admin, auth_headers):
+    heavy, light = quiz.quiz_questions
+    # Compile and cache the quiz before editing it
+    assert len(client.get(f"/api/quizzes/module/{quiz.id}", headers=auth_headers(student)).json()) == 2
+    assert submit((heavy, heavy.options[1]), (light, light.options[0]))["score"] == 25
+
+    response = client.post(f"/api/admin/questions/{heavy.id}/options", headers=auth_headers(admin), json={
+        "option_text": "also right", "is_correct": True, "question_id": heavy.id
+    })
+    assert response.status_code == 201
+    also_right = db.get(models.QuizOption, response.json()["id"])
+    assert submit((heavy, also_right), (light, light.options[0]))["score"] == 100
+
+    response = client.post(f"/api/admin/modules/{quiz.id}/questions", headers=auth_headers(admin), json={
+        "question": "Q2", "module_id": quiz.id, "points": 4,
+        "options": [{"option_text": "right", "is_correct": True}]
+    })
+    assert response.status_code == 201
+    result = submit((heavy, also_right), (light, light.options[0]))
+    assert (result["total_questions"], result["score"]) == (3, 50)
+    assert len(client.get(f"/api/quizzes/module/{quiz.id}", headers=auth_headers(student)).json()) == 3
+
+
+def test_new_question_options_take_no_question_id(client, quiz, admin, auth_headers):
+    response = client.post(f"/api/admin/modules/{quiz.id}/questions", headers=auth_headers(admin), json={
+        "question": "Q2", "module_id": quiz.id,
+        "options": [{"option_text": "right", "is_correct": True, "question_id": 12345}]
+    })
+    assert response.status_code == 422
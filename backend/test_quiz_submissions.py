@@ -0,0 +1,112 @@
+"""Quiz submissions: attempt numbers, latest results and history."""
+import pytest
+from sqlalchemy import event
+
+from app import models
+from app.database import engine
+
+
+@pytest.fixture
+def quiz(db, teacher, student):
+    course = models.Course(title="Course", is_published=True, teacher_id=teacher.id)
+    db.add(course)
+    db.flush()
+    module = models.Module(title="Quiz", content="quiz", content_type="quiz",
+                           course_id=course.id, is_published=True)
+    db.add(module)
+    db.flush()
+    for number in range(2):
+        question = models.QuizQuestion(question=f"Q{number}", module_id=module.id)
+        question.options = [
+            models.QuizOption(option_text="right", is_correct=True),
+            models.QuizOption(option_text="wrong", is_correct=False),
+        ]
+        db.add(question)
+    db.add(models.Enrollment(user_id=student.id, course_id=course.id))
+    db.commit()
+    return module
+
+
+@pytest.fixture
+def submit(client, quiz, student, auth_headers):
+    def submit(*choices):
+        """Answer question i with option choices[i] (0 is right, 1 wrong)."""
+        answers = [
+            {"question_id": question.id, "selected_option_id": question.options[choice].id}
+            for question, choice in zip(quiz.quiz_questions, choices)
+        ]
+        response = client.post(f"/api/quizzes/submit/{quiz.id}", headers=auth_headers(student),
+                               json={"answers": answers})
+        assert response.status_code == 200, response.text
+        return response.json()
+    return submit
+
+
+def test_attempts_are_numbered_per_learner(submit, make_user, client, quiz, db, auth_headers):
+    assert [submit(1, 1)["attempt_number"], submit(0, 1)["attempt_number"]] == [1, 2]
+
+    other = make_user("other@example.com")
+    db.add(models.Enrollment(user_id=other.id, course_id=quiz.course_id))
+    db.commit()
+    question = quiz.quiz_questions[0]
+    response = client.post(f"/api/quizzes/submit/{quiz.id}", headers=auth_headers(other), json={
+        "answers": [{"question_id": question.id, "selected_option_id": question.options[0].id}]
+    })
+    assert response.json()["attempt_number"] == 1
+
+
+def test_results_show_the_latest_attempt_and_best_score(submit, client, quiz, student, auth_headers):
+    response = client.get(f"/api/quizzes/results/{quiz.id}", headers=auth_headers(student))
+    assert response.status_code == 200
+    assert response.json()["attempts"] == 0 and response.json()["best_score"] is None
+
+    submit(0, 0)
+    submit(0, 1)
+    results = client.get(f"/api/quizzes/results/{quiz.id}", headers=auth_headers(student)).json()
+    assert results["attempts"] == 2
+    assert results["score"] == 50
+    assert results["best_score"] == 100
+    assert results["passed"] is False
+    assert [question["is_correct"] for question in results["questions"]] == [True, False]
+    assert results["questions"][1]["selected_option_id"] == quiz.quiz_questions[1].options[1].id
+
+
+def test_history_is_newest_first_and_paged(submit, client, quiz, student, auth_headers):
+    for choices in ((1, 1), (0, 1), (0, 0)):
+        submit(*choices)
+    headers = auth_headers(student)
+
+    history = client.get(f"/api/quizzes/history/{quiz.id}", headers=headers).json()
+    assert [(entry["attempt_number"], entry["score"]) for entry in history] == [(3, 100), (2, 50), (1, 0)]
+    page = client.get(f"/api/quizzes/history/{quiz.id}?skip=1&limit=1", headers=headers).json()
+    assert [entry["attempt_number"] for entry in page] == [2]
+    for params in ("limit=0", "limit=-1", "skip=-1"):
+        assert client.get(f"/api/quizzes/history/{quiz.id}?{params}", headers=headers).status_code == 422
+
+
+def test_passing_completes_the_module(submit, db, quiz, student):
+    submit(0, 0)
+    enrollment = db.query(models.Enrollment).filter_by(user_id=student.id).one()
+    assert enrollment.completed_modules == 1
+    assert enrollment.progress == 100
+
+
+def test_history_is_only_for_enrolled_learners(client, quiz, make_user, auth_headers):
+    outsider = make_user("outsider@example.com")
+    response = client.get(f"/api/quizzes/history/{quiz.id}", headers=auth_headers(outsider))
+    assert response.status_code == 403
+
+
+def test_submitting_relies_on_the_cached_membership(submit):
+    submit(1, 1)  # warm the principal, membership and quiz caches
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        submit(1, 1)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    assert not [statement for statement in statements if "enrollments" in statement]
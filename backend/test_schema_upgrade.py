@@ -0,0 +1,61 @@
+"""core.schema.upgrade_schema on a database created before newer columns."""
+from sqlalchemy import create_engine, inspect, text
+
+from app.core.schema import upgrade_schema
+
+
+def legacy_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/legacy.db")
+    with engine.begin() as connection:
+        for statement in (
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR NOT NULL)",
+            "CREATE TABLE courses (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, is_published BOOLEAN,"
+            " teacher_id INTEGER, created_at DATETIME)",
+            "CREATE TABLE modules (id INTEGER PRIMARY KEY, course_id INTEGER NOT NULL, is_published BOOLEAN)",
+            "CREATE TABLE enrollments (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL,"
+            " course_id INTEGER NOT NULL, progress INTEGER)",
+            "CREATE TABLE quiz_attempts (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL,"
+            " question_id INTEGER NOT NULL, selected_option_id INTEGER NOT NULL, is_correct BOOLEAN NOT NULL)",
+            "INSERT INTO users (id, email) VALUES (1, 'a@example.com')",
+            "INSERT INTO modules (id, course_id, is_published) VALUES (1, 1, 1), (2, 1, 1), (3, 1, 1), (4, 1, 0)",
+            # 7 published modules in course 2, none in course 3
+            "INSERT INTO modules (course_id, is_published) VALUES (2, 1), (2, 1), (2, 1), (2, 1), (2, 1), (2, 1), (2, 1)",
+            # Progress as the old code stored it: k * (100 // modules), capped at 100
+            "INSERT INTO enrollments (id, user_id, course_id, progress) VALUES"
+            " (1, 1, 1, 33), (2, 1, 1, 66), (3, 1, 1, 99), (4, 1, 1, 100), (5, 1, 1, NULL),"
+            " (6, 1, 2, 14), (7, 1, 2, 84), (8, 1, 2, 98), (9, 1, 2, 100), (10, 1, 3, 50)",
+        ):
+            connection.execute(text(statement))
+    return engine
+
+
+def columns(engine, table):
+    return {column["name"] for column in inspect(engine).get_columns(table)}
+
+
+def test_adds_missing_columns_once(tmp_path):
+    engine = legacy_engine(tmp_path)
+    added = upgrade_schema(engine)
+    assert "users.token_generation" in added
+    assert "token_generation" in columns(engine, "users")
+    assert {"content_length", "content_hash", "content_html", "content_text"} <= columns(engine, "modules")
+    assert "thumbnail_variants" in columns(engine, "courses")
+    assert "submission_id" in columns(engine, "quiz_attempts")
+    assert "ix_quiz_attempts_submission_id" in {
+        index["name"] for index in inspect(engine).get_indexes("quiz_attempts")
+    }
+    assert [key["referred_table"] for key in inspect(engine).get_foreign_keys("quiz_attempts")] == ["quiz_submissions"]
+    assert {"ix_courses_published_created_id", "ix_courses_teacher_created_id"} <= {
+        index["name"] for index in inspect(engine).get_indexes("courses")
+    }
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT token_generation FROM users")).scalar() == 0
+    assert upgrade_schema(engine) == []
+
+
+def test_backfills_completed_modules_from_progress(tmp_path):
+    engine = legacy_engine(tmp_path)
+    upgrade_schema(engine)
+    with engine.connect() as connection:
+        rows = connection.execute(text("SELECT id, completed_modules FROM enrollments ORDER BY id")).all()
+    assert [row.completed_modules for row in rows] == [1, 2, 3, 3, 0, 1, 6, 7, 7, 0]
@@ -0,0 +1,57 @@
+"""Token revocation: logout and the per-worker revocation list."""
+from datetime import datetime, timedelta
+from threading import Thread
+
+from app import models
+from app.core.revocation import RevocationList
+from app.database import SessionLocal
+
+
+def test_logout_twice_with_the_same_token(client, student, auth_headers):
+    headers = auth_headers(student)
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+    assert client.post("/api/auth/logout", headers=headers).status_code == 200
+    assert client.post("/api/auth/logout", headers=headers).status_code == 200
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+
+
+def test_revoke_is_idempotent_across_workers(db):
+    expires_at = datetime.utcnow() + timedelta(hours=1)
+    first, second = RevocationList(60, 3600, 60), RevocationList(60, 3600, 60)
+    first.revoke(db, "jti-1", expires_at)
+    with SessionLocal() as other:
+        # Lost the race on the unique jti: no error, and revoked locally
+        second.revoke(other, "jti-1", expires_at)
+    assert second.is_revoked("jti-1")
+    assert db.query(models.RevokedToken).count() == 1
+
+
+def test_refresh_picks_up_rows_that_commit_late(db):
+    now = datetime.utcnow().replace(microsecond=0)
+    expires_at = now + timedelta(hours=1)
+    revocations = RevocationList(refresh_interval=0, gc_interval=3600, overlap=60)
+    db.add(models.RevokedToken(id=10, jti="early", expires_at=expires_at, revoked_at=now))
+    db.commit()
+    revocations.refresh()
+    assert revocations.is_revoked("early")
+
+    # Given a lower id and stamped before the row already read (its
+    # transaction began first) but only committed now
+    db.add(models.RevokedToken(id=5, jti="late", expires_at=expires_at, revoked_at=now - timedelta(seconds=20)))
+    db.commit()
+    revocations.refresh()
+    assert revocations.is_revoked("late")
+
+
+def test_revoke_waits_for_a_refresh_in_progress(db):
+    revocations = RevocationList(refresh_interval=0, gc_interval=3600, overlap=60)
+    expires_at = datetime.utcnow() + timedelta(hours=1)
+    with revocations._lock:  # as _maybe_refresh holds it
+        logout = Thread(target=revocations.revoke, args=(db, "jti-1", expires_at))
+        logout.start()
+        logout.join(timeout=0.2)
+        # Committed, but not applied while the dict may be replaced
+        assert logout.is_alive()
+        revocations.refresh()
+    logout.join()
+    assert revocations.is_revoked("jti-1")